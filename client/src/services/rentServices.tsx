@@ -18,7 +18,7 @@ export const fetchPersonalRentals = async (user_id: number) => {
 
 export const fetchOngoingRental = async () => {
   try {
-    const response = await fetch(`${API_BASE_URL}/rentals/ongoing`);
+    const response = await fetch(`${API_BASE_URL}/rentals/ongoing?limit=all`);
     if (!response.ok) {
       const errorData = await response.json();
       throw new Error(errorData.error);
@@ -33,7 +33,7 @@ export const fetchOngoingRental = async () => {
 
 export const fetchOverdueRental = async () => {
   try {
-    const response = await fetch(`${API_BASE_URL}/rentals/overdue`);
+    const response = await fetch(`${API_BASE_URL}/rentals/overdue?limit=all`);
     if (!response.ok) {
       const errorData = await response.json();
       throw new Error(errorData.error);
@@ -48,7 +48,7 @@ export const fetchOverdueRental = async () => {
 
 export const fetchFinishedRental = async () => {
   try {
-    const response = await fetch(`${API_BASE_URL}/rentals/finished`);
+    const response = await fetch(`${API_BASE_URL}/rentals/finished?limit=all`);
     if (!response.ok) {
       const errorData = await response.json();
       throw new Error(errorData.error);
@@ -63,7 +63,7 @@ export const fetchFinishedRental = async () => {
 
 export const fetchCancelledRental = async () => {
   try {
-    const response = await fetch(`${API_BASE_URL}/rentals/cancelled`);
+    const response = await fetch(`${API_BASE_URL}/rentals/cancelled?limit=all`);
     if (!response.ok) {
       const errorData = await response.json();
       throw new Error(errorData.error);
@@ -3,7 +3,7 @@ import { API_BASE_URL } from "../config";
 
 export const fetchAllVehicles = async () => {
   try {
-    const response = await fetch(`${API_BASE_URL}/vehicles`);
+    const response = await fetch(`${API_BASE_URL}/vehicles?limit=all`);
     if (!response.ok) {
       const errorData = await response.json();
       throw new Error(errorData.error);
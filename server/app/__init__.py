@@ -3,8 +3,10 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from config import Config
 from werkzeug.exceptions import UnsupportedMediaType, BadRequest
+from app.services.replicas import RoutingSession
 
-db = SQLAlchemy()
+# 只读查询可由会话路由到副本，见 app/services/replicas.py
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 
 
@@ -12,14 +14,70 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    # 连接池参数和 SQLite pragma
+    from app.services.database import configure_database, install_sqlite_pragmas
+    configure_database(app)
     db.init_app(app)
-    migrate.init_app(app, db)
+    with app.app_context():
+        install_sqlite_pragmas(app, db.engines.values())
+
+    # 只读副本路由
+    from app.services.replicas import replica_router
+    replica_router.init_app(app)
+
+    # 搜索索引的建表事件需要在 create_all 之前注册
+    from app.services.search import include_object
+    migrate.init_app(app, db, include_object=include_object)
 
     # 延迟导入路由
     with app.app_context():
         from app.routes import bp
         app.register_blueprint(bp)
 
+    from app.commands import analytics_cli, money_cli, reports_cli, vehicles_cli
+    app.cli.add_command(vehicles_cli)
+    app.cli.add_command(money_cli)
+    app.cli.add_command(reports_cli)
+    app.cli.add_command(analytics_cli)
+
+    # 按请求统计 SQL 语句
+    from app.services.instrumentation import sql_instrumentation
+    sql_instrumentation.init_app(app)
+
+    # 访问令牌与身份缓存
+    from app.services.auth import token_auth
+    token_auth.init_app(app)
+
+    # 车辆目录响应缓存
+    from app.services.response_cache import response_cache
+    response_cache.init_app(app)
+
+    # 按客户端限流和按接口类别限制并发
+    from app.services.rate_limit import rate_limiter
+    rate_limiter.init_app(app)
+
+    # 下单、充值的幂等键
+    from app.services.idempotency import idempotency_store
+    idempotency_store.init_app(app)
+
+    # 车辆可用性索引
+    from app.services.availability import availability_index
+    availability_index.init_app(app)
+
+    # 租赁历史的列式分析快照
+    from app.services.analytics import analytics_snapshot
+    analytics_snapshot.init_app(app)
+
+    # 密码哈希进程池
+    from app.services.hashing import password_hasher
+    password_hasher.init_app(app)
+
+    # 启动后台租赁状态调度器
+    from app.services.scheduler import rental_scheduler
+    rental_scheduler.init_app(app)
+    if app.config.get('RENTAL_SCHEDULER_ENABLED', True):
+        rental_scheduler.start()
+
     @app.errorhandler(UnsupportedMediaType)
     def handle_unsupported_media_type(e):
         return jsonify({'error': 'Invalid content type'}), 400
@@ -0,0 +1,147 @@
+"""ASGI 入口：只读高频接口走异步数据库路径，其余请求交给同步的 Flask 应用。
+
+不引入新的 Web 框架，只实现 GET 路由匹配和 JSON 响应；写接口、鉴权、流式导出等
+仍由 Flask 在线程池中处理，行为不变。异步路径只挂载与同步路由行为一致的接口，
+见 AsyncReadApp.sync_only_reason。
+"""
+import asyncio
+import logging
+import re
+from urllib.parse import parse_qsl
+from werkzeug.datastructures import MultiDict
+from app.routes.async_routes import ASYNC_ROUTES, SYNC_WHEN_CACHED_ATTR
+from app.services.async_db import async_db
+from app.services.proxy import forwarded_addr
+from app.services.rate_limit import ROUTE_CLASS_ATTR, rate_limiter
+from app.services.replicas import replica_router
+from app.services.response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+
+def compile_route(path):
+    # /api/vehicles/<vehicle_id> -> 命名分组，路径参数只接受整数，与同步路由的 <int:...> 一致
+    pattern = re.sub(r'<(\w+)>', r'(?P<\1>[0-9]+)', path)
+    return re.compile(f'^{pattern}$')
+
+
+class AsyncRequest:
+    def __init__(self, scope):
+        self.scope = scope
+        self.path = scope['path']
+        self.args = MultiDict(parse_qsl(
+            scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True,
+            encoding='utf-8', errors='replace'))
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1')
+                        for name, value in scope.get('headers', [])}
+
+
+class AsyncReadApp:
+    """包装 Flask 应用的 ASGI 应用。
+
+    cors_origin 不为空时，异步路径的响应带上 Access-Control-Allow-Origin，
+    与同步路径上 flask-cors 的行为一致。
+    """
+
+    def __init__(self, flask_app, cors_origin=None):
+        from uvicorn.middleware.wsgi import WSGIMiddleware
+
+        self.flask_app = flask_app
+        self.cors_origin = cors_origin
+        reason = self.sync_only_reason()
+        if reason:
+            logger.info('ASGI 异步路径未启用，所有请求由 Flask 处理：%s', reason)
+        # 启用了响应缓存时，车辆目录由同步路由处理，命中缓存时不访问数据库
+        cached = response_cache.backend is not None
+        self.routes = [] if reason else [
+            (compile_route(path), handler) for path, handler in ASYNC_ROUTES
+            if not (cached and getattr(handler, SYNC_WHEN_CACHED_ATTR, False))]
+        self.wsgi = WSGIMiddleware(flask_app, workers=flask_app.config['ASGI_WSGI_THREADS'])
+        async_db.init_app(flask_app)
+
+    def sync_only_reason(self):
+        """返回异步路径无法与同步路由保持一致的原因，此时不挂载任何异步接口。"""
+        # 同步路由按请求在主库和副本之间选择并返回 X-DB-Route，异步引擎只连接主库
+        if replica_router.keys:
+            return 'DATABASE_REPLICA_URLS 已配置'
+        # Server-Timing 和按接口的 SQL 统计在 Flask 的请求钩子中生成
+        if self.flask_app.config.get('SQL_INSTRUMENTATION_ENABLED', True):
+            return 'SQL_INSTRUMENTATION_ENABLED 已开启'
+        return None
+
+    def match(self, scope):
+        if scope['method'] != 'GET':
+            return None, None
+        for pattern, handler in self.routes:
+            matched = pattern.match(scope['path'])
+            if matched:
+                return handler, {name: int(value) for name, value in matched.groupdict().items()}
+        return None, None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] == 'http':
+            handler, kwargs = self.match(scope)
+            if handler is not None:
+                request = AsyncRequest(scope)
+                # 与同步路径共用令牌桶；异步路径不等待线程，不受并发信号量限制
+                limit = await self.rate_limit(handler, request, scope)
+                if limit is not None and not limit.allowed:
+                    return await self.respond(
+                        send, request, {'error': 'Too many requests, please retry later'}, 429,
+                        rate_limiter.headers(limit))
+                result = await self.handle(handler, request, kwargs)
+                if result is not None:
+                    headers = rate_limiter.headers(limit) if limit is not None else None
+                    return await self.respond(send, request, *result, headers)
+        return await self.wsgi(scope, receive, send)
+
+    async def rate_limit(self, handler, request, scope):
+        route_class = getattr(handler, ROUTE_CLASS_ATTR, None)
+        if route_class is None:
+            return None
+        # 与同步路径上的 ProxyFix 一样还原代理之后的客户端地址
+        remote_addr = forwarded_addr((scope.get('client') or ('unknown', 0))[0],
+                                     request.headers.get('x-forwarded-for'),
+                                     self.flask_app.config.get('PROXY_FIX_HOPS', 0))
+        authorization = request.headers.get('authorization')
+        if authorization:
+            # 与同步路径一样按用户计数；令牌缓存未命中时要查库，放到线程中执行
+            client = await asyncio.to_thread(self._client_key, authorization, remote_addr)
+        else:
+            client = rate_limiter.client_key(None, remote_addr)
+        return rate_limiter.consume(route_class, client)
+
+    def _client_key(self, authorization, remote_addr):
+        with self.flask_app.app_context():
+            return rate_limiter.client_key(authorization, remote_addr)
+
+    async def handle(self, handler, request, kwargs):
+        try:
+            async with async_db.session() as session:
+                return await handler(request, session, **kwargs)
+        except Exception as e:
+            return {'error': str(e)}, 500
+
+    async def respond(self, send, request, data, status, extra_headers=None):
+        # 与 jsonify 相同的序列化方式（紧凑格式、排序键、末尾换行）
+        body = (self.flask_app.json.dumps(data, separators=(',', ':')) + '\n').encode('utf-8')
+        headers = [(b'content-type', b'application/json'),
+                   (b'content-length', str(len(body)).encode('latin-1'))]
+        for name, value in (extra_headers or {}).items():
+            headers.append((name.lower().encode('latin-1'), value.encode('latin-1')))
+        if self.cors_origin and 'origin' in request.headers:
+            headers.append((b'access-control-allow-origin', self.cors_origin.encode('latin-1')))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await async_db.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
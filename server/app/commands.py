@@ -0,0 +1,130 @@
+import click
+from flask.cli import AppGroup
+
+vehicles_cli = AppGroup('vehicles', help='车辆相关的维护命令')
+
+
+@vehicles_cli.command('rebuild-status')
+@click.option('--check', is_flag=True, help='只检查不一致，不写入数据库')
+def rebuild_status(check):
+    """根据租赁历史重建车辆的当前租赁状态。"""
+    from app.services.vehicle_status import rebuild_vehicle_status
+
+    mismatches = rebuild_vehicle_status(dry_run=check)
+    for item in mismatches:
+        click.echo(f"车辆 {item['vehicle_id']}: current_rental_id={item['current_rental_id']}, "
+                   f"current_status={item['current_status']}")
+    if check:
+        click.echo(f'发现 {len(mismatches)} 辆车状态不一致')
+        if mismatches:
+            raise SystemExit(1)
+    else:
+        click.echo(f'已修复 {len(mismatches)} 辆车的状态')
+
+
+money_cli = AppGroup('money', help='余额流水相关的维护命令')
+
+
+@money_cli.command('snapshot')
+@click.option('--settle-seconds', default=60, show_default=True,
+              help='只合并早于该秒数的流水')
+def snapshot(settle_seconds):
+    """推进余额快照，建议由 cron 定期执行。"""
+    from app.services.ledger import snapshot_balances
+
+    changed = snapshot_balances(settle_seconds=settle_seconds)
+    click.echo(f'已更新 {changed} 个客户的余额快照')
+
+
+@money_cli.command('reconcile')
+def reconcile():
+    """核对客户余额与流水重放结果是否一致。"""
+    from app.services.ledger import reconcile_balances
+
+    mismatches = reconcile_balances()
+    for item in mismatches:
+        click.echo(f"客户 {item['customer_id']}: money={item['money']}, "
+                   f"ledger_balance={item['ledger_balance']}")
+    click.echo(f'发现 {len(mismatches)} 个客户余额与流水不一致')
+    if mismatches:
+        raise SystemExit(1)
+
+
+@vehicles_cli.command('import')
+@click.argument('file', type=click.File('r', encoding='utf-8-sig'))
+@click.option('--format', 'fmt', type=click.Choice(['json', 'ndjson', 'csv']),
+              help='文件格式，默认根据扩展名判断')
+@click.option('--batch-size', default=1000, show_default=True, help='每批校验和写入的行数')
+def import_vehicles_command(file, fmt, batch_size):
+    """从 JSON / NDJSON / CSV 文件批量导入车辆，FILE 为 - 时读取标准输入。"""
+    from app.services.vehicle_import import import_vehicles, iter_records
+
+    if fmt is None:
+        extension = file.name.rsplit('.', 1)[-1].lower()
+        fmt = {'jsonl': 'ndjson'}.get(extension, extension)
+        if fmt not in ('json', 'ndjson', 'csv'):
+            raise click.UsageError('无法根据扩展名判断文件格式，请使用 --format')
+
+    result = import_vehicles(iter_records(file, fmt), batch_size=batch_size)
+    for error in result['errors']:
+        click.echo(f"第 {error['row']} 行 {error['plate_number'] or ''}: {error['error']}")
+    click.echo(f"共 {result['total']} 行，导入 {result['inserted']} 辆车，"
+               f"{result['error_count']} 行失败")
+    if result['error_count']:
+        raise SystemExit(1)
+
+
+reports_cli = AppGroup('reports', help='报表汇总表相关的维护命令')
+
+
+@reports_cli.command('backfill')
+@click.option('--start', type=click.DateTime(['%Y-%m-%d']), help='起始日期（包含），默认不限')
+@click.option('--end', type=click.DateTime(['%Y-%m-%d']), help='结束日期（不包含），默认不限')
+def backfill(start, end):
+    """根据租赁记录重新计算每日汇总表。"""
+    from app.services.reports import backfill_daily_stats
+
+    written = backfill_daily_stats(start.date() if start else None, end.date() if end else None)
+    click.echo(f'已写入 {written} 行每日汇总')
+
+
+analytics_cli = AppGroup('analytics', help='列式分析快照相关的命令')
+
+
+@analytics_cli.command('refresh')
+@click.option('--full', is_flag=True, help='丢弃现有快照并重建')
+def refresh_analytics(full):
+    """从数据库增量刷新租赁历史的列式快照，建议由 cron 定期执行。"""
+    from app.services.analytics import AnalyticsError, analytics_snapshot
+
+    try:
+        result = analytics_snapshot.refresh(full=full)
+    except AnalyticsError as e:
+        raise click.ClickException(e.message)
+    click.echo(f"追加 {result['appended']} 行，更新 {result['updated']} 行，"
+               f"快照共 {result['rows']} 行")
+
+
+@analytics_cli.command('query')
+@click.argument('report', type=click.Choice(['summary', 'lateness', 'elasticity']))
+@click.option('--metric', default='total_fee', show_default=True,
+              help='summary 统计的指标：total_fee / duration_days / daily_price / lateness_hours')
+@click.option('--by', help='分组字段：status / brand / type')
+@click.option('--bins', default=5, show_default=True, help='elasticity 的价格分段数')
+def query_analytics(report, metric, by, bins):
+    """在快照上执行分析查询，以 JSON 输出结果。"""
+    import json
+    from app.services.analytics import (AnalyticsError, analytics_snapshot, price_elasticity,
+                                        return_lateness, summarize)
+
+    try:
+        view = analytics_snapshot.view()
+        if report == 'summary':
+            data = summarize(view, metric, by)
+        elif report == 'lateness':
+            data = return_lateness(view, by)
+        else:
+            data = price_elasticity(view, by or 'type', bins)
+    except AnalyticsError as e:
+        raise click.ClickException(e.message)
+    click.echo(json.dumps(data, ensure_ascii=False, indent=2))
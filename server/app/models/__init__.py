@@ -2,5 +2,10 @@ from app.models.vehicle import Vehicle
 from app.models.customer import Customer
 from app.models.rental import Rental
 from app.models.users import Users
+from app.models.ledger import MoneyLedger, BalanceSnapshot
+from app.models.report import RentalDailyStats
+from app.models.replica import ReplicaHeartbeat
+from app.models.idempotency import IdempotencyKey
 
-__all__ = ['Vehicle', 'Customer', 'Rental', 'User'] 
\ No newline at end of file
+__all__ = ['Vehicle', 'Customer', 'Rental', 'Users', 'MoneyLedger', 'BalanceSnapshot', 'RentalDailyStats',
+           'ReplicaHeartbeat', 'IdempotencyKey']
@@ -4,6 +4,13 @@ from datetime import datetime, timezone
 
 class Customer(db.Model):
     __tablename__ = 'customers'
+    __table_args__ = (
+        # 客户列表；user_id 与 id_card 已由唯一约束建立索引
+        db.Index('ix_customers_is_deleted_customer_id',
+                 'is_deleted', 'customer_id'),
+        # 注册和修改资料时的手机号查重
+        db.Index('ix_customers_phone_is_deleted', 'phone', 'is_deleted'),
+    )
 
     customer_id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey(
@@ -16,8 +23,12 @@ class Customer(db.Model):
     updated_at = db.Column(
         db.DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
     is_deleted = db.Column(db.Boolean, default=False, nullable=False)
+    # 乐观锁版本号，并发修改同一行时后提交的一方会失败重试
+    version = db.Column(db.Integer, nullable=False, default=1)
     money = db.Column(db.Numeric(10, 2), nullable=True)
 
+    __mapper_args__ = {'version_id_col': version}
+
     rentals = db.relationship('Rental', backref='customer', lazy=True)
 
     def to_dict(self):
@@ -0,0 +1,16 @@
+from app import db
+
+
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+
+    # 客户端标识和 Idempotency-Key 请求头的摘要，见 app/services/idempotency.py
+    key = db.Column(db.String(255), primary_key=True)
+    # 请求方法、路径和请求体的摘要，同一个键用于不同请求时拒绝
+    request_hash = db.Column(db.String(64), nullable=False)
+    # pending（执行中）或 completed（已保存响应）
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    response_status = db.Column(db.Integer)
+    response_body = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
@@ -0,0 +1,43 @@
+from app import db
+from datetime import datetime
+
+
+class MoneyLedger(db.Model):
+    __tablename__ = 'money_ledger'
+    __table_args__ = (
+        db.Index('ix_money_ledger_customer_id_ledger_id',
+                 'customer_id', 'ledger_id'),
+    )
+
+    # 只追加不修改的余额流水
+    ledger_id = db.Column(db.Integer, primary_key=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey(
+        'customers.customer_id', ondelete='RESTRICT'), nullable=False)
+    delta = db.Column(db.Numeric(10, 2), nullable=False)
+    balance_after = db.Column(db.Numeric(10, 2), nullable=False)
+    reason = db.Column(db.String(20), nullable=False)
+    rental_id = db.Column(db.Integer, db.ForeignKey(
+        'rentals.rental_id', ondelete='RESTRICT'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+
+    def to_dict(self):
+        return {
+            'ledger_id': self.ledger_id,
+            'customer_id': self.customer_id,
+            'delta': float(self.delta),
+            'balance_after': float(self.balance_after),
+            'reason': self.reason,
+            'rental_id': self.rental_id,
+            'created_at': self.created_at.isoformat(),
+        }
+
+
+class BalanceSnapshot(db.Model):
+    __tablename__ = 'balance_snapshots'
+
+    # 每个客户只保留最新快照：截至 ledger_id 的流水累计余额
+    customer_id = db.Column(db.Integer, db.ForeignKey(
+        'customers.customer_id', ondelete='RESTRICT'), primary_key=True)
+    ledger_id = db.Column(db.Integer, nullable=False)
+    balance = db.Column(db.Numeric(10, 2), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
@@ -4,6 +4,23 @@ from datetime import datetime, timezone
 
 class Rental(db.Model):
     __tablename__ = 'rentals'
+    __table_args__ = (
+        # 各状态列表接口
+        db.Index('ix_rentals_status_rental_id', 'status', 'rental_id'),
+        # 下单时检查客户是否有逾期租赁
+        db.Index('ix_rentals_customer_id_status', 'customer_id', 'status'),
+        # 下单时检查车辆是否已租出
+        db.Index('ix_rentals_vehicle_id_status', 'vehicle_id', 'status'),
+        # 逾期扫描
+        db.Index('ix_rentals_status_expected_return_time',
+                 'status', 'expected_return_time'),
+        # 车辆列表按车辆取最新租赁
+        db.Index('ix_rentals_vehicle_id_created_at', 'vehicle_id', 'created_at'),
+        # 只包含未结束租赁的部分索引
+        db.Index('ix_rentals_active_vehicle_id', 'vehicle_id',
+                 postgresql_where=db.text("status IN ('ongoing', 'overdue')"),
+                 sqlite_where=db.text("status IN ('ongoing', 'overdue')")),
+    )
 
     rental_id = db.Column(db.Integer, primary_key=True)
     vehicle_id = db.Column(db.Integer, db.ForeignKey(
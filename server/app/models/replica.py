@@ -0,0 +1,9 @@
+from app import db
+
+
+class ReplicaHeartbeat(db.Model):
+    __tablename__ = 'replica_heartbeat'
+
+    # 主库定期写入当前时间，副本上读到的值与主库之差即复制延迟
+    id = db.Column(db.Integer, primary_key=True)
+    beat_at = db.Column(db.DateTime, nullable=False)
@@ -0,0 +1,22 @@
+from app import db
+
+
+class RentalDailyStats(db.Model):
+    __tablename__ = 'rental_daily_stats'
+
+    # 按 (日期, 车型, 品牌) 汇总的租赁指标，由下单、取消、还车在同一事务内增量维护
+    stat_date = db.Column(db.Date, primary_key=True)
+    vehicle_type = db.Column(db.String(50), primary_key=True)
+    brand = db.Column(db.String(50), primary_key=True)
+    # 以下计数按租赁开始日期归属
+    rentals = db.Column(db.Integer, nullable=False, default=0)
+    cancelled = db.Column(db.Integer, nullable=False, default=0)
+    refunded = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    returned_late = db.Column(db.Integer, nullable=False, default=0)
+    # 扣除退款后的租金和租赁天数
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    booked_days = db.Column(db.Integer, nullable=False, default=0)
+    # 已归还的租赁在当天占用车辆的小时数，按实际占用的日期拆分
+    occupied_hours = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+
@@ -4,6 +4,11 @@ from datetime import datetime, timezone
 
 class Vehicle(db.Model):
     __tablename__ = 'vehicles'
+    __table_args__ = (
+        # 车辆列表
+        db.Index('ix_vehicles_is_deleted_vehicle_id',
+                 'is_deleted', 'vehicle_id'),
+    )
 
     vehicle_id = db.Column(db.Integer, primary_key=True)
     type = db.Column(db.String(50), nullable=False)
@@ -16,7 +21,14 @@ class Vehicle(db.Model):
     updated_at = db.Column(
         db.DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
     is_deleted = db.Column(db.Boolean, default=False, nullable=False)
-    
+    # 乐观锁版本号，并发修改同一行时后提交的一方会失败重试
+    version = db.Column(db.Integer, nullable=False, default=1)
+    # 冗余保存最新一笔租赁及其状态，由租赁相关操作在同一事务内维护
+    current_rental_id = db.Column(db.Integer, nullable=True)
+    current_status = db.Column(db.String(20), nullable=True)
+
+    __mapper_args__ = {'version_id_col': version}
+
     rentals = db.relationship('Rental', backref='vehicle', lazy=True)
 
     def to_dict(self):
@@ -6,4 +6,6 @@ from app.routes import user_routes
 from app.routes import rental_routes
 from app.routes import vehicle_routes
 from app.routes import customer_routes
-from app.routes import money_routes
\ No newline at end of file
+from app.routes import money_routes
+from app.routes import report_routes
+from app.routes import analytics_routes
\ No newline at end of file
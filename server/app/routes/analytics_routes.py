@@ -0,0 +1,77 @@
+from flask import jsonify, request
+from app.routes import bp
+from app.services.analytics import (DEFAULT_PERCENTILES, AnalyticsError, analytics_snapshot,
+                                    price_elasticity, return_lateness, summarize)
+
+
+def parse_percentiles(value):
+    if not value:
+        return DEFAULT_PERCENTILES
+    try:
+        percentiles = tuple(float(item) for item in value.split(','))
+    except ValueError:
+        raise AnalyticsError('Invalid percentiles')
+    if any(not 0 <= percentile <= 100 for percentile in percentiles):
+        raise AnalyticsError('Percentiles must be between 0 and 100')
+    return percentiles
+
+
+@bp.route('/api/_debug/analytics', methods=['GET'])
+def get_analytics_stats():
+    return jsonify(analytics_snapshot.stats())
+
+
+@bp.route('/api/_debug/analytics/refresh', methods=['POST'])
+def refresh_analytics():
+    try:
+        # 从数据库增量刷新列式快照，full=1 时重建
+        full = request.args.get('full', '').lower() in ('1', 'true', 'yes')
+        return jsonify(analytics_snapshot.refresh(full=full))
+    except AnalyticsError as e:
+        return jsonify({'error': e.message}), e.status_code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/_debug/analytics/summary', methods=['GET'])
+def get_analytics_summary():
+    try:
+        # 如 ?metric=daily_price&by=type&status=completed&percentiles=50,90
+        statuses = request.args.get('status')
+        data = summarize(analytics_snapshot.view(),
+                         request.args.get('metric', 'total_fee'),
+                         request.args.get('by'),
+                         parse_percentiles(request.args.get('percentiles')),
+                         statuses.split(',') if statuses else None)
+        return jsonify({'data': data})
+    except AnalyticsError as e:
+        return jsonify({'error': e.message}), e.status_code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/_debug/analytics/lateness', methods=['GET'])
+def get_analytics_lateness():
+    try:
+        # 还车晚于预计归还时间的小时数分布
+        data = return_lateness(analytics_snapshot.view(), request.args.get('by'),
+                               parse_percentiles(request.args.get('percentiles')))
+        return jsonify({'data': data})
+    except AnalyticsError as e:
+        return jsonify({'error': e.message}), e.status_code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/_debug/analytics/elasticity', methods=['GET'])
+def get_analytics_elasticity():
+    try:
+        bins = int(request.args.get('bins', 5))
+        data = price_elasticity(analytics_snapshot.view(), request.args.get('by', 'type'), bins)
+        return jsonify({'data': data})
+    except ValueError:
+        return jsonify({'error': 'Invalid bins'}), 400
+    except AnalyticsError as e:
+        return jsonify({'error': e.message}), e.status_code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,123 @@
+"""只读接口的异步实现，由 app/asgi.py 挂载在同步路由之前。
+
+请求参数、响应格式与同步路由一致；等待数据库时不占用线程，适合高并发的列表查询。
+处理函数返回 (数据, 状态码)，返回 None 时交给同步路由处理（如流式导出）。
+异步引擎只连接主库，配置了 DATABASE_REPLICA_URLS 或开启 SQL 统计时不挂载这些接口。
+"""
+from sqlalchemy import select
+from app.models import Customer, Rental, Vehicle
+from app.services.pagination import PaginationError, apply_page, page_body, parse_page_args, split_page
+from app.services.rate_limit import rate_limiter
+from app.services.serializers import format_rental_list_row, rental_list_select
+from app.services.streaming import wants_stream
+from app.routes.rental_routes import RENTAL_FILTER_FIELDS, RENTAL_SORT_FIELDS, VALID_RENTAL_STATUS
+from app.routes.vehicle_routes import VEHICLE_FILTER_FIELDS, VEHICLE_SORT_FIELDS
+
+
+# 带有该属性的处理函数在启用响应缓存时不挂载，由同步路由统一处理缓存、ETag 和失效
+SYNC_WHEN_CACHED_ATTR = 'sync_when_cached'
+
+
+def sync_when_cached(handler):
+    setattr(handler, SYNC_WHEN_CACHED_ATTR, True)
+    return handler
+
+
+async def paginate_async(session, statement, params, pk_column):
+    # 与 pagination.paginate 相同的键集分页，查询由异步会话执行
+    statement = apply_page(statement, params, pk_column)
+    if params.limit is None:
+        return (await session.execute(statement)).all(), None
+    rows = (await session.execute(statement.limit(params.limit + 1))).all()
+    return split_page(rows, params, pk_column)
+
+
+@sync_when_cached
+@rate_limiter.limit('catalog')
+async def get_vehicles(request, session):
+    try:
+        params = parse_page_args(
+            request.args, VEHICLE_SORT_FIELDS, VEHICLE_FILTER_FIELDS, 'vehicle_id')
+        rows, next_cursor = await paginate_async(
+            session, select(Vehicle).where(Vehicle.is_deleted == False), params, Vehicle.vehicle_id)
+        return page_body([{**vehicle.to_dict(), 'status': vehicle.current_status} for vehicle, in rows],
+                         next_cursor, params, len(rows)), 200
+    except PaginationError as e:
+        return {'error': str(e)}, 400
+
+
+@sync_when_cached
+async def get_vehicle(request, session, vehicle_id):
+    vehicle = (await session.execute(
+        select(Vehicle).where(Vehicle.vehicle_id == vehicle_id, Vehicle.is_deleted == False)
+    )).scalar()
+    if not vehicle:
+        return {'error': 'Vehicle not found'}, 404
+    return vehicle.to_dict(), 200
+
+
+async def list_rentals(request, session, statuses, grouped):
+    # 流式导出仍由同步路由处理
+    if wants_stream(request.args):
+        return None
+    try:
+        params = parse_page_args(
+            request.args, RENTAL_SORT_FIELDS, RENTAL_FILTER_FIELDS, 'rental_id')
+        rows, next_cursor = await paginate_async(
+            session, rental_list_select(statuses), params, Rental.rental_id)
+    except PaginationError as e:
+        return {'error': str(e)}, 400
+    if grouped:
+        data = {status: [] for status in statuses}
+        for row in rows:
+            data[row.status].append(format_rental_list_row(row))
+    else:
+        data = [format_rental_list_row(row) for row in rows]
+    return page_body(data, next_cursor, params, len(rows)), 200
+
+
+async def get_rentals(request, session):
+    status_arg = request.args.get('status')
+    statuses = status_arg.split(',') if status_arg else VALID_RENTAL_STATUS
+    invalid = [status for status in statuses if status not in VALID_RENTAL_STATUS]
+    if invalid:
+        return {'error': f'Invalid rental status: {", ".join(invalid)}'}, 400
+    return await list_rentals(request, session, list(dict.fromkeys(statuses)), grouped=True)
+
+
+def status_list(status):
+    async def handler(request, session):
+        return await list_rentals(request, session, [status], grouped=False)
+    return handler
+
+
+async def get_customer(request, session, customer_id):
+    customer = (await session.execute(
+        select(Customer).where(Customer.customer_id == customer_id, Customer.is_deleted == False)
+    )).scalar()
+    if not customer:
+        return {'error': 'Customer not found'}, 404
+    return customer.to_dict(), 200
+
+
+async def get_money(request, session, customer_id):
+    money = (await session.execute(
+        select(Customer.money).where(Customer.customer_id == customer_id)
+    )).first()
+    if money is None:
+        return {'error': '未找到对应id的用户'}, 404
+    return {'money': float(money.money)}, 200
+
+
+# (路径, 处理函数)，只处理 GET 请求，路径参数均为整数
+ASYNC_ROUTES = [
+    ('/api/vehicles', get_vehicles),
+    ('/api/vehicles/<vehicle_id>', get_vehicle),
+    ('/api/rentals', get_rentals),
+    ('/api/rentals/ongoing', status_list('ongoing')),
+    ('/api/rentals/overdue', status_list('overdue')),
+    ('/api/rentals/finished', status_list('completed')),
+    ('/api/rentals/cancelled', status_list('cancelled')),
+    ('/api/customers/<customer_id>', get_customer),
+    ('/api/money/<customer_id>', get_money),
+]
@@ -3,35 +3,60 @@ from flask import jsonify, request, Blueprint
 from app.routes import bp
 from app.models import Customer, Rental, Users
 from app import db
+from sqlalchemy.orm.exc import StaleDataError
+from app.services.pagination import PaginationError, apply_page, page_body, parse_page_args, paginate
+from app.services.streaming import wants_stream, stream_response
+from app.services.search import DEFAULT_SEARCH_LIMIT, customer_search
+from app.services.serializers import rental_history_query, format_rental
+from app.services.rate_limit import rate_limiter
+from app.services.auth import token_auth
 
 ID_CARD_PATTERN = re.compile(r'^\d{17}[\dXx]$')
 PHONE_NUMBER_PATTERN = re.compile(r'^\d{11}$')
 
+# 客户列表允许的排序字段和过滤参数
+CUSTOMER_SORT_FIELDS = {
+    'customer_id': Customer.customer_id,
+    'name': Customer.name,
+}
+CUSTOMER_FILTER_FIELDS = {
+    'name': (Customer.name, 'eq'),
+    'phone': (Customer.phone, 'eq'),
+}
+
+
+def format_customer(row):
+    customer, username = row
+    return {
+        **customer.to_dict(),  # Customer 表字段
+        'username': username   # 添加 username 字段
+    }
+
 
 @bp.route('/api/customers/all', methods=['GET'])
 def get_customers():
     try:
         # 联表查询 Customer 和 User，排除已删除的客户
-        customers = (
+        params = parse_page_args(
+            request.args, CUSTOMER_SORT_FIELDS, CUSTOMER_FILTER_FIELDS, 'customer_id')
+        query = (
             db.session.query(Customer, Users.username)
             .join(Users, Customer.user_id == Users.user_id, isouter=True)
             .filter(Customer.is_deleted == False)
-            .all()
         )
+        if wants_stream(request.args):
+            query = apply_page(query, params, Customer.customer_id).limit(params.limit)
+            return stream_response(query, format_customer, request.args['format'])
+
+        customers, next_cursor = paginate(query, params, Customer.customer_id)
 
         # 构造返回数据
-        result = {
-            'data': [
-                {
-                    **customer.to_dict(),  # Customer 表字段
-                    'username': username   # 添加 username 字段
-                }
-                for customer, username in customers
-            ],
-            'total': len(customers)
-        }
+        result = page_body([format_customer(row) for row in customers], next_cursor, params,
+                           len(customers))
 
         return jsonify(result)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -51,21 +76,20 @@ def get_customer_by_id(customer_id):
 
 
 @bp.route('/api/customers', methods=['GET'])
+@rate_limiter.limit('search')
 def search_customers():
     try:
         search_text = request.args.get('search', '').strip()
         if not search_text:
             return jsonify([])
 
-        # 搜索客户，排除已删除的客户
-        customers = (
-            Customer.query.filter(
-                (Customer.name.ilike(f'%{search_text}%')) |
-                (Customer.id_card.ilike(f'%{search_text}%'))
-            )
-            .filter(Customer.is_deleted == False)
-            .all()
-        )
+        try:
+            limit = int(request.args.get('limit', DEFAULT_SEARCH_LIMIT))
+        except ValueError:
+            return jsonify({'error': 'Invalid limit'}), 400
+
+        # 搜索客户并按相关度排序，排除已删除的客户
+        customers = customer_search.search(search_text, limit)
         return jsonify([customer.to_dict() for customer in customers])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -80,10 +104,15 @@ def delete_customer(customer_id):
         if not customer:
             return jsonify({'error': 'Customer not found'}), 404
 
-        # 软删除客户
+        # 软删除客户，关联用户已签发的令牌随之失效
         customer.is_deleted = True
         db.session.commit()
+        token_auth.invalidate_user(customer.user_id)
         return '', 204
+    except StaleDataError:
+        # 下单、充值等并发写入更新了版本号
+        db.session.rollback()
+        return jsonify({'error': 'Customer was modified concurrently, please retry'}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -139,6 +168,9 @@ def update_customer(customer_id):
         # 提交事务
         db.session.commit()
         return jsonify(customer.to_dict())
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({'error': 'Customer was modified concurrently, please retry'}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -147,14 +179,15 @@ def update_customer(customer_id):
 @bp.route('/api/customers/<int:id>/rentals', methods=['GET'])
 def get_customer_rental_history(id):
     try:
-        # 查找客户，排除已删除的客户
-        customer = Customer.query.filter_by(
-            customer_id=id).filter_by(is_deleted=False).first()
-        if not customer:
-            return jsonify({'error': 'Customer not found'}), 404
-
-        # 获取客户的租赁记录
-        rentals = Rental.query.filter_by(customer_id=id).all()
-        return jsonify([rental.to_dict() for rental in rentals])
+        # 获取客户的租赁记录，排除已删除的客户
+        rentals = rental_history_query(id).all()
+        # 没有租赁记录时再确认客户是否存在
+        if not rentals:
+            customer = Customer.query.filter_by(
+                customer_id=id).filter_by(is_deleted=False).first()
+            if not customer:
+                return jsonify({'error': 'Customer not found'}), 404
+
+        return jsonify([format_rental(row) for row in rentals])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -3,6 +3,8 @@ from app.routes import bp
 from app.models import Customer, Users
 from app import db
 from decimal import Decimal
+from app.services.ledger import apply_balance_change, customer_ledger
+from app.services.idempotency import idempotency_store
 
 @bp.route('/api/money/<int:customer_id>', methods=['GET'])
 def get_money(customer_id):
@@ -14,6 +16,7 @@ def get_money(customer_id):
 
 
 @bp.route('/api/money/<int:customer_id>', methods=['POST'])
+@idempotency_store.idempotent
 def recharge(customer_id):
     try:
         data = request.get_json()
@@ -22,14 +25,26 @@ def recharge(customer_id):
         if amount <= 0:
             return jsonify({'error': '充值余额不得少于0'}), 400
 
-        customer = Customer.query.filter_by(customer_id=customer_id).first()
-        if not customer:
+        # 原子地增加余额并记录流水
+        new_money = apply_balance_change(customer_id, amount, 'recharge')
+        if new_money is None:
+            db.session.rollback()
             return jsonify({'error': '未找到对应id的用户'}), 404
-
-        customer.money += amount
         db.session.commit()
 
-        return jsonify({'message': '充值成功', 'new_money': float(customer.money)}), 200
+        return jsonify({'message': '充值成功', 'new_money': float(new_money)}), 200
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/money/<int:customer_id>/ledger', methods=['GET'])
+def get_money_ledger(customer_id):
+    try:
+        limit = min(int(request.args.get('limit', 50)), 500)
+        entries = customer_ledger(customer_id, limit)
+        return jsonify([entry.to_dict() for entry in entries]), 200
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,61 +1,90 @@
 from flask import jsonify, request
-from sqlalchemy import or_
 from app.routes import bp
 from app.models import Rental, Vehicle, Customer
 from app import db
+from app.services.scheduler import rental_scheduler
+from app.services.pagination import PaginationError, apply_page, page_body, parse_page_args, paginate
+from app.services.streaming import wants_stream, stream_response
+from app.services.serializers import (customer_rentals_query, format_customer_rental,
+                                     rental_list_query, format_rental_list_row, parse_local_datetime)
+from app.services.vehicle_status import mark_rental_finished
+from app.services.response_cache import invalidate_vehicle_list
+from app.services.booking import BookingError, book_vehicle
+from app.services.availability import availability_index
+from app.services.ledger import apply_balance_change
+from app.services.reports import record_rental_event
+from app.services.idempotency import idempotency_store
 from datetime import datetime, timedelta
-from decimal import Decimal
-
-VALID_RENTAL_STATUS = ['ongoing', 'completed', 'overdue', 'cancelled']
-
-
-def check_and_update_rental_status():
+from sqlalchemy import update
+
+VALID_RENTAL_STATUS = ['reserved', 'ongoing', 'completed', 'overdue', 'cancelled']
+# 客户端与服务器的时钟误差，开始时间早于当前时间但在此范围内时视为立即起租
+START_TIME_TOLERANCE = timedelta(minutes=5)
+
+# 租赁列表允许的排序字段和过滤参数
+RENTAL_SORT_FIELDS = {
+    'rental_id': Rental.rental_id,
+    'start_time': Rental.start_time,
+    'expected_return_time': Rental.expected_return_time,
+    'total_fee': Rental.total_fee,
+}
+RENTAL_FILTER_FIELDS = {
+    'customer_id': (Rental.customer_id, 'eq'),
+    'vehicle_id': (Rental.vehicle_id, 'eq'),
+    'start_from': (Rental.start_time, 'ge'),
+    'start_to': (Rental.start_time, 'lt'),
+}
+
+
+@bp.route('/api/rentals/scheduler/metrics', methods=['GET'])
+def get_scheduler_metrics():
+    return jsonify(rental_scheduler.metrics())
+
+
+def list_rentals(statuses, grouped):
+    params = parse_page_args(
+        request.args, RENTAL_SORT_FIELDS, RENTAL_FILTER_FIELDS, 'rental_id')
+    query = rental_list_query(statuses)
+
+    # 流式导出：服务端游标逐行序列化
+    if wants_stream(request.args):
+        query = apply_page(query, params, Rental.rental_id).limit(params.limit)
+        return stream_response(query, format_rental_list_row, request.args['format'])
+
+    rentals, next_cursor = paginate(query, params, Rental.rental_id)
+    if grouped:
+        # 按状态分组返回
+        data = {status: [] for status in statuses}
+        for row in rentals:
+            data[row.status].append(format_rental_list_row(row))
+    else:
+        data = [format_rental_list_row(row) for row in rentals]
+    return jsonify(page_body(data, next_cursor, params, len(rentals)))
+
+
+@bp.route('/api/rentals', methods=['GET'])
+def get_rentals():
     try:
-        # 检查并更新租赁状态
-        overdue_rentals = Rental.query.filter(
-            Rental.status == 'ongoing',
-            Rental.expected_return_time < datetime.now()
-        ).all()
-
-        for rental in overdue_rentals:
-            rental.status = 'overdue'
-            db.session.add(rental)
-
-        db.session.commit()
+        # 一次查询获取多个状态的租赁记录，如 ?status=ongoing,overdue
+        status_arg = request.args.get('status')
+        statuses = status_arg.split(',') if status_arg else VALID_RENTAL_STATUS
+        invalid = [status for status in statuses if status not in VALID_RENTAL_STATUS]
+        if invalid:
+            return jsonify({'error': f'Invalid rental status: {", ".join(invalid)}'}), 400
+        return list_rentals(list(dict.fromkeys(statuses)), grouped=True)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        db.session.rollback()
-        print(f"Error updating rental status: {e}")
+        return jsonify({'error': str(e)}), 500
 
 
 @bp.route('/api/rentals/ongoing', methods=['GET'])
 def get_ongoing_rentals():
     try:
         # 获取进行中的租赁记录
-        rentals = (
-            db.session.query(Rental, Customer.name,
-                             Customer.phone, Vehicle.plate_number)
-            .join(Customer, Rental.customer_id == Customer.customer_id, isouter=True)
-            .join(Vehicle, Rental.vehicle_id == Vehicle.vehicle_id, isouter=True)
-            .filter(Rental.status == 'ongoing')
-            .all()
-        )
-
-        result = {
-            'data': [
-                {
-                    'rental_id': rental.rental_id,
-                    'plate_number': plate_number,
-                    'name': name,
-                    'phone': phone,
-                    'total_fee': rental.total_fee,
-                    'expected_return_time': rental.expected_return_time.strftime('%Y-%m-%d %H:%M:%S') if rental.expected_return_time else None,
-                }
-                for rental, name, phone, plate_number in rentals
-            ],
-            'total': len(rentals)
-        }
-
-        return jsonify(result)
+        return list_rentals(['ongoing'], grouped=False)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -63,32 +92,10 @@ def get_ongoing_rentals():
 @bp.route('/api/rentals/overdue', methods=['GET'])
 def get_overdue_rentals():
     try:
-        # 获取逾期的租赁记录，排除已删除的记录
-        rentals = (
-            db.session.query(Rental, Customer.name,
-                             Customer.phone, Vehicle.plate_number)
-            .join(Customer, Rental.customer_id == Customer.customer_id, isouter=True)
-            .join(Vehicle, Rental.vehicle_id == Vehicle.vehicle_id, isouter=True)
-            .filter(Rental.status == 'overdue')
-            .all()
-        )
-
-        result = {
-            'data': [
-                {
-                    'rental_id': rental.rental_id,
-                    'plate_number': plate_number,
-                    'name': name,
-                    'phone': phone,
-                    'total_fee': rental.total_fee,
-                    'expected_return_time': rental.expected_return_time.strftime('%Y-%m-%d %H:%M:%S') if rental.expected_return_time else None,
-                }
-                for rental, name, phone, plate_number in rentals
-            ],
-            'total': len(rentals)
-        }
-
-        return jsonify(result)
+        # 获取逾期的租赁记录
+        return list_rentals(['overdue'], grouped=False)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -96,32 +103,10 @@ def get_overdue_rentals():
 @bp.route('/api/rentals/finished', methods=['GET'])
 def get_finished_rentals():
     try:
-        # 获取已完成的租赁记录，排除已删除的记录
-        rentals = (
-            db.session.query(Rental, Customer.name,
-                             Customer.phone, Vehicle.plate_number)
-            .join(Customer, Rental.customer_id == Customer.customer_id, isouter=True)
-            .join(Vehicle, Rental.vehicle_id == Vehicle.vehicle_id, isouter=True)
-            .filter(Rental.status == 'completed')
-            .all()
-        )
-
-        result = {
-            'data': [
-                {
-                    'rental_id': rental.rental_id,
-                    'plate_number': plate_number,
-                    'name': name,
-                    'phone': phone,
-                    'total_fee': rental.total_fee,
-                    'actual_return_time': rental.actual_return_time.strftime('%Y-%m-%d %H:%M:%S') if rental.actual_return_time else None,
-                }
-                for rental, name, phone, plate_number in rentals
-            ],
-            'total': len(rentals)
-        }
-
-        return jsonify(result)
+        # 获取已完成的租赁记录
+        return list_rentals(['completed'], grouped=False)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -129,32 +114,10 @@ def get_finished_rentals():
 @bp.route('/api/rentals/cancelled', methods=['GET'])
 def get_canceled_rentals():
     try:
-        # 获取已取消的租赁记录，排除已删除的记录
-        rentals = (
-            db.session.query(Rental, Customer.name,
-                             Customer.phone, Vehicle.plate_number)
-            .join(Customer, Rental.customer_id == Customer.customer_id, isouter=True)
-            .join(Vehicle, Rental.vehicle_id == Vehicle.vehicle_id, isouter=True)
-            .filter(Rental.status == 'cancelled')
-            .all()
-        )
-
-        result = {
-            'data': [
-                {
-                    'rental_id': rental.rental_id,
-                    'plate_number': plate_number,
-                    'name': name,
-                    'phone': phone,
-                    'total_fee': rental.total_fee,
-                    'actual_return_time': rental.actual_return_time.strftime('%Y-%m-%d %H:%M:%S') if rental.actual_return_time else None,
-                }
-                for rental, name, phone, plate_number in rentals
-            ],
-            'total': len(rentals)
-        }
-
-        return jsonify(result)
+        # 获取已取消的租赁记录
+        return list_rentals(['cancelled'], grouped=False)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -162,7 +125,6 @@ def get_canceled_rentals():
 @bp.route('/api/rentals/<int:rental_id>', methods=['GET'])
 def get_rental(rental_id):
     try:
-        check_and_update_rental_status()
         # 获取指定租赁记录
         rental = Rental.query.filter_by(
             rental_id=rental_id).first()
@@ -176,44 +138,19 @@ def get_rental(rental_id):
 @bp.route('/api/rentals/customer/<int:customer_id>', methods=['GET'])
 def get_customer_rentals(customer_id):
     try:
-        check_and_update_rental_status()
         # 获取客户的租赁记录
         # !!! 这里从前端获取的实际是use_id
-        customer = Customer.query.filter_by(
-            user_id=customer_id
-        ).first()
-        if not customer:
-            return jsonify({'error': 'Customer not found'}), 404
+        query = customer_rentals_query(customer_id)
+        if wants_stream(request.args):
+            return stream_response(query, format_customer_rental, request.args['format'])
 
-        rentals = (
-            Rental.query
-            .filter_by(customer_id=customer.customer_id)
-            .join(Vehicle)
-            .order_by(Rental.start_time.desc())
-            .all()
-        )
+        rentals = query.all()
+        # 没有租赁记录时再确认客户是否存在
+        if not rentals and not Customer.query.filter_by(user_id=customer_id).first():
+            return jsonify({'error': 'Customer not found'}), 404
 
         result = {
-            'data': [
-                {
-                    'rental_id': rental.rental_id,
-                    'vehicle_id': rental.vehicle_id,
-                    'customer_id': rental.customer_id,
-                    'start_time': rental.start_time.strftime('%Y-%m-%d %H:%M'),
-                    'duration_days': rental.duration_days,
-                    'expected_return_time': rental.expected_return_time.strftime('%Y-%m-%d %H:%M'),
-                    'actual_return_time': rental.actual_return_time.strftime('%Y-%m-%d %H:%M') if rental.actual_return_time else None,
-                    'total_fee': float(rental.total_fee),
-                    'status': rental.status,
-                    'plate_number': rental.vehicle.plate_number,
-                    'type': rental.vehicle.type,
-                    'brand': rental.vehicle.brand,
-                    'model': rental.vehicle.model,
-                    'color': rental.vehicle.color,
-                    'price_per_day': float(rental.vehicle.price_per_day)
-                }
-                for rental in rentals
-            ],
+            'data': [format_customer_rental(row) for row in rentals],
             'total': len(rentals)
         }
 
@@ -223,9 +160,9 @@ def get_customer_rentals(customer_id):
 
 
 @bp.route('/api/rentals', methods=['POST'])
+@idempotency_store.idempotent
 def create_rental():
     try:
-        check_and_update_rental_status()
         data = request.get_json()
 
         # 验证必需字段
@@ -239,65 +176,34 @@ def create_rental():
         customer_id = data['customer_id']
         duration_days = int(data['duration_days'])
 
-        # 检查客户是否有逾期的租赁记录
-        overdue_rental = Rental.query.filter(
-            Rental.customer_id == customer_id,
-            Rental.status == 'overdue'
-        ).first()
-        if overdue_rental:
-            return jsonify({'error': 'Customer has overdue rental'}), 400
-
         # 验证租赁天数
-        try:
-            if duration_days <= 0:
-                return jsonify({'error': 'Duration days must be positive'}), 400
-        except ValueError:
-            return jsonify({'error': 'Invalid duration days format'}), 400
-
-        # 检查车辆是否已被租赁
-        ongoing_rental = (
-            Rental.query
-            .join(Vehicle, Rental.vehicle_id == Vehicle.vehicle_id)
-            .filter(
-                Rental.vehicle_id == vehicle_id,
-                Vehicle.is_deleted == False
-            ).filter(
-                or_(Rental.status == 'ongoing', Rental.status == 'overdue')
-            ).first()
-        )
-        if ongoing_rental:
-            return jsonify({'error': 'Vehicle is currently rented out'}), 400
-
-        # 创建租赁记录
-        start_time = datetime.now()
-        expected_return_time = start_time + timedelta(days=duration_days)
-        vehicle = Vehicle.query.get(vehicle_id)
-        if not vehicle:
-            return jsonify({'error': 'Vehicle not found'}), 404
-
-        total_fee = Decimal(vehicle.price_per_day) * Decimal(duration_days)
-
-        # 检查是否余额充足
-        customer = Customer.query.filter_by(customer_id=customer_id).first()
-        customer_money = Decimal(customer.money)
-        if customer_money < total_fee:
-            return jsonify({'error': '余额不足'}), 400
-
-        # 减去费用
-        customer.money = customer.money - total_fee
-
-        rental = Rental(
-            vehicle_id=vehicle_id,
-            customer_id=customer_id,
-            start_time=start_time,
-            duration_days=duration_days,
-            expected_return_time=expected_return_time,
-            total_fee=total_fee,
-            status='ongoing'
-        )
-        db.session.add(rental)
-        db.session.commit()
+        if duration_days <= 0:
+            return jsonify({'error': 'Duration days must be positive'}), 400
+
+        # 可选的开始时间，晚于当前时间时创建预约
+        start_time = None
+        if data.get('start_time'):
+            try:
+                start_time = parse_local_datetime(data['start_time'])
+            except (TypeError, ValueError):
+                return jsonify({'error': 'Invalid start time format'}), 400
+            if start_time < datetime.now() - START_TIME_TOLERANCE:
+                return jsonify({'error': 'Start time cannot be in the past'}), 400
+
+        # 加锁检查车辆、客户状态和余额，扣费并创建租赁记录
+        rental = book_vehicle(vehicle_id, customer_id, duration_days, start_time)
+        if rental.status == 'ongoing':
+            invalidate_vehicle_list()
+        availability_index.apply_rental(rental)
+        # 交给调度器在预约开始时起租、到期时将其置为逾期
+        rental_scheduler.schedule(
+            rental.rental_id,
+            rental.start_time if rental.status == 'reserved' else rental.expected_return_time)
         return jsonify(rental.to_dict()), 201
+    except BookingError as e:
+        return jsonify({'error': e.message}), e.status_code
+    except ValueError:
+        return jsonify({'error': 'Invalid duration days format'}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -312,12 +218,34 @@ def cancel_rental(reantal_id):
         if not rental:
             return jsonify({'error': 'Rental not found'}), 404
 
+        if rental.status == 'reserved':
+            # 取消尚未开始的预约并退款；条件更新避免与调度器起租并发
+            cancelled = db.session.execute(
+                update(Rental)
+                .where(Rental.rental_id == rental.rental_id, Rental.status == 'reserved')
+                .values(status='cancelled', updated_at=datetime.now())
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if not cancelled:
+                db.session.rollback()
+                return jsonify({'error': 'Rental has already started'}), 409
+            apply_balance_change(rental.customer_id, rental.total_fee, 'refund', rental.rental_id)
+            record_rental_event(rental, 'cancelled', refunded=True)
+            db.session.commit()
+            db.session.refresh(rental)
+            availability_index.apply_rental(rental)
+            return jsonify(rental.to_dict())
+
         if rental.status != 'ongoing':
-            return jsonify({'error': 'Only ongoing rental can be cancelled'}), 400
+            return jsonify({'error': 'Only ongoing or reserved rental can be cancelled'}), 400
 
         # 取消租赁
         rental.status = 'cancelled'
+        mark_rental_finished(rental, 'cancelled')
+        record_rental_event(rental, 'cancelled')
         db.session.commit()
+        invalidate_vehicle_list()
+        availability_index.apply_rental(rental)
         return jsonify(rental.to_dict())
     except Exception as e:
         db.session.rollback()
@@ -339,7 +267,11 @@ def return_vehicle(rental_id):
         # 还车操作
         rental.status = 'completed'
         rental.actual_return_time = datetime.now()
+        mark_rental_finished(rental, 'completed')
+        record_rental_event(rental, 'returned')
         db.session.commit()
+        invalidate_vehicle_list()
+        availability_index.apply_rental(rental)
         return '', 204
     except Exception as e:
         db.session.rollback()
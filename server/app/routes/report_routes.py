@@ -0,0 +1,82 @@
+from flask import jsonify, request
+from app.routes import bp
+from app.services.reports import ReportError, currently_overdue, daily_stats_report, parse_report_args
+
+# 各报表返回的指标，summary 返回全部指标
+REPORT_METRICS = {
+    'revenue': ['rentals', 'cancelled', 'revenue'],
+    'utilization': ['occupied_hours', 'fleet_size', 'utilization'],
+    'duration': ['rentals', 'avg_duration_days'],
+    'overdue': ['completed', 'returned_late', 'overdue_rate'],
+}
+
+
+def report_response(report, **extra):
+    start, end, group_by = parse_report_args(request.args)
+    data, totals = daily_stats_report(start, end, group_by)
+    metrics = REPORT_METRICS.get(report)
+    if metrics is not None:
+        data = [{'key': row['key'], **{name: row[name] for name in metrics}} for row in data]
+        totals = {name: totals[name] for name in metrics}
+    return jsonify({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'group_by': group_by,
+        'data': data,
+        'totals': totals,
+        **extra,
+    })
+
+
+@bp.route('/api/reports/revenue', methods=['GET'])
+def get_revenue_report():
+    try:
+        # 租金收入（扣除退款），按租赁开始日期统计
+        return report_response('revenue')
+    except ReportError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/reports/utilization', methods=['GET'])
+def get_utilization_report():
+    try:
+        # 车队利用率：已归还租赁的占用时长 / 车辆总时长
+        return report_response('utilization')
+    except ReportError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/reports/duration', methods=['GET'])
+def get_duration_report():
+    try:
+        # 平均租赁天数
+        return report_response('duration')
+    except ReportError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/reports/overdue', methods=['GET'])
+def get_overdue_report():
+    try:
+        # 逾期率：超过预计归还时间才归还的比例，另附当前仍逾期未还的数量
+        return report_response('overdue', currently_overdue=currently_overdue())
+    except ReportError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/reports/summary', methods=['GET'])
+def get_summary_report():
+    try:
+        return report_response('summary')
+    except ReportError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
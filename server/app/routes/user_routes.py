@@ -3,10 +3,24 @@ from flask import jsonify, request
 from app.routes import bp
 from app.models import Users, Customer
 from app import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.orm.exc import StaleDataError
 from sqlalchemy import and_
+from app.services.auth import AuthError, token_auth
+from app.services.hashing import HashingBusy, busy_response, password_hasher
+from app.services.rate_limit import rate_limiter
+
+
+def authorized_by_token(user_id):
+    # 携带了有效令牌且属于该用户（或管理员）时返回 True；未携带令牌时返回 False
+    identity = token_auth.current_identity()
+    if identity is None:
+        return False
+    if identity['user_id'] != user_id and identity['role'] != 'admin':
+        raise AuthError('Token does not belong to this user', 403)
+    return True
 
 @bp.route('/api/register', methods=['POST'])
+@rate_limiter.limit('auth')
 def register():
     try:
         data = request.get_json()
@@ -42,7 +56,7 @@ def register():
             return jsonify({'error': '该手机号已被注册'}), 409
 
         # 创建用户和客户记录
-        password_hash = generate_password_hash(data['password'])
+        password_hash = password_hasher.generate(data['password'])
         user = Users(
             username=data['username'],
             password_hash=password_hash,
@@ -70,6 +84,9 @@ def register():
             'username': user.username,
             'name': customer.name
         }), 201
+    except HashingBusy as e:
+        db.session.rollback()
+        return busy_response(e)
     except Exception as e:
         # 回滚事务
         db.session.rollback()
@@ -77,6 +94,7 @@ def register():
 
 
 @bp.route('/api/login', methods=['POST'])
+@rate_limiter.limit('auth')
 def login():
     try:
         data = request.get_json()
@@ -94,7 +112,7 @@ def login():
             return jsonify({'error': 'User does not exist'}), 401
 
         # 验证密码
-        if not check_password_hash(user.password_hash, data['password']):
+        if not password_hasher.check(user.password_hash, data['password']):
             return jsonify({'error': 'Password is incorrect'}), 401
 
         # 查找关联的客户信息（排除已删除的客户）
@@ -112,8 +130,13 @@ def login():
                 'username': user.username,
                 'role': user.role,
                 'customer_id': customer_id,
-            }
+            },
+            'token': token_auth.issue_token(user, customer_id),
+            'expires_in': token_auth.max_age,
         }), 200
+    except HashingBusy as e:
+        db.session.rollback()
+        return busy_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -121,6 +144,8 @@ def login():
 @bp.route('/api/user/<int:user_id>', methods=['PUT'])
 def modify_password(user_id):
     try:
+        authorized_by_token(user_id)
+
         # 查找用户（排除已删除的用户）
         user = Users.query.filter_by(
             user_id=user_id).filter_by(is_deleted=False).first()
@@ -129,12 +154,18 @@ def modify_password(user_id):
 
         # 修改密码
         data = request.get_json()
-        password_hash = generate_password_hash(data['password'])
+        password_hash = password_hasher.generate(data['password'])
         user.password_hash = password_hash
 
         # 提交事务
         db.session.commit()
+        token_auth.invalidate_user(user_id)
         return '', 204
+    except HashingBusy as e:
+        db.session.rollback()
+        return busy_response(e)
+    except AuthError as e:
+        return jsonify({'error': e.message}), e.status_code
     except Exception as e:
         # 回滚事务
         db.session.rollback()
@@ -150,9 +181,10 @@ def delete_user(user_id):
         if not user:
             return jsonify({'error': 'User not found'}), 404
 
-        # 验证密码
-        if not check_password_hash(user.password_hash, request.get_json()['password']):
-            return jsonify({'error': 'Password is incorrect'}), 400
+        # 携带有效令牌时无需再次校验密码
+        if not authorized_by_token(user_id):
+            if not password_hasher.check(user.password_hash, request.get_json()['password']):
+                return jsonify({'error': 'Password is incorrect'}), 400
 
         # 查找关联的客户信息（排除已删除的客户）
         customer = Customer.query.filter_by(
@@ -165,7 +197,17 @@ def delete_user(user_id):
 
         # 提交事务
         db.session.commit()
+        token_auth.invalidate_user(user_id)
         return '', 204
+    except HashingBusy as e:
+        db.session.rollback()
+        return busy_response(e)
+    except AuthError as e:
+        return jsonify({'error': e.message}), e.status_code
+    except StaleDataError:
+        # 下单、充值等并发写入更新了版本号
+        db.session.rollback()
+        return jsonify({'error': 'Customer was modified concurrently, please retry'}), 409
     except Exception as e:
         # 回滚事务
         db.session.rollback()
@@ -1,52 +1,110 @@
 from flask import jsonify, request
-from sqlalchemy import func
 from app.routes import bp
 from app.models import Vehicle, Rental
 from app import db
-import re
+from sqlalchemy.orm.exc import StaleDataError
+from app.services.pagination import (MAX_PAGE_SIZE, DEFAULT_PAGE_SIZE, PaginationError,
+                                     decode_cursor, encode_cursor, page_body, parse_page_args, paginate)
+from app.services.availability import availability_index
+from app.services.vehicle_import import (DEFAULT_BATCH_SIZE, IMPORT_FORMATS, PLATE_NUMBER_PATTERN, ImportFormatError,
+                                         import_vehicles, iter_records)
+from app.services.response_cache import invalidate_vehicle, invalidate_vehicle_list, response_cache
+from app.services.rate_limit import rate_limiter
+from app.services.serializers import parse_local_datetime
+import io
+from datetime import datetime, timedelta
 
-PLATE_NUMBER_PATTERN = re.compile(r'^[\u4e00-\u9fa5][A-Z][A-Z0-9]{5}$')
+# 批量导入时 Content-Type 与格式的对应关系
+BULK_CONTENT_TYPES = {
+    'application/json': 'json',
+    'application/x-ndjson': 'ndjson',
+    'application/ndjson': 'ndjson',
+    'text/csv': 'csv',
+}
+
+# 车辆列表允许的排序字段和过滤参数
+VEHICLE_SORT_FIELDS = {
+    'vehicle_id': Vehicle.vehicle_id,
+    'price_per_day': Vehicle.price_per_day,
+    'brand': Vehicle.brand,
+}
+VEHICLE_FILTER_FIELDS = {
+    'brand': (Vehicle.brand, 'eq'),
+    'type': (Vehicle.type, 'eq'),
+    'min_price': (Vehicle.price_per_day, 'ge'),
+    'max_price': (Vehicle.price_per_day, 'le'),
+}
 
 
 @bp.route('/api/vehicles', methods=['GET'])
+@rate_limiter.limit('catalog')
+@response_cache.cached(lambda: ['vehicles'])
 def get_vehicles_and_rental_info():
     try:
-        # 查询车辆及其最新的租赁状态，排除已删除的车辆
-        subquery = (
-            db.session.query(
-                Rental.vehicle_id,
-                func.max(Rental.created_at).label('latest_created_at')
-            )
-            .group_by(Rental.vehicle_id)
-            .subquery()
-        )
-
-        vehicles = (
-            db.session.query(Vehicle, Rental.status)
-            .join(subquery, Vehicle.vehicle_id == subquery.c.vehicle_id, isouter=True)
-            .join(Rental, (Vehicle.vehicle_id == Rental.vehicle_id) & (Rental.created_at == subquery.c.latest_created_at), isouter=True)
-            .filter(Vehicle.is_deleted == False)
-            .order_by(Vehicle.vehicle_id.asc())
-            .all()
-        )
+        params = parse_page_args(
+            request.args, VEHICLE_SORT_FIELDS, VEHICLE_FILTER_FIELDS, 'vehicle_id')
+        # 车辆的最新租赁状态已冗余在 vehicles 表中，排除已删除的车辆
+        query = Vehicle.query.filter(Vehicle.is_deleted == False)
+        vehicles, next_cursor = paginate(query, params, Vehicle.vehicle_id)
 
-        result = {
-            'data': [
-                {
-                    **vehicle.to_dict(),
-                    'status': status,
-                }
-                for vehicle, status in vehicles
-            ],
-            'total': len(vehicles)
-        }
+        result = page_body([
+            {
+                **vehicle.to_dict(),
+                'status': vehicle.current_status,
+            }
+            for vehicle in vehicles
+        ], next_cursor, params, len(vehicles))
 
         return jsonify(result)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/vehicles/available', methods=['GET'])
+@rate_limiter.limit('catalog')
+def get_available_vehicles():
+    try:
+        # 查询时间段 [start, end)：start 默认为当前时间，end 或 duration_days 二选一
+        args = request.args
+        try:
+            start = parse_local_datetime(args['start']) if args.get('start') else datetime.now()
+            if args.get('end'):
+                end = parse_local_datetime(args['end'])
+            elif args.get('duration_days'):
+                end = start + timedelta(days=int(args['duration_days']))
+            else:
+                return jsonify({'error': 'Missing end or duration_days'}), 400
+            min_price = float(args['min_price']) if args.get('min_price') else None
+            max_price = float(args['max_price']) if args.get('max_price') else None
+            limit = min(int(args.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        except ValueError:
+            return jsonify({'error': 'Invalid query parameters'}), 400
+        if end <= start:
+            return jsonify({'error': 'End must be later than start'}), 400
+        if limit <= 0:
+            return jsonify({'error': 'Limit must be positive'}), 400
+        after = None
+        if args.get('cursor'):
+            after, _ = decode_cursor(args['cursor'], Vehicle.vehicle_id, Vehicle.vehicle_id)
+
+        vehicles, last_vehicle_id = availability_index.search(
+            start, end, vehicle_type=args.get('type'), brand=args.get('brand'),
+            min_price=min_price, max_price=max_price, after=after, limit=limit)
+        return jsonify({
+            'data': vehicles,
+            'next_cursor': encode_cursor(last_vehicle_id, last_vehicle_id)
+            if last_vehicle_id is not None else None
+        })
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @bp.route('/api/vehicles/<int:vehicle_id>', methods=['GET'])
+@response_cache.cached(lambda vehicle_id: [f'vehicle:{vehicle_id}'])
 def get_vehicles_by_id(vehicle_id):
     try:
         # 查找车辆，排除已删除的车辆
@@ -99,12 +157,48 @@ def create_vehicle():
         )
         db.session.add(vehicle)
         db.session.commit()
+        invalidate_vehicle_list()
+        availability_index.upsert_vehicle(vehicle)
         return jsonify(vehicle.to_dict()), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/api/vehicles/bulk', methods=['POST'])
+def bulk_create_vehicles():
+    try:
+        # 格式由 ?format= 指定，否则根据 Content-Type 判断
+        fmt = request.args.get('format') or BULK_CONTENT_TYPES.get(request.mimetype)
+        if fmt not in IMPORT_FORMATS:
+            return jsonify({'error': 'Unsupported import format'}), 400
+        batch_size = int(request.args.get('batch_size', DEFAULT_BATCH_SIZE))
+        if batch_size <= 0:
+            return jsonify({'error': 'Batch size must be positive'}), 400
+
+        if fmt == 'json':
+            # silent 避免解析失败的 BadRequest 被下面的 except Exception 转成 500
+            data = request.get_json(force=True, silent=True)
+            if data is None:
+                return jsonify({'error': 'Invalid JSON format'}), 400
+            if not isinstance(data, list):
+                return jsonify({'error': 'JSON body must be an array of vehicles'}), 400
+            records = data
+        else:
+            # NDJSON / CSV 边读边导入，不把整个请求体读入内存
+            records = iter_records(io.TextIOWrapper(request.stream, encoding='utf-8-sig'), fmt)
+
+        result = import_vehicles(records, batch_size=batch_size)
+        return jsonify(result), 201 if result['inserted'] else 400
+    except ImportFormatError as e:
+        return jsonify({'error': str(e)}), 400
+    except ValueError:
+        return jsonify({'error': 'Invalid batch size'}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
 @bp.route('/api/vehicles/<int:vehicle_id>', methods=['PUT'])
 def update_vehicle(vehicle_id):
     try:
@@ -152,7 +246,13 @@ def update_vehicle(vehicle_id):
 
         # 提交事务
         db.session.commit()
+        invalidate_vehicle(vehicle_id)
+        availability_index.upsert_vehicle(vehicle)
         return jsonify(vehicle.to_dict())
+    except StaleDataError:
+        # 下单、充值等并发写入更新了版本号
+        db.session.rollback()
+        return jsonify({'error': 'Vehicle was modified concurrently, please retry'}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -174,7 +274,12 @@ def delete_vehicle(id):
         # 软删除车辆
         vehicle.is_deleted = True
         db.session.commit()
+        invalidate_vehicle(id)
+        availability_index.remove_vehicle(id)
         return '', 204
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({'error': 'Vehicle was modified concurrently, please retry'}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -0,0 +1,412 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from app.services.availability import ACTIVE_RENTAL_STATUSES
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 快照中的列及其类型；status / brand / type 保存为分类编码，编码表见 meta.json
+COLUMNS = {
+    'rental_id': 'int32',
+    'vehicle_id': 'int32',
+    'customer_id': 'int32',
+    'start_time': 'datetime64[s]',
+    'expected_return_time': 'datetime64[s]',
+    'actual_return_time': 'datetime64[s]',
+    'total_fee': 'float64',
+    'duration_days': 'int32',
+    'status': 'int8',
+    'brand': 'int16',
+    'type': 'int16',
+}
+CATEGORICAL_COLUMNS = ('status', 'brand', 'type')
+SUMMARY_METRICS = ('total_fee', 'duration_days', 'daily_price', 'lateness_hours')
+DEFAULT_PERCENTILES = (50, 90, 95, 99)
+META_FILE = 'meta.json'
+
+
+class AnalyticsError(Exception):
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def _require_numpy():
+    if np is None:
+        raise AnalyticsError('Analytics requires the numpy package', 503)
+
+
+class SnapshotView:
+    """某一时刻的快照：各列为只读的内存映射数组。"""
+
+    def __init__(self, columns, categories, meta):
+        self.columns = columns
+        self.categories = categories
+        self.meta = meta
+
+    def __len__(self):
+        return len(self.columns['rental_id'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def derived(self, metric):
+        if metric == 'daily_price':
+            return self['total_fee'] / np.maximum(self['duration_days'], 1)
+        if metric == 'lateness_hours':
+            # 尚未归还的租赁为 NaN
+            late = (self['actual_return_time'] - self['expected_return_time']).astype('float64') / 3600
+            return np.where(np.isnat(self['actual_return_time']), np.nan, late)
+        return self[metric].astype('float64')
+
+    def status_mask(self, *statuses):
+        codes = [self.categories['status'].index(status) for status in statuses
+                 if status in self.categories['status']]
+        return np.isin(self['status'], codes)
+
+
+def grouped_stats(codes, values, group_count, percentiles=DEFAULT_PERCENTILES):
+    """按分组编码计算每组的数量、总和、均值和百分位（线性插值）。
+
+    只做一次排序，百分位按各组在排序结果中的区间直接取值，不逐组调用 np.percentile。
+    """
+    counts = np.bincount(codes, minlength=group_count)
+    sums = np.bincount(codes, weights=values, minlength=group_count)
+    order = np.lexsort((values, codes))
+    ordered = values[order]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    present = counts > 0
+    result = {
+        'count': counts,
+        'sum': sums,
+        'mean': np.divide(sums, counts, out=np.full(group_count, np.nan), where=present),
+    }
+    for percentile in percentiles:
+        position = starts + (np.maximum(counts, 1) - 1) * (percentile / 100)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.ceil(position).astype(np.int64)
+        values_at = np.full(group_count, np.nan)
+        if len(ordered):
+            lower_values = ordered[np.minimum(lower, len(ordered) - 1)]
+            upper_values = ordered[np.minimum(upper, len(ordered) - 1)]
+            interpolated = lower_values + (upper_values - lower_values) * (position - lower)
+            values_at[present] = interpolated[present]
+        result[f'p{percentile:g}'] = values_at
+    return result
+
+
+def _group_codes(view, by, mask):
+    # 返回 (各行的分组编码, 分组名称)；by 为空时所有行归为一组
+    if by is None:
+        return np.zeros(int(mask.sum()), dtype=np.int64), ['all']
+    if by not in CATEGORICAL_COLUMNS:
+        raise AnalyticsError(f'Invalid group by: {by}')
+    return view[by][mask].astype(np.int64), view.categories[by]
+
+
+def _rounded(value, digits=2):
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+
+def summarize(view, metric, by=None, percentiles=DEFAULT_PERCENTILES, statuses=None):
+    """按 status / brand / type 分组统计某个指标的数量、均值和百分位。"""
+    if metric not in SUMMARY_METRICS:
+        raise AnalyticsError(f'Invalid metric: {metric}')
+    mask = np.ones(len(view), dtype=bool)
+    if statuses:
+        mask &= view.status_mask(*statuses)
+    values = view.derived(metric)
+    if metric == 'lateness_hours':
+        # 只有已归还的租赁有实际归还时间
+        mask &= ~np.isnan(values)
+    codes, labels = _group_codes(view, by, mask)
+    stats = grouped_stats(codes, values[mask], len(labels), percentiles)
+    return [
+        {
+            'group': label,
+            'count': int(stats['count'][index]),
+            'sum': _rounded(stats['sum'][index]),
+            'mean': _rounded(stats['mean'][index]),
+            **{f'p{percentile:g}': _rounded(stats[f'p{percentile:g}'][index])
+               for percentile in percentiles},
+        }
+        for index, label in enumerate(labels)
+        if stats['count'][index]
+    ]
+
+
+def return_lateness(view, by=None, percentiles=DEFAULT_PERCENTILES):
+    """已归还租赁的晚还小时数分布（负数为提前归还），附晚还比例。"""
+    rows = summarize(view, 'lateness_hours', by, percentiles, statuses=['completed'])
+    lateness = view.derived('lateness_hours')
+    mask = view.status_mask('completed') & ~np.isnan(lateness)
+    codes, labels = _group_codes(view, by, mask)
+    late = np.bincount(codes, weights=lateness[mask] > 0, minlength=len(labels))
+    counts = np.bincount(codes, minlength=len(labels))
+    late_share = {label: late[index] / counts[index] * 100
+                  for index, label in enumerate(labels) if counts[index]}
+    for row in rows:
+        row['late_share'] = _rounded(late_share[row['group']])
+    return rows
+
+
+def price_elasticity(view, by='type', bins=5):
+    """估算各分组的价格弹性：每辆车的租赁次数对日租金的对数回归斜率。
+
+    分组内的车辆按日租金分为 bins 个等频区间，返回每个区间的平均价格和
+    每辆车的平均租赁次数。没有任何租赁的车辆不在快照中，结果偏向有需求的车辆。
+    """
+    if bins < 2:
+        raise AnalyticsError('bins must be at least 2')
+    mask = ~view.status_mask('cancelled')
+    codes, labels = _group_codes(view, by, mask)
+    vehicle_ids = view['vehicle_id'][mask]
+    prices = view.derived('daily_price')[mask]
+
+    results = []
+    for index, label in enumerate(labels):
+        in_group = codes == index
+        if not in_group.any():
+            continue
+        # 按车辆汇总：租赁次数和平均日租金
+        vehicles, inverse = np.unique(vehicle_ids[in_group], return_inverse=True)
+        rentals = np.bincount(inverse)
+        vehicle_prices = np.bincount(inverse, weights=prices[in_group]) / rentals
+        edges = np.quantile(vehicle_prices, np.linspace(0, 1, bins + 1))
+        bucket = np.clip(np.searchsorted(edges, vehicle_prices, side='right') - 1, 0, bins - 1)
+        bucket_vehicles = np.bincount(bucket, minlength=bins)
+        bucket_rentals = np.bincount(bucket, weights=rentals, minlength=bins)
+        bucket_prices = np.bincount(bucket, weights=vehicle_prices, minlength=bins)
+        used = bucket_vehicles > 0
+        mean_prices = bucket_prices[used] / bucket_vehicles[used]
+        demand = bucket_rentals[used] / bucket_vehicles[used]
+        elasticity = None
+        if len(np.unique(mean_prices)) >= 2:
+            elasticity = _rounded(np.polyfit(np.log(mean_prices), np.log(demand), 1)[0], 3)
+        results.append({
+            'group': label,
+            'vehicles': int(len(vehicles)),
+            'rentals': int(rentals.sum()),
+            'elasticity': elasticity,
+            'bins': [{'mean_daily_price': _rounded(price), 'rentals_per_vehicle': _rounded(value)}
+                     for price, value in zip(mean_prices, demand)],
+        })
+    return results
+
+
+class AnalyticsSnapshot:
+    """租赁历史的列式快照，保存在磁盘上并以内存映射方式读取。
+
+    每列一个定长二进制文件，meta.json 记录行数、已快照的最大 rental_id 和
+    分类编码表。刷新时追加新租赁，并重新读取快照中尚未结束的租赁以更新其状态
+    和归还时间，分析查询只读取快照，不访问数据库。同一目录只应有一个进程刷新。
+    """
+
+    def __init__(self, app=None):
+        self.directory = None
+        self.batch_size = 10000
+        self.gap_retry_seconds = 300
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._view = None
+        self._view_mtime = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['analytics_snapshot'] = self
+        self.directory = (app.config.get('ANALYTICS_SNAPSHOT_DIR')
+                          or os.path.join(app.instance_path, 'analytics'))
+        self.batch_size = app.config.get('ANALYTICS_REFRESH_BATCH_SIZE', 10000)
+        self.gap_retry_seconds = app.config.get('ANALYTICS_GAP_RETRY_SECONDS', 300)
+        self._view = None
+        self._view_mtime = None
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _read_meta(self):
+        try:
+            with open(self._path(META_FILE), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self, meta):
+        # 先写临时文件再替换，读取方不会看到写了一半的 meta.json
+        temp_path = self._path(META_FILE + '.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(temp_path, self._path(META_FILE))
+
+    def _map(self, name, rows, mode='r'):
+        if rows == 0:
+            return np.empty(0, dtype=COLUMNS[name])
+        return np.memmap(self._path(f'{name}.bin'), dtype=COLUMNS[name], mode=mode, shape=(rows,))
+
+    def view(self):
+        """返回当前快照；其他进程刷新后会重新映射。"""
+        _require_numpy()
+        try:
+            mtime = os.stat(self._path(META_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            raise AnalyticsError('Analytics snapshot not found, run flask analytics refresh', 404)
+        with self._lock:
+            if self._view is None or self._view_mtime != mtime:
+                meta = self._read_meta()
+                columns = {name: self._map(name, meta['rows']) for name in COLUMNS}
+                self._view = SnapshotView(columns, meta['categories'], meta)
+                self._view_mtime = mtime
+            return self._view
+
+    def refresh(self, full=False):
+        """增量刷新快照（full 为真时重建），返回本次追加和更新的行数。"""
+        _require_numpy()
+        # 刷新期间查询继续使用旧的映射，只读取 meta.json 记录的行数以内的数据
+        with self._refresh_lock:
+            os.makedirs(self.directory, exist_ok=True)
+            meta = None if full else self._read_meta()
+            if meta is None:
+                meta = {'rows': 0, 'high_water_mark': 0, 'gaps': [],
+                        'categories': {name: [] for name in CATEGORICAL_COLUMNS}}
+                # 删除而不是截断旧文件，已映射旧文件的读取方不受影响
+                for name in COLUMNS:
+                    if os.path.exists(self._path(f'{name}.bin')):
+                        os.remove(self._path(f'{name}.bin'))
+            # 上次刷新中途失败时，列文件可能比 meta.json 记录的行数长
+            for name, dtype in COLUMNS.items():
+                with open(self._path(f'{name}.bin'), 'ab') as f:
+                    f.truncate(meta['rows'] * np.dtype(dtype).itemsize)
+
+            updated = self._refresh_open_rentals(meta)
+            appended = self._append_new_rentals(meta)
+            meta['refreshed_at'] = datetime.now().isoformat(timespec='seconds')
+            self._write_meta(meta)
+        return {'appended': appended, 'updated': updated, 'rows': meta['rows']}
+
+    def _query(self):
+        from app import db
+        from app.models import Rental, Vehicle
+
+        return (
+            db.select(Rental.rental_id, Rental.vehicle_id, Rental.customer_id,
+                      Rental.start_time, Rental.expected_return_time, Rental.actual_return_time,
+                      Rental.total_fee, Rental.duration_days, Rental.status,
+                      Vehicle.brand, Vehicle.type)
+            .join(Vehicle, Vehicle.vehicle_id == Rental.vehicle_id)
+        )
+
+    def _to_arrays(self, rows, categories):
+        values = dict(zip(COLUMNS, zip(*rows)))
+        arrays = {}
+        for name, dtype in COLUMNS.items():
+            if name in CATEGORICAL_COLUMNS:
+                # 新出现的取值追加到编码表末尾，已有编码保持不变
+                codes = {value: code for code, value in enumerate(categories[name])}
+                for value in values[name]:
+                    if value not in codes:
+                        codes[value] = len(categories[name])
+                        categories[name].append(value)
+                arrays[name] = np.fromiter((codes[value] for value in values[name]),
+                                           dtype=dtype, count=len(rows))
+            elif name == 'total_fee':
+                arrays[name] = np.array([float(value) for value in values[name]], dtype=dtype)
+            else:
+                arrays[name] = np.array(values[name], dtype=dtype)
+        return arrays
+
+    def _refresh_open_rentals(self, meta):
+        # 未结束的租赁之后还会还车、取消或逾期，需要重新读取
+        from app import db
+        from app.models import Rental
+
+        rows = meta['rows']
+        if rows == 0:
+            return 0
+        statuses = self._map('status', rows)
+        open_codes = [code for code, status in enumerate(meta['categories']['status'])
+                      if status in ACTIVE_RENTAL_STATUSES]
+        positions = np.flatnonzero(np.isin(statuses, open_codes))
+        if len(positions) == 0:
+            return 0
+        rental_ids = self._map('rental_id', rows)
+        position_by_id = dict(zip(rental_ids[positions].tolist(), positions.tolist()))
+        columns = {name: self._map(name, rows, mode='r+') for name in COLUMNS}
+        open_ids = list(position_by_id)
+        for offset in range(0, len(open_ids), self.batch_size):
+            batch = db.session.execute(
+                self._query().where(Rental.rental_id.in_(open_ids[offset:offset + self.batch_size]))
+            ).all()
+            if not batch:
+                continue
+            arrays = self._to_arrays(batch, meta['categories'])
+            targets = [position_by_id[rental_id] for rental_id in arrays['rental_id'].tolist()]
+            for name in COLUMNS:
+                columns[name][targets] = arrays[name]
+        for column in columns.values():
+            column.flush()
+        db.session.rollback()
+        return len(positions)
+
+    def _append_new_rentals(self, meta):
+        from app import db
+        from app.models import Rental
+
+        # 流水号小于高水位但当时尚未提交的租赁会留下空洞，在重试期限内再查一次
+        now = time.time()
+        gaps = {rental_id: seen_at for rental_id, seen_at in meta['gaps']
+                if now - seen_at < self.gap_retry_seconds}
+        condition = Rental.rental_id > meta['high_water_mark']
+        if gaps:
+            condition = condition | Rental.rental_id.in_(list(gaps))
+        query = self._query().where(condition).order_by(Rental.rental_id).execution_options(yield_per=self.batch_size)
+
+        previous_high_water_mark = meta['high_water_mark']
+        appended = 0
+        seen = []
+        result = db.session.execute(query)
+        for batch in result.partitions():
+            arrays = self._to_arrays(batch, meta['categories'])
+            for name in COLUMNS:
+                with open(self._path(f'{name}.bin'), 'ab') as f:
+                    arrays[name].tofile(f)
+            appended += len(batch)
+            seen.append(arrays['rental_id'])
+        db.session.rollback()
+
+        seen = np.concatenate(seen) if seen else np.empty(0, dtype=COLUMNS['rental_id'])
+        for rental_id in seen.tolist():
+            gaps.pop(rental_id, None)
+        if len(seen):
+            high_water_mark = max(int(seen.max()), previous_high_water_mark)
+            missing = np.setdiff1d(
+                np.arange(previous_high_water_mark + 1, high_water_mark + 1), seen)
+            gaps.update((int(rental_id), now) for rental_id in missing)
+            meta['high_water_mark'] = high_water_mark
+        meta['gaps'] = sorted(gaps.items())
+        meta['rows'] += appended
+        return appended
+
+    def stats(self):
+        meta = self._read_meta() if self.directory else None
+        if meta is None:
+            return {'available': np is not None, 'rows': 0}
+        return {
+            'available': np is not None,
+            'rows': meta['rows'],
+            'high_water_mark': meta['high_water_mark'],
+            'pending_gaps': len(meta['gaps']),
+            'refreshed_at': meta.get('refreshed_at'),
+            'size_bytes': sum(os.path.getsize(self._path(f'{name}.bin'))
+                              for name in COLUMNS if os.path.exists(self._path(f'{name}.bin'))),
+        }
+
+
+analytics_snapshot = AnalyticsSnapshot()
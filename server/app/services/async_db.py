@@ -0,0 +1,79 @@
+from sqlalchemy.engine import make_url
+from app.services.database import install_sqlite_pragmas, pool_options
+
+# 同步驱动对应的异步驱动
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+}
+
+
+def async_database_url(url):
+    """把同步连接串转换为对应异步驱动的连接串。"""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f'No async driver configured for {backend}')
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+class AsyncDatabase:
+    """只读接口使用的异步引擎，与同步的 db 连接同一个数据库、共用 app/models 中的模型。
+
+    引擎在第一次使用时创建，需要安装 aiosqlite（SQLite）或 asyncpg（PostgreSQL）。
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.url = None
+        self._engine = None
+        self._sessionmaker = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        from app import db
+
+        app.extensions['async_db'] = self
+        self.app = app
+        # 使用 Flask-SQLAlchemy 解析后的地址，SQLite 相对路径已指向 instance 目录
+        with app.app_context():
+            self.url = async_database_url(db.engine.url)
+        self._engine = None
+        self._sessionmaker = None
+
+    def _engine_options(self):
+        backend = self.url.get_backend_name()
+        options = pool_options(self.app.config, backend)
+        statement_timeout = self.app.config.get('DB_STATEMENT_TIMEOUT_MS')
+        if backend == 'postgresql' and statement_timeout:
+            # asyncpg 通过 server_settings 设置会话参数
+            options['connect_args'] = {
+                'server_settings': {'statement_timeout': str(int(statement_timeout))}}
+        return options
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            from sqlalchemy.ext.asyncio import create_async_engine
+
+            self._engine = create_async_engine(self.url, **self._engine_options())
+            install_sqlite_pragmas(self.app, [self._engine.sync_engine])
+        return self._engine
+
+    def session(self):
+        """返回新的 AsyncSession，用法：async with async_db.session() as session。"""
+        if self._sessionmaker is None:
+            from sqlalchemy.ext.asyncio import async_sessionmaker
+
+            self._sessionmaker = async_sessionmaker(self.engine, expire_on_commit=False)
+        return self._sessionmaker()
+
+    async def dispose(self):
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
+            self._sessionmaker = None
+
+
+async_db = AsyncDatabase()
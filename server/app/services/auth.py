@@ -0,0 +1,120 @@
+import hashlib
+from flask import request
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from sqlalchemy import exists, select
+from app import db
+from app.models import Customer, Users
+from app.services.lru import LRUCache
+
+
+class AuthError(Exception):
+    def __init__(self, message, status_code=401):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def password_fingerprint(password_hash):
+    # 令牌中记录密码哈希的指纹，修改密码后旧令牌自然失效
+    return hashlib.sha256(password_hash.encode()).hexdigest()[:16]
+
+
+class TokenAuth:
+    """签发带过期时间的 HMAC 签名令牌，并缓存令牌对应的用户身份。
+
+    登录时只做一次密码哈希校验；之后的请求只校验签名，
+    缓存未命中时按主键查一次用户，不再计算密码哈希。缓存按进程保存，
+    命中时仍用一次主键查询确认用户（及关联的客户）未被删除，其他进程中的删除也能立即生效。
+    """
+
+    def __init__(self, app=None):
+        self.max_age = 12 * 3600
+        self.cache = LRUCache()
+        self._serializer = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['token_auth'] = self
+        self.max_age = app.config.get('AUTH_TOKEN_MAX_AGE_SECONDS', 12 * 3600)
+        self.cache = LRUCache(
+            maxsize=app.config.get('AUTH_CACHE_SIZE', 10000),
+            ttl=app.config.get('AUTH_CACHE_TTL_SECONDS', 60),
+        )
+        self._serializer = URLSafeTimedSerializer(app.secret_key, salt='access-token')
+
+    def issue_token(self, user, customer_id=None):
+        token = self._serializer.dumps({
+            'uid': user.user_id,
+            'pwd': password_fingerprint(user.password_hash),
+        })
+        self.cache.set(token, self._identity(user, customer_id))
+        return token
+
+    def resolve(self, token):
+        """返回令牌对应的身份；令牌无效、过期或已被吊销时抛出 AuthError。"""
+        try:
+            payload = self._serializer.loads(token, max_age=self.max_age)
+        except SignatureExpired:
+            self.cache.pop(token)
+            raise AuthError('Token expired')
+        except BadSignature:
+            raise AuthError('Invalid token')
+
+        identity = self.cache.get(token)
+        if identity is not None:
+            if not self._is_active(identity):
+                self.cache.pop(token)
+                raise AuthError('Token revoked')
+            return identity
+
+        user = Users.query.filter_by(user_id=payload['uid'], is_deleted=False).first()
+        if not user or password_fingerprint(user.password_hash) != payload['pwd']:
+            raise AuthError('Token revoked')
+        customer_id = None
+        if user.role == 'customer':
+            customer = Customer.query.filter_by(user_id=user.user_id, is_deleted=False).first()
+            if not customer:
+                raise AuthError('Token revoked')
+            customer_id = customer.customer_id
+        identity = self._identity(user, customer_id)
+        self.cache.set(token, identity)
+        return identity
+
+    def current_identity(self):
+        """解析请求头 Authorization: Bearer <token>；未携带令牌时返回 None。"""
+        return self.identity_from_header(request.headers.get('Authorization', ''))
+
+    def identity_from_header(self, header):
+        # 供不经过 Flask 请求上下文的调用方（如 ASGI 异步路径）使用，需要应用上下文
+        if not header:
+            return None
+        scheme, _, token = header.partition(' ')
+        if scheme.lower() != 'bearer' or not token:
+            raise AuthError('Invalid Authorization header')
+        return self.resolve(token.strip())
+
+    def invalidate_user(self, user_id):
+        # 修改密码或删除账号后清除该用户的所有缓存身份
+        return self.cache.discard_where(lambda identity: identity['user_id'] == user_id)
+
+    @staticmethod
+    def _is_active(identity):
+        query = select(Users.user_id).where(Users.user_id == identity['user_id'],
+                                            Users.is_deleted == False)
+        if identity['customer_id'] is not None:
+            query = query.where(exists().where(Customer.customer_id == identity['customer_id'],
+                                               Customer.is_deleted == False))
+        return db.session.execute(query).first() is not None
+
+    @staticmethod
+    def _identity(user, customer_id):
+        return {
+            'user_id': user.user_id,
+            'username': user.username,
+            'role': user.role,
+            'customer_id': customer_id,
+        }
+
+
+token_auth = TokenAuth()
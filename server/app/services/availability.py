@@ -0,0 +1,303 @@
+import bisect
+import threading
+import time
+from datetime import datetime
+
+# 占用车辆的租赁状态：预约、进行中、逾期
+ACTIVE_RENTAL_STATUSES = ('reserved', 'ongoing', 'overdue')
+# 逾期未还的车辆在归还前一直不可用
+OPEN_END = datetime.max
+
+
+def rental_interval(status, start_time, expected_return_time):
+    if status == 'overdue':
+        return start_time, OPEN_END
+    return start_time, expected_return_time
+
+
+class VehicleSchedule:
+    """一辆车的占用区间 [start, end)，按开始时间排序并维护结束时间的前缀最大值。
+
+    查询 [start, end) 是否空闲只需一次二分：开始时间早于 end 的区间中，
+    最大的结束时间不晚于 start 即空闲。
+    """
+
+    __slots__ = ('starts', 'intervals', 'max_ends')
+
+    def __init__(self):
+        self.starts = []
+        self.intervals = []
+        self.max_ends = []
+
+    def add(self, rental_id, start, end):
+        self.remove(rental_id)
+        index = bisect.bisect_right(self.starts, start)
+        self.starts.insert(index, start)
+        self.intervals.insert(index, (start, end, rental_id))
+        self._rebuild_max_ends(index)
+
+    def remove(self, rental_id):
+        for index, (_, _, existing_id) in enumerate(self.intervals):
+            if existing_id == rental_id:
+                del self.starts[index]
+                del self.intervals[index]
+                self._rebuild_max_ends(index)
+                return True
+        return False
+
+    def is_free(self, start, end):
+        index = bisect.bisect_left(self.starts, end)
+        return index == 0 or self.max_ends[index - 1] <= start
+
+    def _rebuild_max_ends(self, index):
+        del self.max_ends[index:]
+        current = self.max_ends[-1] if self.max_ends else None
+        for _, end, _ in self.intervals[index:]:
+            current = end if current is None or end > current else current
+            self.max_ends.append(current)
+
+    def __len__(self):
+        return len(self.intervals)
+
+
+def _insort_unique(values, value):
+    index = bisect.bisect_left(values, value)
+    if index == len(values) or values[index] != value:
+        values.insert(index, value)
+
+
+def _remove_sorted(values, value):
+    index = bisect.bisect_left(values, value)
+    if index < len(values) and values[index] == value:
+        del values[index]
+
+
+class _IndexState:
+    def __init__(self):
+        self.vehicles = {}
+        self.vehicle_ids = []
+        self.by_type = {}
+        self.by_brand = {}
+        self.schedules = {}
+        self.rental_vehicles = {}
+
+    def upsert_vehicle(self, vehicle):
+        self.remove_vehicle(vehicle['vehicle_id'])
+        vehicle_id = vehicle['vehicle_id']
+        self.vehicles[vehicle_id] = vehicle
+        _insort_unique(self.vehicle_ids, vehicle_id)
+        _insort_unique(self.by_type.setdefault(vehicle['type'], []), vehicle_id)
+        _insort_unique(self.by_brand.setdefault(vehicle['brand'], []), vehicle_id)
+
+    def remove_vehicle(self, vehicle_id):
+        vehicle = self.vehicles.pop(vehicle_id, None)
+        if vehicle is None:
+            return
+        _remove_sorted(self.vehicle_ids, vehicle_id)
+        _remove_sorted(self.by_type.get(vehicle['type'], []), vehicle_id)
+        _remove_sorted(self.by_brand.get(vehicle['brand'], []), vehicle_id)
+
+    def set_rental(self, rental_id, vehicle_id, status, start_time, expected_return_time):
+        self.remove_rental(rental_id)
+        if status not in ACTIVE_RENTAL_STATUSES:
+            return
+        start, end = rental_interval(status, start_time, expected_return_time)
+        self.schedules.setdefault(vehicle_id, VehicleSchedule()).add(rental_id, start, end)
+        self.rental_vehicles[rental_id] = (vehicle_id, start_time, expected_return_time)
+
+    def remove_rental(self, rental_id):
+        entry = self.rental_vehicles.pop(rental_id, None)
+        if entry is None:
+            return
+        schedule = self.schedules.get(entry[0])
+        if schedule is not None:
+            schedule.remove(rental_id)
+            if not schedule:
+                del self.schedules[entry[0]]
+
+    def mark_overdue(self, rental_id):
+        entry = self.rental_vehicles.get(rental_id)
+        if entry is not None:
+            vehicle_id, start_time, expected_return_time = entry
+            self.set_rental(rental_id, vehicle_id, 'overdue', start_time, expected_return_time)
+
+
+def _vehicle_entry(vehicle_id, vehicle_type, brand, model, color, price_per_day, plate_number):
+    return {
+        'vehicle_id': vehicle_id,
+        'plate_number': plate_number,
+        'type': vehicle_type,
+        'brand': brand,
+        'model': model,
+        'color': color,
+        'price_per_day': float(price_per_day),
+    }
+
+
+class AvailabilityIndex:
+    """车辆可用性的内存索引：车辆属性 + 每辆车未结束租赁的占用区间。
+
+    索引在第一次查询时从数据库载入，之后由下单、取消、还车、逾期扫描
+    和车辆增删改在提交后增量更新。已结束的租赁不影响未来的可用性，
+    因此只载入预约、进行中和逾期的租赁。多进程部署时其他进程的修改
+    要等到下一次定期重新载入才可见，下单时仍以数据库中的检查为准。
+    """
+
+    def __init__(self, app=None):
+        self.reload_seconds = 300
+        self._state = None
+        self._loaded_at = None
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self._journal = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['availability_index'] = self
+        self.reload_seconds = app.config.get('AVAILABILITY_RELOAD_SECONDS', 300)
+        self._state = None
+        self._loaded_at = None
+
+    def load(self, force=True):
+        """从数据库重建索引；载入期间到达的增量修改会在替换前重放。"""
+        from app import db
+        from app.models import Rental, Vehicle
+        from app.services.replicas import replica_router
+
+        with self._load_lock:
+            # 等待锁期间其他线程可能已完成载入
+            if not force and not self._is_stale():
+                return
+            with self._lock:
+                self._journal = []
+            try:
+                state = _IndexState()
+                # 载入期间的增量修改靠日志重放，只有主库的数据能与之衔接
+                with replica_router.primary():
+                    vehicles = db.session.execute(
+                        db.select(Vehicle.vehicle_id, Vehicle.type, Vehicle.brand, Vehicle.model,
+                                  Vehicle.color, Vehicle.price_per_day, Vehicle.plate_number)
+                        .where(Vehicle.is_deleted == False)
+                    )
+                    for row in vehicles:
+                        state.upsert_vehicle(_vehicle_entry(*row))
+                    rentals = db.session.execute(
+                        db.select(Rental.rental_id, Rental.vehicle_id, Rental.status,
+                                  Rental.start_time, Rental.expected_return_time)
+                        .where(Rental.status.in_(ACTIVE_RENTAL_STATUSES))
+                    )
+                    for row in rentals:
+                        state.set_rental(*row)
+                db.session.rollback()
+                with self._lock:
+                    for change in self._journal:
+                        change(state)
+                    self._state = state
+                    self._loaded_at = time.monotonic()
+            finally:
+                with self._lock:
+                    self._journal = None
+
+    def _is_stale(self):
+        return self._state is None or time.monotonic() - self._loaded_at > self.reload_seconds
+
+    def ensure_loaded(self):
+        if self._is_stale():
+            self.load(force=False)
+
+    def mark_stale(self):
+        # 批量修改后由下一次查询重新载入
+        with self._lock:
+            if self._state is not None:
+                self._loaded_at = float('-inf')
+
+    def _apply(self, change):
+        # 索引尚未载入时无需记录，载入时会从数据库读到最新状态
+        with self._lock:
+            if self._state is not None:
+                change(self._state)
+            if self._journal is not None:
+                self._journal.append(change)
+
+    def upsert_vehicle(self, vehicle):
+        entry = _vehicle_entry(vehicle.vehicle_id, vehicle.type, vehicle.brand, vehicle.model,
+                               vehicle.color, vehicle.price_per_day, vehicle.plate_number)
+        self._apply(lambda state: state.upsert_vehicle(entry))
+
+    def remove_vehicle(self, vehicle_id):
+        self._apply(lambda state: state.remove_vehicle(vehicle_id))
+
+    def apply_rental(self, rental):
+        self.apply_rentals([(rental.rental_id, rental.vehicle_id, rental.status,
+                             rental.start_time, rental.expected_return_time)])
+
+    def apply_rentals(self, rows):
+        # rows 为 (rental_id, vehicle_id, status, start_time, expected_return_time)
+        rows = list(rows)
+
+        def change(state):
+            for row in rows:
+                state.set_rental(*row)
+        self._apply(change)
+
+    def mark_overdue(self, rental_ids):
+        rental_ids = list(rental_ids)
+
+        def change(state):
+            for rental_id in rental_ids:
+                state.mark_overdue(rental_id)
+        self._apply(change)
+
+    def search(self, start, end, vehicle_type=None, brand=None,
+               min_price=None, max_price=None, after=None, limit=50):
+        """返回 [start, end) 内空闲且满足条件的车辆（按 vehicle_id 升序）和下一页的起点。"""
+        self.ensure_loaded()
+        with self._lock:
+            state = self._state
+            # 从最小的候选集合开始遍历
+            candidates = state.vehicle_ids
+            if vehicle_type is not None:
+                candidates = state.by_type.get(vehicle_type, [])
+            if brand is not None:
+                by_brand = state.by_brand.get(brand, [])
+                if len(by_brand) < len(candidates):
+                    candidates = by_brand
+            min_price = float(min_price) if min_price is not None else None
+            max_price = float(max_price) if max_price is not None else None
+
+            position = bisect.bisect_right(candidates, after) if after is not None else 0
+            results = []
+            last_vehicle_id = None
+            for vehicle_id in candidates[position:]:
+                vehicle = state.vehicles[vehicle_id]
+                if vehicle_type is not None and vehicle['type'] != vehicle_type:
+                    continue
+                if brand is not None and vehicle['brand'] != brand:
+                    continue
+                price = vehicle['price_per_day']
+                if (min_price is not None and price < min_price) or \
+                        (max_price is not None and price > max_price):
+                    continue
+                schedule = state.schedules.get(vehicle_id)
+                if schedule is not None and not schedule.is_free(start, end):
+                    continue
+                if len(results) == limit:
+                    return results, last_vehicle_id
+                results.append(vehicle)
+                last_vehicle_id = vehicle_id
+            return results, None
+
+    def stats(self):
+        state = self._state
+        if state is None:
+            return {'loaded': False}
+        return {
+            'loaded': True,
+            'vehicles': len(state.vehicles),
+            'active_rentals': len(state.rental_vehicles),
+            'loaded_seconds_ago': round(time.monotonic() - self._loaded_at, 3),
+        }
+
+
+availability_index = AvailabilityIndex()
@@ -0,0 +1,128 @@
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm.exc import StaleDataError
+from app import db
+from app.models import Customer, Rental, Vehicle
+from app.services.availability import ACTIVE_RENTAL_STATUSES
+from app.services.ledger import apply_balance_change
+from app.services.reports import record_rental_event
+
+
+class BookingError(Exception):
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def begin_locked_transaction():
+    # SQLite 不支持 SELECT ... FOR UPDATE，改用 BEGIN IMMEDIATE 提前获取写锁
+    if db.engine.dialect.name == 'sqlite':
+        db.session.connection().exec_driver_sql('BEGIN IMMEDIATE')
+
+
+def run_with_retry(operation):
+    """执行一次写事务，遇到锁冲突或版本冲突时回滚并按指数退避重试。"""
+    max_retries = current_app.config.get('BOOKING_MAX_RETRIES', 5)
+    backoff = current_app.config.get('BOOKING_RETRY_BACKOFF_SECONDS', 0.02)
+    for attempt in range(max_retries + 1):
+        try:
+            return operation()
+        except (StaleDataError, OperationalError):
+            db.session.rollback()
+            if attempt == max_retries:
+                break
+            time.sleep(backoff * (2 ** attempt) * (1 + random.random()))
+        except Exception:
+            db.session.rollback()
+            raise
+    raise BookingError('Too many concurrent requests, please retry', 409)
+
+
+def conflicting_rentals(vehicle_id, start_time, end_time, now):
+    # 逾期和已过预计归还时间仍未归还的租赁一直占用车辆，其余按 [开始, 预计归还) 计算
+    return Rental.query.filter(
+        Rental.vehicle_id == vehicle_id,
+        Rental.status.in_(ACTIVE_RENTAL_STATUSES),
+        Rental.start_time < end_time,
+        or_(Rental.expected_return_time > start_time,
+            Rental.status == 'overdue',
+            and_(Rental.status == 'ongoing', Rental.expected_return_time <= now))
+    )
+
+
+def _book_vehicle(vehicle_id, customer_id, duration_days, start_time=None):
+    db.session.rollback()
+    begin_locked_transaction()
+
+    # 锁定车辆行，同一辆车的下单请求在此串行化
+    vehicle = (
+        Vehicle.query
+        .filter_by(vehicle_id=vehicle_id, is_deleted=False)
+        .with_for_update()
+        .first()
+    )
+    if not vehicle:
+        raise BookingError('Vehicle not found', 404)
+
+    # 检查客户是否有逾期的租赁记录
+    overdue_rental = Rental.query.filter(
+        Rental.customer_id == customer_id,
+        Rental.status == 'overdue'
+    ).first()
+    if overdue_rental:
+        raise BookingError('Customer has overdue rental')
+
+    # 未指定开始时间或开始时间已到时立即起租，否则创建预约
+    now = datetime.now()
+    reserved = start_time is not None and start_time > now
+    if not reserved:
+        start_time = now
+    end_time = start_time + timedelta(days=duration_days)
+
+    # 检查租期内车辆是否已被租出或预约
+    if conflicting_rentals(vehicle_id, start_time, end_time, now).first():
+        if reserved:
+            raise BookingError('Vehicle is not available for the requested period')
+        raise BookingError('Vehicle is currently rented out')
+
+    # 已删除的客户不能下单，否则会在扣费时被误报为余额不足
+    customer = Customer.query.filter_by(customer_id=customer_id, is_deleted=False).first()
+    if not customer:
+        raise BookingError('Customer not found', 404)
+
+    total_fee = Decimal(vehicle.price_per_day) * Decimal(duration_days)
+
+    rental = Rental(
+        vehicle_id=vehicle_id,
+        customer_id=customer_id,
+        start_time=start_time,
+        duration_days=duration_days,
+        expected_return_time=end_time,
+        total_fee=total_fee,
+        status='reserved' if reserved else 'ongoing'
+    )
+    db.session.add(rental)
+    db.session.flush()
+
+    # 余额检查和扣费在同一条 UPDATE 中完成，并记录流水
+    if apply_balance_change(customer_id, -total_fee, 'rental', rental.rental_id) is None:
+        raise BookingError('余额不足')
+    record_rental_event(rental, 'created')
+
+    # 预约在开始时由调度器转为进行中，届时再更新车辆的当前状态
+    if not reserved:
+        vehicle.current_rental_id = rental.rental_id
+        vehicle.current_status = 'ongoing'
+    db.session.commit()
+    return rental
+
+
+def book_vehicle(vehicle_id, customer_id, duration_days, start_time=None):
+    return run_with_retry(
+        lambda: _book_vehicle(vehicle_id, customer_id, duration_days, start_time))
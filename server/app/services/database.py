@@ -0,0 +1,74 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# 只读副本在 SQLALCHEMY_BINDS 中的键：replica_0、replica_1 ...
+REPLICA_BIND_PREFIX = 'replica_'
+
+
+def database_uri(uri):
+    # 部分托管平台提供的连接串使用已废弃的 postgres:// 前缀
+    if uri.startswith('postgres://'):
+        return 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def pool_options(config, backend):
+    # SQLite 按文件加锁，连接池参数对它没有意义（内存库使用的连接池也不接受这些参数）
+    if backend == 'sqlite':
+        return {}
+    return {
+        'pool_size': config.get('DB_POOL_SIZE', 5),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': config.get('DB_POOL_PRE_PING', True),
+    }
+
+
+def engine_options(config, uri=None):
+    """根据 DB_* 配置生成 create_engine 的参数，显式设置的 SQLALCHEMY_ENGINE_OPTIONS 优先。"""
+    backend = make_url(uri or config['SQLALCHEMY_DATABASE_URI']).get_backend_name()
+    options = pool_options(config, backend)
+    statement_timeout = config.get('DB_STATEMENT_TIMEOUT_MS')
+    if backend == 'postgresql' and statement_timeout:
+        options['connect_args'] = {'options': f'-c statement_timeout={int(statement_timeout)}'}
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+
+def replica_bind_keys(config):
+    return [f'{REPLICA_BIND_PREFIX}{index}'
+            for index in range(len(config.get('DATABASE_REPLICA_URLS') or []))]
+
+
+def configure_database(app):
+    """在 db.init_app 之前调用：规范化连接串、填入连接池参数，并把只读副本注册为 bind。"""
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri(app.config['SQLALCHEMY_DATABASE_URI'])
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    # 副本与主库可能使用不同的数据库，按各自的连接串生成参数
+    for key, url in zip(replica_bind_keys(app.config), app.config.get('DATABASE_REPLICA_URLS') or []):
+        url = database_uri(url)
+        binds[key] = {'url': url, **engine_options(app.config, url)}
+    app.config['SQLALCHEMY_BINDS'] = binds
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+
+
+def install_sqlite_pragmas(app, engines):
+    """为 SQLite 连接设置写锁等待时间，文件库启用 WAL，读写互不阻塞。"""
+    busy_timeout = int(app.config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    wal = app.config.get('SQLITE_WAL_ENABLED', True)
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f'PRAGMA busy_timeout = {busy_timeout}')
+            if wal:
+                # 内存库不支持 WAL，此时该语句不起作用
+                cursor.execute('PRAGMA journal_mode = WAL')
+                cursor.execute('PRAGMA synchronous = NORMAL')
+        finally:
+            cursor.close()
+
+    for engine in engines:
+        if engine.dialect.name == 'sqlite':
+            event.listen(engine, 'connect', on_connect)
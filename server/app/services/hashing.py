@@ -0,0 +1,165 @@
+import functools
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from flask import jsonify
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# forkserver 从干净的单线程进程派生子进程；不支持的平台（Windows）退回 spawn
+DEFAULT_MP_CONTEXT = ('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods()
+                      else 'spawn')
+
+
+class HashingBusy(Exception):
+    def __init__(self, message, retry_after=1, status_code=503):
+        super().__init__(message)
+        self.message = message
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+
+def busy_response(e):
+    response = jsonify({'error': e.message})
+    response.status_code = e.status_code
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+
+class PasswordHasher:
+    """在独立的进程池中计算密码哈希，排队数超过上限时直接拒绝。
+
+    哈希计算是 CPU 密集型操作，放到进程池中执行可以避免注册/登录高峰
+    占满 WSGI 工作线程，拖慢车辆列表等普通读接口。
+    workers 为 0 时在当前线程中计算，但仍然受并发上限约束。
+    """
+
+    def __init__(self, app=None):
+        self.workers = 2
+        self.queue_size = 32
+        self.timeout = 10
+        self.retry_after = 1
+        self.mp_context = DEFAULT_MP_CONTEXT
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._latencies = deque(maxlen=1000)
+        self._metrics = {'submitted': 0, 'completed': 0, 'rejected': 0,
+                         'timeouts': 0, 'max_in_flight': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['password_hasher'] = self
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', 2)
+        self.queue_size = app.config.get('PASSWORD_HASH_QUEUE_SIZE', 32)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT_SECONDS', 10)
+        self.retry_after = app.config.get('PASSWORD_HASH_RETRY_AFTER_SECONDS', 1)
+        self.mp_context = app.config.get('PASSWORD_HASH_MP_CONTEXT') or DEFAULT_MP_CONTEXT
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+        app.add_url_rule('/api/_debug/password-hashing', 'password_hashing_metrics',
+                         lambda: jsonify(self.metrics()))
+
+    def generate(self, password):
+        return self._run(generate_password_hash, password)
+
+    def check(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def _get_executor(self):
+        # 进程池在第一次使用时创建，避免在导入应用时就启动子进程
+        with self._executor_lock:
+            if self._executor is None:
+                context = multiprocessing.get_context(self.mp_context)
+                if self.mp_context == 'forkserver':
+                    # 预先在 forkserver 中导入 werkzeug，新的工作进程无需再导入
+                    context.set_forkserver_preload(['werkzeug.security'])
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=context)
+            return self._executor
+
+    def _reset_executor(self, executor):
+        with self._executor_lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, func, *args):
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            with self._lock:
+                self._metrics['rejected'] += 1
+            raise HashingBusy('Too many authentication requests, please retry later',
+                              self.retry_after)
+        with self._lock:
+            self._in_flight += 1
+            self._metrics['submitted'] += 1
+            self._metrics['max_in_flight'] = max(self._metrics['max_in_flight'], self._in_flight)
+        release = functools.partial(self._release, slots)
+        started = time.perf_counter()
+        try:
+            if self.workers <= 0:
+                try:
+                    return func(*args)
+                finally:
+                    release()
+            executor = self._get_executor()
+            try:
+                future = executor.submit(func, *args)
+            except BrokenProcessPool:
+                release()
+                self._restart(executor)
+            # 名额在任务结束时才归还：等待超时后任务可能仍在进程池中运行，
+            # 提前归还会让实际排队的任务超过上限
+            future.add_done_callback(release)
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                future.cancel()
+                with self._lock:
+                    self._metrics['timeouts'] += 1
+                raise HashingBusy('Authentication timed out, please retry later',
+                                  self.retry_after)
+            except BrokenProcessPool:
+                self._restart(executor)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._metrics['completed'] += 1
+                self._latencies.append(elapsed)
+
+    def _release(self, slots, future=None):
+        with self._lock:
+            self._in_flight -= 1
+        slots.release()
+
+    def _restart(self, executor):
+        self._reset_executor(executor)
+        raise HashingBusy('Authentication service restarting, please retry later',
+                          self.retry_after)
+
+    def metrics(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            in_flight = self._in_flight
+            result = dict(self._metrics)
+        result.update({
+            'workers': self.workers,
+            'queue_size': self.queue_size,
+            'in_flight': in_flight,
+            'queue_depth': max(0, in_flight - max(self.workers, 1)),
+            'latency_ms': {
+                'avg': round(sum(latencies) / len(latencies), 3) if latencies else None,
+                'p50': round(latencies[len(latencies) // 2], 3) if latencies else None,
+                'p95': round(latencies[int(len(latencies) * 0.95)], 3) if latencies else None,
+                'max': round(latencies[-1], 3) if latencies else None,
+            },
+        })
+        return result
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,240 @@
+import hashlib
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import current_app, jsonify, request
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from app.services.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+# 暂时性失败（锁冲突、限流）不保存响应，客户端可以用同一个键重试
+RETRYABLE_STATUS = (409, 429)
+POLL_SECONDS = 0.05
+
+
+def scoped_key(client, key):
+    """按客户端隔离幂等键，不同客户端碰巧使用相同的键时互不影响。"""
+    return hashlib.sha256(f'{client}\n{key}'.encode()).hexdigest()
+
+
+def request_client():
+    # 与限流相同：携带有效令牌时按用户，否则按客户端地址
+    from app.services.rate_limit import rate_limiter
+
+    return rate_limiter.client_key(request.headers.get('Authorization'), request.remote_addr)
+
+
+def request_fingerprint():
+    digest = hashlib.sha256()
+    for part in (request.method.encode(), request.path.encode(), request.get_data()):
+        digest.update(part)
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+class IdempotencyStore:
+    """按 Idempotency-Key 请求头对写接口去重，同一个客户端同一个键的请求只执行一次。
+
+    响应保存在 idempotency_keys 表中，超过 IDEMPOTENCY_TTL_SECONDS 后清理；进程内 LRU
+    作为热缓存，重试直接返回保存的响应，不再访问业务表。原请求执行期间，同一进程内的重复
+    请求等待它结束，其他进程的重复请求轮询数据库，超过 IDEMPOTENCY_WAIT_SECONDS 返回 409。
+    5xx 和暂时性失败不保存响应并释放键。原请求提交业务事务后、保存响应前进程退出时，
+    该键保持执行中直到过期，期间的重试返回 409 而不会重复扣费。
+    """
+
+    def __init__(self, app=None):
+        self.ttl_seconds = 24 * 3600
+        self.wait_seconds = 10
+        self.purge_seconds = 600
+        self.cache = LRUCache()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._purged_at = None
+        self.executed = 0
+        self.replayed = 0
+        self.rejected = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['idempotency'] = self
+        self.ttl_seconds = app.config.get('IDEMPOTENCY_TTL_SECONDS', 24 * 3600)
+        self.wait_seconds = app.config.get('IDEMPOTENCY_WAIT_SECONDS', 10)
+        self.purge_seconds = app.config.get('IDEMPOTENCY_PURGE_SECONDS', 600)
+        self.cache = LRUCache(maxsize=app.config.get('IDEMPOTENCY_CACHE_SIZE', 10000),
+                              ttl=app.config.get('IDEMPOTENCY_CACHE_TTL_SECONDS', 300))
+        self._in_flight = {}
+        self._purged_at = None
+        app.add_url_rule('/api/_debug/idempotency', 'idempotency_metrics',
+                         lambda: jsonify(self.metrics()))
+
+    def idempotent(self, view):
+        """装饰写接口；不带 Idempotency-Key 的请求照常执行。"""
+        @wraps(view)
+        def wrapper(**kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if key is None:
+                return view(**kwargs)
+            if not key or len(key) > MAX_KEY_LENGTH:
+                return jsonify({'error': f'{IDEMPOTENCY_HEADER} must be 1-{MAX_KEY_LENGTH} characters'}), 400
+            return self._handle(scoped_key(request_client(), key), request_fingerprint(),
+                                view, kwargs)
+        return wrapper
+
+    def _handle(self, key, fingerprint, view, kwargs):
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            entry = self.cache.get(key)
+            if entry is not None:
+                return self._replay(entry, fingerprint)
+            with self._lock:
+                event = self._in_flight.get(key)
+                owner = event is None
+                if owner:
+                    event = self._in_flight[key] = threading.Event()
+            if not owner:
+                # 原请求结束后重新检查：成功则命中热缓存，失败则由本请求重新占用
+                if not event.wait(max(0, deadline - time.monotonic())):
+                    return self._in_progress()
+                continue
+            try:
+                return self._execute(key, fingerprint, view, kwargs, deadline)
+            finally:
+                with self._lock:
+                    self._in_flight.pop(key, None)
+                event.set()
+
+    def _execute(self, key, fingerprint, view, kwargs, deadline):
+        while True:
+            row = self._claim(key, fingerprint)
+            if row is None:
+                break
+            if row.status == 'completed':
+                entry = {'request_hash': row.request_hash, 'status': row.response_status,
+                         'body': row.response_body}
+                self.cache.set(key, entry)
+                return self._replay(entry, fingerprint)
+            if row.request_hash != fingerprint:
+                return self._mismatch()
+            # 其他进程正在执行
+            if time.monotonic() >= deadline:
+                return self._in_progress()
+            time.sleep(POLL_SECONDS)
+
+        self.executed += 1
+        try:
+            response = current_app.make_response(view(**kwargs))
+        except Exception:
+            self._release(key)
+            raise
+        if response.status_code >= 500 or response.status_code in RETRYABLE_STATUS:
+            self._release(key)
+        else:
+            self._complete(key, fingerprint, response)
+        return response
+
+    def _claim(self, key, fingerprint):
+        """占用键并返回 None；键已被占用且未过期时返回已有记录。"""
+        from app import db
+        from app.models import IdempotencyKey
+
+        table = IdempotencyKey.__table__
+        while True:
+            now = datetime.now()
+            self._maybe_purge(now)
+            try:
+                db.session.execute(insert(table).values(
+                    key=key, request_hash=fingerprint, status='pending', created_at=now,
+                    expires_at=now + timedelta(seconds=self.ttl_seconds)))
+                db.session.commit()
+                return None
+            except IntegrityError:
+                db.session.rollback()
+            row = db.session.execute(select(table).where(table.c.key == key)).first()
+            # 结束读事务，轮询时才能看到其他进程提交的结果
+            db.session.rollback()
+            if row is not None and row.expires_at > now:
+                return row
+            # 已过期的记录清理后重新占用
+            db.session.execute(delete(table).where(table.c.key == key, table.c.expires_at <= now))
+            db.session.commit()
+
+    def _complete(self, key, fingerprint, response):
+        from app import db
+        from app.models import IdempotencyKey
+
+        table = IdempotencyKey.__table__
+        body = response.get_data(as_text=True)
+        try:
+            db.session.execute(update(table).where(table.c.key == key).values(
+                status='completed', response_status=response.status_code, response_body=body))
+            db.session.commit()
+        except Exception as e:
+            # 保持执行中状态，重试返回 409 而不是再次执行
+            db.session.rollback()
+            logger.warning('保存幂等响应失败 %s: %s', key, e)
+            return
+        self.cache.set(key, {'request_hash': fingerprint, 'status': response.status_code,
+                             'body': body})
+
+    def _release(self, key):
+        from app import db
+        from app.models import IdempotencyKey
+
+        table = IdempotencyKey.__table__
+        try:
+            db.session.execute(delete(table).where(table.c.key == key,
+                                                   table.c.status == 'pending'))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning('释放幂等键失败 %s: %s', key, e)
+
+    def _maybe_purge(self, now):
+        from app import db
+        from app.models import IdempotencyKey
+
+        if self._purged_at is not None and time.monotonic() - self._purged_at < self.purge_seconds:
+            return
+        self._purged_at = time.monotonic()
+        table = IdempotencyKey.__table__
+        db.session.execute(delete(table).where(table.c.expires_at <= now))
+        db.session.commit()
+
+    def _replay(self, entry, fingerprint):
+        if entry['request_hash'] != fingerprint:
+            return self._mismatch()
+        self.replayed += 1
+        response = current_app.response_class(entry['body'], status=entry['status'],
+                                              mimetype='application/json')
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
+
+    def _mismatch(self):
+        self.rejected += 1
+        return jsonify({'error': f'{IDEMPOTENCY_HEADER} was already used for a different request'}), 422
+
+    def _in_progress(self):
+        self.rejected += 1
+        response = jsonify({'error': f'A request with this {IDEMPOTENCY_HEADER} is still in progress'})
+        response.status_code = 409
+        response.headers['Retry-After'] = '1'
+        return response
+
+    def metrics(self):
+        return {
+            'executed': self.executed,
+            'replayed': self.replayed,
+            'rejected': self.rejected,
+            'in_flight': len(self._in_flight),
+            'cache': self.cache.stats(),
+        }
+
+
+idempotency_store = IdempotencyStore()
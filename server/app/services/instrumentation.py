@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import Counter, deque
+from flask import g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_listening = False
+_listen_lock = threading.Lock()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # 开始时间记在本次执行的上下文上，语句出错时随上下文一起丢弃
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_query_start', None)
+    if started is None or not has_request_context():
+        return
+    stats = g.get('sql_stats')
+    if stats is None:
+        return
+    elapsed = (time.perf_counter() - started) * 1000
+    stats['count'] += 1
+    stats['time_ms'] += elapsed
+    # 语句已参数化，同一形状的语句文本相同
+    stats['shapes'][statement] += 1
+    if elapsed > stats['slowest_ms']:
+        stats['slowest_ms'] = elapsed
+        stats['slowest_statement'] = statement
+
+
+def _listen_engine_events():
+    # 监听所有 Engine，只统计处于请求上下文中的语句
+    global _listening
+    with _listen_lock:
+        if not _listening:
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            _listening = True
+
+
+class SQLInstrumentation:
+    """按请求统计 SQL 语句数、耗时和最慢语句，并检测 N+1 查询。"""
+
+    def __init__(self, app=None):
+        self.n_plus_one_threshold = 3
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._suspects = deque(maxlen=50)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['sql_instrumentation'] = self
+        if not app.config.get('SQL_INSTRUMENTATION_ENABLED', True):
+            return
+        self.n_plus_one_threshold = app.config.get('SQL_N_PLUS_ONE_THRESHOLD', 3)
+        _listen_engine_events()
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/api/_debug/metrics', 'debug_metrics', self._metrics_view)
+
+    def _before_request(self):
+        g.sql_stats = {
+            'started': time.perf_counter(),
+            'count': 0,
+            'time_ms': 0.0,
+            'slowest_ms': 0.0,
+            'slowest_statement': None,
+            'shapes': Counter(),
+        }
+
+    def _after_request(self, response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+        total_ms = (time.perf_counter() - stats['started']) * 1000
+        suspects = [
+            {'statement': statement, 'count': count}
+            for statement, count in stats['shapes'].items()
+            if count >= self.n_plus_one_threshold
+        ]
+
+        response.headers.add(
+            'Server-Timing', f'db;dur={stats["time_ms"]:.2f};desc="{stats["count"]} queries"')
+        response.headers.add('Server-Timing', f'app;dur={total_ms:.2f}')
+        if suspects:
+            response.headers['X-N-Plus-One-Suspects'] = str(len(suspects))
+
+        endpoint = request.endpoint or request.path
+        with self._lock:
+            summary = self._endpoints.setdefault(endpoint, {
+                'requests': 0,
+                'queries': 0,
+                'db_time_ms': 0.0,
+                'max_queries': 0,
+                'slowest_ms': 0.0,
+                'slowest_statement': None,
+                'n_plus_one_requests': 0,
+            })
+            summary['requests'] += 1
+            summary['queries'] += stats['count']
+            summary['db_time_ms'] += stats['time_ms']
+            summary['max_queries'] = max(summary['max_queries'], stats['count'])
+            if stats['slowest_ms'] > summary['slowest_ms']:
+                summary['slowest_ms'] = stats['slowest_ms']
+                summary['slowest_statement'] = stats['slowest_statement']
+            if suspects:
+                summary['n_plus_one_requests'] += 1
+                self._suspects.append({
+                    'endpoint': endpoint,
+                    'path': request.full_path,
+                    'statements': suspects,
+                })
+        return response
+
+    def metrics(self):
+        with self._lock:
+            endpoints = {}
+            for endpoint, summary in self._endpoints.items():
+                endpoints[endpoint] = {
+                    **summary,
+                    'db_time_ms': round(summary['db_time_ms'], 3),
+                    'slowest_ms': round(summary['slowest_ms'], 3),
+                    'avg_queries': round(summary['queries'] / summary['requests'], 2),
+                    'avg_db_time_ms': round(summary['db_time_ms'] / summary['requests'], 3),
+                }
+            return {
+                'endpoints': endpoints,
+                'n_plus_one_suspects': list(self._suspects),
+            }
+
+    def _metrics_view(self):
+        return jsonify(self.metrics())
+
+
+sql_instrumentation = SQLInstrumentation()
@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import func, insert, update
+from app import db
+from app.models import BalanceSnapshot, Customer, MoneyLedger
+
+
+def apply_balance_change(customer_id, delta, reason, rental_id=None):
+    """在调用方的事务中原子地修改余额并追加流水。
+
+    返回修改后的余额；客户不存在、已删除或余额不足时返回 None。
+    """
+    delta = Decimal(delta)
+    # 余额检查和修改在同一条 UPDATE 中完成，并发请求不会丢失更新
+    new_money = db.session.execute(
+        update(Customer)
+        .where(Customer.customer_id == customer_id,
+               Customer.is_deleted == False,
+               Customer.money + delta >= 0)
+        .values(money=Customer.money + delta, version=Customer.version + 1)
+        .returning(Customer.money)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if new_money is None:
+        return None
+
+    db.session.execute(insert(MoneyLedger).values(
+        customer_id=customer_id,
+        delta=delta,
+        balance_after=new_money,
+        reason=reason,
+        rental_id=rental_id,
+        created_at=datetime.now(),
+    ))
+    return new_money
+
+
+def _replayed_balances(up_to_ledger_id=None):
+    # 最新快照 + 快照之后的流水 = 按流水重放得到的余额
+    snapshots = {
+        customer_id: (ledger_id, balance)
+        for customer_id, ledger_id, balance in db.session.query(
+            BalanceSnapshot.customer_id, BalanceSnapshot.ledger_id, BalanceSnapshot.balance)
+    }
+    query = (
+        db.session.query(MoneyLedger.customer_id,
+                         func.sum(MoneyLedger.delta),
+                         func.max(MoneyLedger.ledger_id))
+        .outerjoin(BalanceSnapshot, BalanceSnapshot.customer_id == MoneyLedger.customer_id)
+        .filter((BalanceSnapshot.ledger_id == None) |
+                (MoneyLedger.ledger_id > BalanceSnapshot.ledger_id))
+        .group_by(MoneyLedger.customer_id)
+    )
+    if up_to_ledger_id is not None:
+        query = query.filter(MoneyLedger.ledger_id <= up_to_ledger_id)
+
+    balances = {customer_id: (ledger_id, Decimal(balance))
+                for customer_id, (ledger_id, balance) in snapshots.items()}
+    for customer_id, total_delta, last_ledger_id in query:
+        _, balance = balances.get(customer_id, (0, Decimal('0')))
+        balances[customer_id] = (last_ledger_id, balance + Decimal(total_delta))
+    return balances
+
+
+def snapshot_balances(settle_seconds=60):
+    """把每个客户的余额快照推进到最新的流水号，旧快照被覆盖。
+
+    之后的核对和重放只需要读取快照之后的流水。只处理 settle_seconds 秒之前
+    写入的流水，避免遗漏尚未提交的较小流水号。返回更新的快照数。
+    """
+    settled_before = datetime.now() - timedelta(seconds=settle_seconds)
+    high_water_mark = (
+        db.session.query(func.max(MoneyLedger.ledger_id))
+        .filter(MoneyLedger.created_at < settled_before)
+        .scalar()
+    )
+    if high_water_mark is None:
+        return 0
+    snapshots = {customer_id: ledger_id for customer_id, ledger_id in
+                 db.session.query(BalanceSnapshot.customer_id, BalanceSnapshot.ledger_id)}
+    changed = 0
+    now = datetime.now()
+    for customer_id, (ledger_id, balance) in _replayed_balances(high_water_mark).items():
+        if snapshots.get(customer_id) == ledger_id:
+            continue
+        snapshot = db.session.get(BalanceSnapshot, customer_id) or BalanceSnapshot(customer_id=customer_id)
+        snapshot.ledger_id = ledger_id
+        snapshot.balance = balance
+        snapshot.created_at = now
+        db.session.add(snapshot)
+        changed += 1
+    db.session.commit()
+    return changed
+
+
+def reconcile_balances():
+    """比较客户表中的余额与流水重放结果，返回不一致的客户列表。"""
+    replayed = _replayed_balances()
+    mismatches = []
+    for customer_id, money in db.session.query(Customer.customer_id, Customer.money):
+        _, expected = replayed.get(customer_id, (None, Decimal('0')))
+        actual = Decimal(money or 0)
+        if actual != expected:
+            mismatches.append({
+                'customer_id': customer_id,
+                'money': float(actual),
+                'ledger_balance': float(expected),
+            })
+    return mismatches
+
+
+def customer_ledger(customer_id, limit=50):
+    return (
+        MoneyLedger.query
+        .filter_by(customer_id=customer_id)
+        .order_by(MoneyLedger.ledger_id.desc())
+        .limit(limit)
+        .all()
+    )
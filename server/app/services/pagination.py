@@ -0,0 +1,179 @@
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import and_, or_
+from sqlalchemy.engine import Row
+from app.services.streaming import wants_stream
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class PaginationError(ValueError):
+    pass
+
+
+class PageParams:
+    def __init__(self, limit, cursor, sort_column, descending, filters):
+        self.limit = limit
+        self.cursor = cursor
+        self.sort_column = sort_column
+        self.descending = descending
+        self.filters = filters
+
+
+def _coerce(column, value):
+    # 按列类型把查询参数/游标中的值转换回 Python 类型
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if value is None or isinstance(value, python_type):
+        return value
+    try:
+        if python_type is datetime:
+            return datetime.fromisoformat(value)
+        if python_type is Decimal:
+            return Decimal(str(value))
+        if python_type is bool:
+            return str(value).lower() in ('1', 'true', 'yes')
+        return python_type(value)
+    except (ValueError, ArithmeticError):
+        raise PaginationError(f'Invalid value for {column.key}: {value}')
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(sort_value, pk_value):
+    payload = json.dumps([_encode_value(sort_value), pk_value])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort_column, pk_column):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, pk_value = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise PaginationError('Invalid cursor')
+    return _coerce(sort_column, sort_value), _coerce(pk_column, pk_value)
+
+
+def parse_page_args(args, sort_fields, filter_fields, default_sort):
+    """解析 limit / cursor / sort 以及字段过滤参数。
+
+    sort_fields: {参数名: 列}，sort=-name 表示降序
+    filter_fields: {参数名: (列, 运算符)}，运算符为 eq / ge / le / lt
+    未传 limit 时每页 DEFAULT_PAGE_SIZE 条；limit=all 和流式导出（format=ndjson/stream）
+    不分页，limit 为 None。
+    """
+    limit = args.get('limit')
+    cursor = args.get('cursor')
+
+    sort = args.get('sort', default_sort)
+    descending = sort.startswith('-')
+    sort_name = sort.lstrip('-')
+    if sort_name not in sort_fields:
+        raise PaginationError(f'Invalid sort field: {sort_name}')
+
+    filters = []
+    for name, (column, op) in filter_fields.items():
+        if name not in args:
+            continue
+        value = _coerce(column, args.get(name))
+        if op == 'eq':
+            filters.append(column == value)
+        elif op == 'ge':
+            filters.append(column >= value)
+        elif op == 'le':
+            filters.append(column <= value)
+        elif op == 'lt':
+            filters.append(column < value)
+
+    if limit == 'all' or (limit is None and wants_stream(args)):
+        # 兼容需要一次取回全部数据的旧客户端，必须显式指定
+        page_limit = None
+    else:
+        try:
+            page_limit = int(limit) if limit is not None else DEFAULT_PAGE_SIZE
+        except ValueError:
+            raise PaginationError('Invalid limit')
+        if page_limit <= 0:
+            raise PaginationError('Limit must be positive')
+        page_limit = min(page_limit, MAX_PAGE_SIZE)
+
+    return PageParams(page_limit, cursor, sort_fields[sort_name],
+                      descending, filters)
+
+
+def _row_value(row, column):
+    # 行可能是单个实体、(实体, 列...) 元组或纯列元组
+    if isinstance(row, Row):
+        if column.key in row._fields:
+            return getattr(row, column.key)
+        row = row[0]
+    return getattr(row, column.key)
+
+
+def apply_page(query, params, pk_column):
+    # 只附加过滤、游标条件和排序，不执行查询
+    sort_column = params.sort_column
+    if params.filters:
+        query = query.filter(*params.filters)
+
+    if params.cursor:
+        sort_value, pk_value = decode_cursor(
+            params.cursor, sort_column, pk_column)
+        if sort_column is pk_column:
+            after = pk_column < pk_value if params.descending else pk_column > pk_value
+        elif params.descending:
+            after = or_(sort_column < sort_value,
+                        and_(sort_column == sort_value, pk_column < pk_value))
+        else:
+            after = or_(sort_column > sort_value,
+                        and_(sort_column == sort_value, pk_column > pk_value))
+        query = query.filter(after)
+
+    if sort_column is pk_column:
+        order = [pk_column.desc() if params.descending else pk_column.asc()]
+    elif params.descending:
+        order = [sort_column.desc(), pk_column.desc()]
+    else:
+        order = [sort_column.asc(), pk_column.asc()]
+    return query.order_by(None).order_by(*order)
+
+
+def paginate(query, params, pk_column):
+    """按 (排序列, 主键) 做键集分页，返回 (rows, next_cursor)。
+
+    每页只读取 limit + 1 行，翻到多深的位置代价都相同。
+    """
+    query = apply_page(query, params, pk_column)
+    if params.limit is None:
+        return query.all(), None
+    return split_page(query.limit(params.limit + 1).all(), params, pk_column)
+
+
+def page_body(data, next_cursor, params, total):
+    # limit=all 时与分页前的接口一样附带 total（返回的条数）
+    body = {'data': data, 'next_cursor': next_cursor}
+    if params.limit is None:
+        body['total'] = total
+    return body
+
+
+def split_page(rows, params, pk_column):
+    # rows 为按 limit + 1 读取的结果，多出的一行表示还有下一页
+    next_cursor = None
+    if len(rows) > params.limit:
+        rows = rows[:params.limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(_row_value(last, params.sort_column),
+                                    _row_value(last, pk_column))
+    return rows, next_cursor
@@ -0,0 +1,21 @@
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+
+def install_proxy_fix(app):
+    """部署在 PROXY_FIX_HOPS 层可信反向代理之后时，用 X-Forwarded-For 还原客户端地址。
+
+    只应在生产入口调用：直接暴露给客户端时，伪造的转发头会被当作客户端地址。
+    """
+    hops = app.config.get('PROXY_FIX_HOPS', 0)
+    if hops > 0:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+    return app
+
+
+def forwarded_addr(remote_addr, forwarded_for, hops):
+    """与 ProxyFix 相同的取值规则：取 X-Forwarded-For 从右数第 hops 个地址，层数不够时用连接地址。"""
+    if hops > 0 and forwarded_for:
+        values = [value.strip() for value in forwarded_for.split(',')]
+        if len(values) >= hops:
+            return values[-hops]
+    return remote_addr
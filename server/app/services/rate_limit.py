@@ -0,0 +1,260 @@
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, namedtuple
+from flask import current_app, g, jsonify, request
+
+logger = logging.getLogger(__name__)
+
+# 视图函数上记录接口类别的属性名，由 RateLimiter.limit 设置
+ROUTE_CLASS_ATTR = 'rate_limit_class'
+
+RateLimitResult = namedtuple('RateLimitResult', 'allowed limit remaining reset retry_after')
+
+
+class MemoryBackend:
+    """进程内令牌桶，只适用于单进程部署；多进程部署时每个进程各自计数。"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        """尝试取一个令牌，返回 (是否放行, 剩余令牌数)。"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._evict(now)
+                tokens = burst
+            else:
+                tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+        return allowed, tokens
+
+    def _evict(self, now):
+        # 已经补满的桶与新建的桶等价，可以直接丢弃
+        full = [key for key, (_, _, full_at) in self._buckets.items() if full_at <= now]
+        for key in full:
+            del self._buckets[key]
+        if not full:
+            self._buckets.clear()
+
+    def stats(self):
+        return {'backend': 'memory', 'keys': len(self._buckets)}
+
+
+class SQLiteBackend:
+    """保存在本机 SQLite 文件中的令牌桶，同一台机器上的多个工作进程共享计数。
+
+    每次取令牌是一条 UPSERT ... RETURNING 语句，补充令牌和扣减在数据库中原子完成。
+    限流状态丢失没有影响，因此关闭了同步写盘。
+    """
+
+    TAKE_SQL = '''
+        INSERT INTO rate_limit_buckets (key, tokens, updated_at, allowed)
+        VALUES (:key, :burst - 1, :now, 1)
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = min(:burst, tokens + max(0, :now - updated_at) * :rate)
+                - (min(:burst, tokens + max(0, :now - updated_at) * :rate) >= 1),
+            allowed = min(:burst, tokens + max(0, :now - updated_at) * :rate) >= 1,
+            updated_at = :now
+        RETURNING allowed, tokens
+    '''
+
+    def __init__(self, path, busy_timeout_ms=1000):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS rate_limit_buckets ('
+            'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL, '
+            'allowed INTEGER NOT NULL) WITHOUT ROWID')
+
+    def _connection(self):
+        # 每个线程一个自动提交的连接
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000,
+                                         isolation_level=None)
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = OFF')
+            self._local.connection = connection
+        return connection
+
+    def take(self, key, rate, burst):
+        allowed, tokens = self._connection().execute(
+            self.TAKE_SQL, {'key': key, 'rate': rate, 'burst': burst, 'now': time.time()}
+        ).fetchone()
+        return bool(allowed), tokens
+
+    def stats(self):
+        keys = self._connection().execute('SELECT count(*) FROM rate_limit_buckets').fetchone()[0]
+        return {'backend': 'sqlite', 'path': self.path, 'keys': keys}
+
+
+class RateLimiter:
+    """按接口类别限流并限制并发。
+
+    用 limit(类别) 标记视图函数：每个客户端（携带有效令牌时按用户，否则按 IP）在每个类别下
+    有一个令牌桶，耗尽时返回 429；每个类别在每个进程中同时执行的请求数受信号量限制，
+    排队超过 RATE_LIMIT_QUEUE_TIMEOUT_SECONDS 时返回 503。未标记的接口不受影响。
+    限流后端出错时放行请求，只记录日志。
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.limits = {}
+        self.semaphores = {}
+        self.queue_timeout = 2
+        self.limited = Counter()
+        self.busy = Counter()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['rate_limiter'] = self
+        self.limits = dict(app.config.get('RATE_LIMITS') or {})
+        self.queue_timeout = app.config.get('RATE_LIMIT_QUEUE_TIMEOUT_SECONDS', 2)
+        self.limited = Counter()
+        self.busy = Counter()
+        if not app.config.get('RATE_LIMIT_ENABLED', True):
+            self.backend = None
+            self.semaphores = {}
+            return
+        self.backend = self._create_backend(app)
+        self.semaphores = {route_class: threading.BoundedSemaphore(limit)
+                           for route_class, limit in (app.config.get('RATE_LIMIT_CONCURRENCY') or {}).items()}
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.add_url_rule('/api/_debug/rate-limit', 'rate_limit_metrics',
+                         lambda: jsonify(self.metrics()))
+
+    @staticmethod
+    def _create_backend(app):
+        backend = app.config.get('RATE_LIMIT_BACKEND', 'memory')
+        if backend == 'memory':
+            if app.config.get('WEB_WORKERS', 1) > 1:
+                logger.warning('RATE_LIMIT_BACKEND=memory 在 %d 个工作进程中各自计数，'
+                               '实际限额会成倍放大，建议改用 sqlite', app.config['WEB_WORKERS'])
+            return MemoryBackend(max_keys=app.config.get('RATE_LIMIT_MAX_KEYS', 100000))
+        if backend == 'sqlite':
+            path = app.config.get('RATE_LIMIT_SQLITE_PATH')
+            if not path:
+                os.makedirs(app.instance_path, exist_ok=True)
+                path = os.path.join(app.instance_path, 'rate_limit.db')
+            return SQLiteBackend(path)
+        if backend == 'none':
+            return None
+        raise RuntimeError(f'Unknown rate limit backend: {backend}')
+
+    def limit(self, route_class):
+        """标记视图函数所属的接口类别，应放在 @bp.route 之下。"""
+        def decorator(view):
+            setattr(view, ROUTE_CLASS_ATTR, route_class)
+            return view
+        return decorator
+
+    def consume(self, route_class, client):
+        """从客户端在该类别下的令牌桶取一个令牌；类别未配置限流时返回 None。"""
+        limit = self.limits.get(route_class)
+        if limit is None or self.backend is None:
+            return None
+        rate, burst = limit['rate'], limit['burst']
+        try:
+            allowed, tokens = self.backend.take(f'{route_class}:{client}', rate, burst)
+        except Exception as e:
+            logger.warning('限流后端出错，放行请求: %s', e)
+            return None
+        if not allowed:
+            self.limited[route_class] += 1
+        return RateLimitResult(
+            allowed=allowed, limit=burst, remaining=int(tokens),
+            reset=math.ceil((burst - tokens) / rate),
+            retry_after=None if allowed else math.ceil((1 - tokens) / rate))
+
+    @staticmethod
+    def headers(result):
+        headers = {
+            'RateLimit-Limit': str(result.limit),
+            'RateLimit-Remaining': str(result.remaining),
+            'RateLimit-Reset': str(result.reset),
+        }
+        if not result.allowed:
+            headers['Retry-After'] = str(result.retry_after)
+        return headers
+
+    @staticmethod
+    def client_key(authorization, remote_addr):
+        """携带有效令牌时按用户计数，否则按 IP；解析令牌需要应用上下文。"""
+        if authorization:
+            from app.services.auth import AuthError, token_auth
+
+            try:
+                identity = token_auth.identity_from_header(authorization)
+            except AuthError:
+                identity = None
+            if identity is not None:
+                return f"user:{identity['user_id']}"
+        return f"ip:{remote_addr}"
+
+    def _client(self):
+        environ = request.environ
+        return self.client_key(environ.get('HTTP_AUTHORIZATION'), environ.get('REMOTE_ADDR'))
+
+    def _before_request(self):
+        view = current_app.view_functions.get(request.endpoint)
+        route_class = getattr(view, ROUTE_CLASS_ATTR, None)
+        if route_class is None:
+            return None
+        result = self.consume(route_class, self._client())
+        if result is not None:
+            g.rate_limit = result
+            if not result.allowed:
+                response = jsonify({'error': 'Too many requests, please retry later'})
+                response.status_code = 429
+                return response
+        semaphore = self.semaphores.get(route_class)
+        if semaphore is not None:
+            # 有空位时走不阻塞的快速路径
+            if not semaphore.acquire(blocking=False) and \
+                    not semaphore.acquire(timeout=self.queue_timeout):
+                self.busy[route_class] += 1
+                response = jsonify({'error': 'Server is busy, please retry later'})
+                response.status_code = 503
+                response.headers['Retry-After'] = '1'
+                return response
+            g.rate_limit_semaphore = semaphore
+        return None
+
+    def _after_request(self, response):
+        result = g.get('rate_limit')
+        if result is not None:
+            response.headers.update(self.headers(result))
+        return response
+
+    def _teardown_request(self, exc):
+        semaphore = g.pop('rate_limit_semaphore', None)
+        if semaphore is not None:
+            semaphore.release()
+
+    def metrics(self):
+        return {
+            'backend': self.backend.stats() if self.backend is not None else None,
+            'limited': dict(self.limited),
+            'busy': dict(self.busy),
+            'concurrency_available': {route_class: semaphore._value
+                            for route_class, semaphore in self.semaphores.items()},
+        }
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,241 @@
+import itertools
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from flask import g, has_request_context, jsonify, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select, event, insert, select, update
+from app.services.database import replica_bind_keys
+
+logger = logging.getLogger(__name__)
+
+# 请求头 X-DB-Route: primary / replica 可以覆盖单个 GET 请求的路由；响应头返回实际使用的库
+ROUTE_HEADER = 'X-DB-Route'
+# 写请求成功后设置，有效期内该客户端的读请求使用主库，保证读到自己的写入
+STICKY_COOKIE = 'db_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+HEARTBEAT_ID = 1
+
+
+class RoutingSession(Session):
+    """按当前请求的路由选择连接：只读的 SELECT 发往副本，其余语句使用主库。
+
+    会话一旦执行过写操作（flush、DML、SELECT ... FOR UPDATE 或无法判断的语句），
+    本次请求剩余的查询都使用主库，避免读不到刚写入的数据。
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None or engine is not self._db.engines.get(None):
+            return engine
+        if (self._flushing or not isinstance(clause, Select)
+                or clause._for_update_arg is not None):
+            self.info['db_primary'] = True
+            return engine
+        if self.info.get('db_primary'):
+            return engine
+        return replica_router.read_engine() or engine
+
+
+class ReplicaRouter:
+    """只读副本的选择、健康检查和复制延迟监测。
+
+    副本按轮询顺序选取，跳过连不上或复制延迟超过 DB_REPLICA_MAX_LAG_SECONDS 的副本，
+    没有可用副本时回退到主库。健康检查在请求中按间隔惰性执行（同一时间只有一个线程检查）：
+    读取主库和各副本上的心跳时间，两者之差即复制延迟，然后在主库写入新的心跳，
+    因此延迟的精度为检查间隔。
+    """
+
+    def __init__(self, app=None):
+        self.keys = []
+        self.read_prefixes = ()
+        self.check_seconds = 5
+        self.max_lag_seconds = 10
+        self.sticky_seconds = 10
+        self._states = {}
+        self._cycle = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self.routed = Counter()
+        self.fallbacks = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        from app import db
+
+        app.extensions['replica_router'] = self
+        self.keys = replica_bind_keys(app.config)
+        self.read_prefixes = tuple(app.config.get('DB_REPLICA_READ_PREFIXES', ()))
+        self.check_seconds = app.config.get('DB_REPLICA_CHECK_SECONDS', 5)
+        self.max_lag_seconds = app.config.get('DB_REPLICA_MAX_LAG_SECONDS', 10)
+        self.sticky_seconds = app.config.get('DB_REPLICA_STICKY_SECONDS', 10)
+        self._states = {key: {'healthy': True, 'lag_seconds': None, 'error': None}
+                        for key in self.keys}
+        self._cycle = itertools.cycle(self.keys)
+        self._checked_at = None
+        self.routed = Counter()
+        self.fallbacks = 0
+        if not self.keys:
+            return
+        with app.app_context():
+            for key in self.keys:
+                event.listen(db.engines[key], 'handle_error', self._error_listener(key))
+        app.before_request(self._route_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/api/_debug/replicas', 'replica_metrics',
+                         lambda: jsonify(self.metrics()))
+
+    def _error_listener(self, key):
+        # 连接断开时立即摘除副本，等下一次健康检查恢复
+        def on_error(context):
+            if context.is_disconnect:
+                self._set_state(key, healthy=False, lag_seconds=None,
+                                error=str(context.original_exception))
+        return on_error
+
+    def _request_route(self):
+        if request.method not in SAFE_METHODS:
+            return 'primary'
+        override = request.headers.get(ROUTE_HEADER, '').lower()
+        if override in ('primary', 'replica'):
+            return override
+        if request.cookies.get(STICKY_COOKIE):
+            return 'primary'
+        return 'replica' if request.path.startswith(self.read_prefixes) else 'primary'
+
+    def _route_request(self):
+        g.db_route = self._request_route()
+        g.db_replica = None
+
+    def _after_request(self, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(STICKY_COOKIE, '1', max_age=self.sticky_seconds,
+                                httponly=True, samesite='Lax')
+        response.headers[ROUTE_HEADER] = g.get('db_replica') or 'primary'
+        return response
+
+    @contextmanager
+    def primary(self):
+        """代码块内的查询强制使用主库，用于填充进程级缓存等不能读到旧数据的场景。"""
+        if not has_request_context():
+            yield
+            return
+        route = g.get('db_route')
+        g.db_route = 'primary'
+        try:
+            yield
+        finally:
+            g.db_route = route
+
+    def read_engine(self):
+        """返回当前请求应使用的副本引擎；请求外、路由为主库或没有可用副本时返回 None。"""
+        from app import db
+
+        if not self.keys or not has_request_context() or g.get('db_route') != 'replica':
+            return None
+        # 同一请求内的查询固定使用同一个副本
+        if g.get('db_replica') is None:
+            g.db_replica = self.choose() or 'primary'
+        if g.db_replica == 'primary':
+            return None
+        return db.engines[g.db_replica]
+
+    def choose(self):
+        self._maybe_check()
+        with self._lock:
+            for _ in range(len(self.keys)):
+                key = next(self._cycle)
+                if self._available(self._states[key]):
+                    self.routed[key] += 1
+                    return key
+            self.fallbacks += 1
+        return None
+
+    def _available(self, state):
+        return state['healthy'] and (state['lag_seconds'] is None
+                                     or state['lag_seconds'] <= self.max_lag_seconds)
+
+    def _set_state(self, key, **state):
+        with self._lock:
+            self._states[key] = state
+
+    def _maybe_check(self):
+        if self._checked_at is not None and \
+                time.monotonic() - self._checked_at < self.check_seconds:
+            return
+        # 其他线程正在检查时沿用上一次的结果
+        if not self._check_lock.acquire(blocking=False):
+            return
+        try:
+            if self._checked_at is None or \
+                    time.monotonic() - self._checked_at >= self.check_seconds:
+                self.check()
+        finally:
+            self._check_lock.release()
+
+    def check(self):
+        """检查各副本的连通性和复制延迟，然后在主库写入新的心跳。"""
+        from app import db
+
+        try:
+            primary_beat = self._read_beat(db.engines[None])
+        except Exception as e:
+            logger.warning('读取主库心跳失败: %s', e)
+            primary_beat = None
+        for key in self.keys:
+            try:
+                beat = self._read_beat(db.engines[key])
+            except Exception as e:
+                self._set_state(key, healthy=False, lag_seconds=None, error=str(e))
+                continue
+            if primary_beat is None:
+                # 首次检查时主库还没有心跳，无法判断延迟
+                self._set_state(key, healthy=True, lag_seconds=None, error=None)
+            elif beat is None:
+                self._set_state(key, healthy=False, lag_seconds=None,
+                                error='Heartbeat not replicated yet')
+            else:
+                lag = max(0.0, (primary_beat - beat).total_seconds())
+                self._set_state(key, healthy=True, lag_seconds=round(lag, 3), error=None)
+        try:
+            self._write_beat(db.engines[None])
+        except Exception as e:
+            logger.warning('写入主库心跳失败: %s', e)
+        self._checked_at = time.monotonic()
+
+    @staticmethod
+    def _read_beat(engine):
+        from app.models import ReplicaHeartbeat
+
+        with engine.connect() as conn:
+            return conn.execute(select(ReplicaHeartbeat.beat_at)
+                                .where(ReplicaHeartbeat.id == HEARTBEAT_ID)).scalar()
+
+    @staticmethod
+    def _write_beat(engine):
+        from app.models import ReplicaHeartbeat
+
+        now = datetime.now()
+        with engine.begin() as conn:
+            updated = conn.execute(update(ReplicaHeartbeat)
+                                   .where(ReplicaHeartbeat.id == HEARTBEAT_ID)
+                                   .values(beat_at=now)).rowcount
+            if not updated:
+                conn.execute(insert(ReplicaHeartbeat).values(id=HEARTBEAT_ID, beat_at=now))
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'replicas': {key: dict(state, routed=self.routed[key])
+                             for key, state in self._states.items()},
+                'fallbacks': self.fallbacks,
+                'max_lag_seconds': self.max_lag_seconds,
+            }
+
+
+replica_router = ReplicaRouter()
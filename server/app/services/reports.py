@@ -0,0 +1,245 @@
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.models import MoneyLedger, Rental, RentalDailyStats, Vehicle
+
+STAT_FIELDS = ('rentals', 'cancelled', 'refunded', 'completed', 'returned_late',
+               'revenue', 'booked_days', 'occupied_hours')
+GROUP_BY_COLUMNS = {
+    'day': RentalDailyStats.stat_date,
+    'type': RentalDailyStats.vehicle_type,
+    'brand': RentalDailyStats.brand,
+}
+DEFAULT_REPORT_DAYS = 30
+MAX_REPORT_DAYS = 366
+# 支持 INSERT ... ON CONFLICT DO UPDATE 的数据库
+UPSERT_INSERTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+
+class ReportError(ValueError):
+    pass
+
+
+def occupied_hours_by_day(start, end):
+    """把占用区间 [start, end) 按自然日拆分，返回 [(日期, 小时数)]。"""
+    result = []
+    current = start
+    while current < end:
+        segment_end = min(end, datetime.combine(current.date() + timedelta(days=1), time.min))
+        hours = Decimal((segment_end - current).total_seconds() / 3600).quantize(Decimal('0.01'))
+        result.append((current.date(), hours))
+        current = segment_end
+    return result
+
+
+def _add_event(deltas, rental, vehicle_type, brand, event, refunded=False):
+    # 计数、租金和天数归属到租赁开始的日期，占用时长归属到实际占用的日期
+    values = deltas[(rental.start_time.date(), vehicle_type, brand)]
+    if event == 'created':
+        values['rentals'] += 1
+        values['revenue'] += rental.total_fee
+        values['booked_days'] += rental.duration_days
+    elif event == 'cancelled':
+        values['cancelled'] += 1
+        if refunded:
+            values['refunded'] += 1
+            values['revenue'] -= rental.total_fee
+            values['booked_days'] -= rental.duration_days
+    elif event == 'returned':
+        values['completed'] += 1
+        if rental.actual_return_time > rental.expected_return_time:
+            values['returned_late'] += 1
+        for day, hours in occupied_hours_by_day(rental.start_time, rental.actual_return_time):
+            deltas[(day, vehicle_type, brand)]['occupied_hours'] += hours
+    else:
+        raise ValueError(f'Unknown rental event: {event}')
+
+
+def _stat_rows(deltas):
+    # 按主键排序，多行 upsert 时各事务以相同顺序加锁，避免死锁
+    return [
+        dict(stat_date=stat_date, vehicle_type=vehicle_type, brand=brand,
+             **{field: values.get(field, 0) for field in STAT_FIELDS})
+        for (stat_date, vehicle_type, brand), values in sorted(deltas.items())
+    ]
+
+
+def _apply_deltas(deltas):
+    table = RentalDailyStats.__table__
+    rows = _stat_rows(deltas)
+    if not rows:
+        return
+    upsert = UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+    if upsert is not None:
+        statement = upsert(table).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.stat_date, table.c.vehicle_type, table.c.brand],
+            set_={field: table.c[field] + statement.excluded[field] for field in STAT_FIELDS})
+        db.session.execute(statement)
+        return
+    # 其他数据库先尝试累加，行不存在时再插入
+    for row in rows:
+        updated = db.session.execute(
+            update(table)
+            .where(table.c.stat_date == row['stat_date'],
+                   table.c.vehicle_type == row['vehicle_type'],
+                   table.c.brand == row['brand'])
+            .values({field: table.c[field] + row[field] for field in STAT_FIELDS})
+        ).rowcount
+        if not updated:
+            db.session.execute(insert(table).values(row))
+
+
+def record_rental_event(rental, event, refunded=False):
+    """在调用方的事务中把一次租赁事件累加到每日汇总。
+
+    event 为 created（下单）、cancelled（取消，refunded 表示已全额退款）
+    或 returned（还车）。
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    _add_event(deltas, rental, rental.vehicle.type, rental.vehicle.brand, event, refunded)
+    _apply_deltas(deltas)
+
+
+def backfill_daily_stats(start=None, end=None, batch_size=10000):
+    """根据租赁记录重新计算 [start, end) 日期范围内的汇总行，返回写入的行数。
+
+    start / end 为空时不限制。与增量维护使用同一套归属规则，可用于初始化
+    历史数据或修复汇总表。重算期间发生的下单、还车可能被覆盖，建议在低峰期执行。
+    """
+    start_time = datetime.combine(start, time.min) if start is not None else None
+    end_time = datetime.combine(end, time.min) if end is not None else None
+    # 退款只发生在取消预约时，数量很少，一次读出而不是逐行关联流水表
+    refunded = set(db.session.execute(
+        select(MoneyLedger.rental_id).where(MoneyLedger.reason == 'refund')
+    ).scalars())
+    query = (
+        select(Rental.rental_id, Rental.start_time, Rental.duration_days,
+               Rental.expected_return_time, Rental.actual_return_time, Rental.total_fee,
+               Rental.status, Vehicle.type, Vehicle.brand)
+        .join(Vehicle, Vehicle.vehicle_id == Rental.vehicle_id)
+    )
+    if end_time is not None:
+        query = query.where(Rental.start_time < end_time)
+    if start_time is not None:
+        # 开始日期在范围之前、但占用时段延续到范围内的已归还租赁也要计入
+        query = query.where(or_(Rental.start_time >= start_time,
+                                and_(Rental.status == 'completed',
+                                     Rental.actual_return_time > start_time)))
+
+    deltas = defaultdict(lambda: defaultdict(int))
+    for row in db.session.execute(query.execution_options(yield_per=batch_size)):
+        _add_event(deltas, row, row.type, row.brand, 'created')
+        if row.status == 'cancelled':
+            _add_event(deltas, row, row.type, row.brand, 'cancelled',
+                       row.rental_id in refunded)
+        elif row.status == 'completed' and row.actual_return_time is not None:
+            _add_event(deltas, row, row.type, row.brand, 'returned')
+    rows = [row for row in _stat_rows(deltas)
+            if (start is None or row['stat_date'] >= start)
+            and (end is None or row['stat_date'] < end)]
+
+    table = RentalDailyStats.__table__
+    statement = delete(table)
+    if start is not None:
+        statement = statement.where(table.c.stat_date >= start)
+    if end is not None:
+        statement = statement.where(table.c.stat_date < end)
+    db.session.execute(statement)
+    for offset in range(0, len(rows), batch_size):
+        db.session.execute(insert(table), rows[offset:offset + batch_size])
+    db.session.commit()
+    return len(rows)
+
+
+def parse_report_args(args):
+    """解析 start / end（YYYY-MM-DD，均包含）和 group_by，默认最近 30 天按天汇总。"""
+    try:
+        end = date.fromisoformat(args['end']) if args.get('end') else date.today()
+        start = (date.fromisoformat(args['start']) if args.get('start')
+                 else end - timedelta(days=DEFAULT_REPORT_DAYS - 1))
+    except ValueError:
+        raise ReportError('Invalid date format, expected YYYY-MM-DD')
+    if start > end:
+        raise ReportError('Start date must not be after end date')
+    if (end - start).days + 1 > MAX_REPORT_DAYS:
+        raise ReportError(f'Date range cannot exceed {MAX_REPORT_DAYS} days')
+    group_by = args.get('group_by', 'day')
+    if group_by not in GROUP_BY_COLUMNS:
+        raise ReportError(f'Invalid group_by: {group_by}')
+    return start, end, group_by
+
+
+def _fleet_sizes(group_by):
+    # 利用率的分母使用当前车队规模
+    if group_by == 'day':
+        total = db.session.query(func.count(Vehicle.vehicle_id)).filter(
+            Vehicle.is_deleted == False).scalar()
+        return defaultdict(lambda: total)
+    column = Vehicle.type if group_by == 'type' else Vehicle.brand
+    return defaultdict(int, db.session.query(column, func.count(Vehicle.vehicle_id))
+                       .filter(Vehicle.is_deleted == False)
+                       .group_by(column))
+
+
+def _metrics(key, totals, fleet_size, days):
+    rentals = totals['rentals']
+    billed = rentals - totals['refunded']
+    capacity_hours = fleet_size * days * 24
+    return {
+        'key': key.isoformat() if isinstance(key, date) else key,
+        'rentals': rentals,
+        'cancelled': totals['cancelled'],
+        'completed': totals['completed'],
+        'returned_late': totals['returned_late'],
+        'revenue': float(totals['revenue']),
+        'avg_duration_days': round(totals['booked_days'] / billed, 2) if billed else None,
+        'occupied_hours': float(totals['occupied_hours']),
+        'fleet_size': fleet_size,
+        'utilization': (round(float(totals['occupied_hours']) / capacity_hours * 100, 2)
+                        if capacity_hours else None),
+        'overdue_rate': (round(totals['returned_late'] / totals['completed'] * 100, 2)
+                         if totals['completed'] else None),
+    }
+
+
+def daily_stats_report(start, end, group_by):
+    """读取 [start, end] 内的汇总行并按天、车型或品牌合并，返回 (各组指标, 合计)。
+
+    利用率和逾期率为百分比；按天汇总时没有数据的日期补零。
+    """
+    key_column = GROUP_BY_COLUMNS[group_by]
+    rows = db.session.execute(
+        select(key_column.label('key'),
+               *[func.sum(RentalDailyStats.__table__.c[field]).label(field)
+                 for field in STAT_FIELDS])
+        .where(RentalDailyStats.stat_date >= start, RentalDailyStats.stat_date <= end)
+        .group_by(key_column)
+        .order_by(key_column)
+    ).all()
+    empty = dict.fromkeys(STAT_FIELDS, 0)
+    groups = {row.key: {field: getattr(row, field) or 0 for field in STAT_FIELDS}
+              for row in rows}
+    days = (end - start).days + 1
+    if group_by == 'day':
+        groups = {day: groups.get(day, empty)
+                  for day in (start + timedelta(days=offset) for offset in range(days))}
+
+    fleet_sizes = _fleet_sizes(group_by)
+    group_days = 1 if group_by == 'day' else days
+    data = [_metrics(key, totals, fleet_sizes[key], group_days)
+            for key, totals in groups.items()]
+
+    totals = {field: sum((group[field] for group in groups.values()), 0) for field in STAT_FIELDS}
+    fleet_size = fleet_sizes[None] if group_by == 'day' else sum(fleet_sizes.values())
+    summary = _metrics(None, totals, fleet_size, days)
+    del summary['key']
+    return data, summary
+
+
+def currently_overdue():
+    return db.session.query(func.count(Rental.rental_id)).filter(
+        Rental.status == 'overdue').scalar()
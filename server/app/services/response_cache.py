@@ -0,0 +1,197 @@
+import hashlib
+import json
+import logging
+import threading
+from functools import wraps
+from flask import current_app, jsonify, request
+from app.services.lru import LRUCache
+from app.services.replicas import replica_router
+
+logger = logging.getLogger(__name__)
+
+
+class LRUBackend:
+    """进程内 LRU 后端，只适用于单进程部署；多进程部署时请使用 Redis 后端。"""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self._entries = LRUCache(maxsize=maxsize, ttl=ttl)
+        # 版本号不能被 LRU 淘汰，否则版本回退后旧条目会重新可见
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def set(self, key, entry):
+        self._entries.set(key, entry)
+
+    def generations(self, scopes):
+        with self._lock:
+            return [self._generations.get(scope, 0) for scope in scopes]
+
+    def bump(self, scopes):
+        with self._lock:
+            for scope in scopes:
+                self._generations[scope] = self._generations.get(scope, 0) + 1
+
+    def clear(self):
+        self._entries.clear()
+        self.bump(list(self._generations))
+
+    def stats(self):
+        return self._entries.stats()
+
+
+class RedisBackend:
+    """Redis（或兼容协议的服务）后端，多个进程共享缓存条目和版本号。"""
+
+    def __init__(self, url, ttl=300, prefix='response_cache:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('RESPONSE_CACHE_BACKEND=redis requires the redis package')
+        self._client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self._client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, entry):
+        self._client.set(self.prefix + key, json.dumps(entry), ex=self.ttl)
+
+    def generations(self, scopes):
+        values = self._client.mget([self.prefix + 'gen:' + scope for scope in scopes])
+        return [int(value) if value is not None else 0 for value in values]
+
+    def bump(self, scopes):
+        pipe = self._client.pipeline()
+        for scope in scopes:
+            pipe.incr(self.prefix + 'gen:' + scope)
+        pipe.execute()
+
+    def clear(self):
+        for key in self._client.scan_iter(self.prefix + '*'):
+            self._client.delete(key)
+
+    def stats(self):
+        return {'backend': 'redis'}
+
+
+class ResponseCache:
+    """按路由和查询参数缓存 GET 响应，支持 ETag / If-None-Match。
+
+    每个缓存的响应声明自己依赖的失效范围（scope），缓存键中带有这些范围
+    当前的版本号。写操作提交后调用 invalidate 递增版本号，旧条目不再被命中。
+    读取前先取版本号，因此与写操作并发的读请求最多把旧数据写到旧版本的键下。
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.hits = 0
+        self.misses = 0
+        # 多个请求线程同时更新命中计数
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['response_cache'] = self
+        self.hits = 0
+        self.misses = 0
+        backend = app.config.get('RESPONSE_CACHE_BACKEND', 'lru')
+        ttl = app.config.get('RESPONSE_CACHE_TTL_SECONDS', 300)
+        if backend == 'redis':
+            self.backend = RedisBackend(app.config['RESPONSE_CACHE_REDIS_URL'], ttl=ttl)
+        elif backend == 'lru':
+            # 进程内缓存的失效只作用于当前进程，其他进程会返回旧数据直到条目过期
+            if app.config.get('WEB_WORKERS', 1) > 1:
+                logger.warning('RESPONSE_CACHE_BACKEND=lru 在 %d 个工作进程中各自缓存，'
+                               '写操作不会使其他进程的缓存失效，建议改用 redis 或 none',
+                               app.config['WEB_WORKERS'])
+            self.backend = LRUBackend(
+                maxsize=app.config.get('RESPONSE_CACHE_SIZE', 1024), ttl=ttl)
+        else:
+            self.backend = None
+        app.add_url_rule('/api/_debug/response-cache', 'response_cache_metrics',
+                         lambda: jsonify(self.metrics()))
+
+    def cached(self, scopes):
+        """装饰视图函数；scopes(**view_args) 返回该响应依赖的失效范围。"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                if self.backend is None:
+                    return view(**kwargs)
+                view_scopes = scopes(**kwargs)
+                generations = self.backend.generations(view_scopes)
+                key = self._key(view_scopes, generations)
+                entry = self.backend.get(key)
+                if entry is None:
+                    with self._lock:
+                        self.misses += 1
+                    # 缓存的响应会被其他客户端复用，填充时读主库，避免缓存副本上的旧数据
+                    with replica_router.primary():
+                        response = view(**kwargs)
+                    if isinstance(response, tuple) or response.status_code != 200 \
+                            or response.is_streamed:
+                        return response
+                    body = response.get_data()
+                    entry = {
+                        'body': body.decode('utf-8'),
+                        'etag': hashlib.sha1(body).hexdigest(),
+                        'mimetype': response.mimetype,
+                    }
+                    self.backend.set(key, entry)
+                    cache_status = 'MISS'
+                else:
+                    with self._lock:
+                        self.hits += 1
+                    cache_status = 'HIT'
+                return self._respond(entry, cache_status)
+            return wrapper
+        return decorator
+
+    def invalidate(self, *scopes):
+        if self.backend is not None and scopes:
+            self.backend.bump(scopes)
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def metrics(self):
+        with self._lock:
+            result = {'hits': self.hits, 'misses': self.misses}
+        if self.backend is not None:
+            result.update(self.backend.stats())
+        return result
+
+    @staticmethod
+    def _key(scopes, generations):
+        args = '&'.join(f'{name}={value}' for name, value in sorted(request.args.items(multi=True)))
+        versions = ','.join(f'{scope}@{generation}' for scope, generation in zip(scopes, generations))
+        return f'{request.path}?{args}|{versions}'
+
+    @staticmethod
+    def _respond(entry, cache_status):
+        if request.if_none_match.contains(entry['etag']):
+            response = current_app.response_class(status=304)
+        else:
+            response = current_app.response_class(entry['body'], mimetype=entry['mimetype'])
+        response.set_etag(entry['etag'])
+        response.headers['X-Cache'] = cache_status
+        return response
+
+
+response_cache = ResponseCache()
+
+
+def invalidate_vehicle_list():
+    # 车辆列表中包含租赁状态，任何租赁状态变化都要使列表失效
+    response_cache.invalidate('vehicles')
+
+
+def invalidate_vehicle(vehicle_id):
+    response_cache.invalidate('vehicles', f'vehicle:{vehicle_id}')
@@ -0,0 +1,185 @@
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import update
+
+logger = logging.getLogger(__name__)
+
+
+class RentalStatusScheduler:
+    """后台租赁状态调度器：按到期时间把 ongoing 的租赁批量置为 overdue。"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.tick_seconds = 60
+        # 到期时间优先队列，元素为 (expected_return_time, rental_id)
+        self._due_queue = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+        self._metrics = {
+            'runs': 0,
+            'last_run_at': None,
+            'last_run_duration_ms': None,
+            'last_updated_count': 0,
+            'last_lag_ms': None,
+            'max_lag_ms': 0.0,
+            'last_error': None,
+            # 车辆仍被占用而暂缓开始的到期预约
+            'held_reservations': [],
+        }
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.tick_seconds = app.config.get('RENTAL_SCHEDULER_TICK_SECONDS', 60)
+        app.extensions['rental_scheduler'] = self
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped = False
+        self._thread = threading.Thread(
+            target=self._run, name='rental-status-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def schedule(self, rental_id, due_at):
+        # 新建租赁后调用（预约传入开始时间，其余传入预计归还时间），
+        # 若比当前队首更早到期则立即唤醒调度线程
+        with self._cond:
+            heapq.heappush(self._due_queue, (due_at, rental_id))
+            if self._due_queue[0][1] == rental_id:
+                self._cond.notify()
+
+    def metrics(self):
+        with self._cond:
+            result = dict(self._metrics)
+            result['tick_seconds'] = self.tick_seconds
+            result['queue_size'] = len(self._due_queue)
+            result['next_due_at'] = (
+                self._due_queue[0][0].isoformat() if self._due_queue else None)
+        if result['last_run_at']:
+            result['last_run_at'] = result['last_run_at'].isoformat()
+        return result
+
+    def sweep(self):
+        # 先把到期的预约转为进行中，再用单条 UPDATE 完成 ongoing -> overdue 的批量更新
+        from app import db
+        from app.models import Rental
+        from app.services.availability import availability_index
+        from app.services.response_cache import invalidate_vehicle_list
+        from app.services.vehicle_status import mark_overdue_vehicles, start_reservations
+
+        now = datetime.now()
+        started = time.perf_counter()
+        activated = []
+        held = []
+        with self.app.app_context():
+            try:
+                activated, held = start_reservations(now)
+                vehicles_updated = mark_overdue_vehicles(now)
+                overdue_ids = db.session.execute(
+                    update(Rental)
+                    .where(Rental.status == 'ongoing',
+                           Rental.expected_return_time < now)
+                    .values(status='overdue', updated_at=now)
+                    .returning(Rental.rental_id)
+                    .execution_options(synchronize_session=False)
+                ).scalars().all()
+                db.session.commit()
+                if activated or vehicles_updated:
+                    invalidate_vehicle_list()
+                # 晚开始的预约租期已顺延
+                availability_index.apply_rentals(
+                    (rental_id, vehicle_id, 'ongoing', start_time, expected_return_time)
+                    for rental_id, vehicle_id, start_time, expected_return_time in activated)
+                availability_index.mark_overdue(overdue_ids)
+                updated = len(overdue_ids)
+                error = None
+            except Exception as e:
+                db.session.rollback()
+                activated = []
+                held = []
+                updated = 0
+                error = str(e)
+                logger.exception('更新租赁状态失败')
+
+        with self._cond:
+            # 弹出所有已到期的条目，最早的到期时间用于计算调度延迟
+            lag_ms = None
+            while self._due_queue and self._due_queue[0][0] < now:
+                due_at, _ = heapq.heappop(self._due_queue)
+                if lag_ms is None:
+                    lag_ms = (now - due_at).total_seconds() * 1000
+            # 刚开始的预约改为在预计归还时间到期；暂缓的预约不再入队，由之后的定时扫描重试
+            for rental_id, _, _, expected_return_time in activated:
+                heapq.heappush(self._due_queue, (expected_return_time, rental_id))
+            self._metrics['runs'] += 1
+            self._metrics['last_run_at'] = now
+            self._metrics['last_run_duration_ms'] = (
+                time.perf_counter() - started) * 1000
+            self._metrics['last_updated_count'] = updated
+            self._metrics['last_error'] = error
+            self._metrics['held_reservations'] = [
+                {'rental_id': rental_id, 'vehicle_id': vehicle_id} for rental_id, vehicle_id in held]
+            if lag_ms is not None:
+                self._metrics['last_lag_ms'] = lag_ms
+                self._metrics['max_lag_ms'] = max(
+                    self._metrics['max_lag_ms'], lag_ms)
+        return updated
+
+    def _load_due_queue(self):
+        # 启动时把仍在进行中的租赁的到期时间和预约的开始时间载入队列
+        from app import db
+        from app.models import Rental
+
+        with self.app.app_context():
+            try:
+                rows = db.session.execute(
+                    db.select(Rental.expected_return_time, Rental.rental_id)
+                    .where(Rental.status == 'ongoing')
+                    .union_all(
+                        db.select(Rental.start_time, Rental.rental_id)
+                        .where(Rental.status == 'reserved'))
+                ).all()
+            except Exception:
+                db.session.rollback()
+                logger.exception('载入租赁到期时间失败')
+                rows = []
+        with self._cond:
+            self._due_queue = [tuple(row) for row in rows]
+            heapq.heapify(self._due_queue)
+
+    def _run(self):
+        self._load_due_queue()
+        next_tick = time.monotonic()
+        while True:
+            with self._cond:
+                # 等待到下一个到期时间或下一个 tick，以先到者为准；
+                # 被 schedule() 唤醒时只重新计算等待时间
+                while not self._stopped:
+                    timeout = next_tick - time.monotonic()
+                    if self._due_queue:
+                        until_due = (self._due_queue[0][0] -
+                                     datetime.now()).total_seconds()
+                        timeout = min(timeout, until_due)
+                    if timeout <= 0:
+                        break
+                    self._cond.wait(timeout)
+                if self._stopped:
+                    return
+            self.sweep()
+            next_tick = time.monotonic() + self.tick_seconds
+
+rental_scheduler = RentalStatusScheduler()
@@ -0,0 +1,141 @@
+from sqlalchemy import DDL, event, func, or_, text
+from sqlalchemy.sql import column, table
+from app import db
+from app.models import Customer
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+# trigram 分词至少需要 3 个字符才能走索引
+MIN_TRIGRAM_LENGTH = 3
+
+# 以下建表语句同时用于 db.create_all() 和迁移 b82d5e0f6a93
+# SQLite: FTS5 trigram 外部内容表，由触发器与 customers 保持同步
+SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS customers_fts USING fts5("
+    "name, id_card, content='customers', content_rowid='customer_id', "
+    "tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS customers_fts_ai AFTER INSERT ON customers BEGIN "
+    "INSERT INTO customers_fts(rowid, name, id_card) "
+    "VALUES (new.customer_id, new.name, new.id_card); END",
+    "CREATE TRIGGER IF NOT EXISTS customers_fts_ad AFTER DELETE ON customers BEGIN "
+    "INSERT INTO customers_fts(customers_fts, rowid, name, id_card) "
+    "VALUES ('delete', old.customer_id, old.name, old.id_card); END",
+    "CREATE TRIGGER IF NOT EXISTS customers_fts_au AFTER UPDATE OF name, id_card ON customers BEGIN "
+    "INSERT INTO customers_fts(customers_fts, rowid, name, id_card) "
+    "VALUES ('delete', old.customer_id, old.name, old.id_card); "
+    "INSERT INTO customers_fts(rowid, name, id_card) "
+    "VALUES (new.customer_id, new.name, new.id_card); END",
+]
+
+# PostgreSQL: pg_trgm GIN 索引，支持 ILIKE '%text%' 和相似度排序
+POSTGRESQL_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_customers_name_trgm "
+    "ON customers USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_customers_id_card_trgm "
+    "ON customers USING gin (id_card gin_trgm_ops)",
+]
+
+SEARCH_OBJECT_NAMES = ('customers_fts', 'ix_customers_name_trgm',
+                       'ix_customers_id_card_trgm')
+
+customers_fts = table('customers_fts', column('rowid'), column('rank'))
+
+# db.create_all() 建表时一并建立搜索索引
+for statement in SQLITE_SEARCH_DDL:
+    event.listen(Customer.__table__, 'after_create',
+                 DDL(statement).execute_if(dialect='sqlite'))
+for statement in POSTGRESQL_SEARCH_DDL:
+    event.listen(Customer.__table__, 'after_create',
+                 DDL(statement).execute_if(dialect='postgresql'))
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # 搜索索引不在模型中声明，避免 autogenerate 把它们当成多余对象删除
+    if name and name.startswith(SEARCH_OBJECT_NAMES):
+        return False
+    return True
+
+
+class CustomerSearch:
+    """客户搜索：按数据库选择 FTS5 / pg_trgm / LIKE，对外接口一致。"""
+
+    def __init__(self):
+        self._fts_available = set()
+
+    def search(self, search_text, limit=DEFAULT_SEARCH_LIMIT):
+        limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+        # 手机号、身份证号前缀匹配排在最前
+        results = self._prefix_search(search_text, limit)
+        if len(results) < limit:
+            seen = {customer.customer_id for customer in results}
+            for customer in self._text_search(search_text, limit):
+                if customer.customer_id not in seen:
+                    results.append(customer)
+                    seen.add(customer.customer_id)
+        return results[:limit]
+
+    def backend(self):
+        dialect = db.engine.dialect.name
+        if dialect == 'postgresql':
+            return 'pg_trgm'
+        if dialect == 'sqlite' and self._has_fts_table():
+            return 'fts5'
+        return 'like'
+
+    def _has_fts_table(self):
+        # 只缓存已建表的结果，迁移在运行中建表后无需重启即可使用
+        key = str(db.engine.url)
+        if key in self._fts_available:
+            return True
+        found = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'customers_fts'")
+        ).first() is not None
+        if found:
+            self._fts_available.add(key)
+        return found
+
+    def _prefix_search(self, search_text, limit):
+        if not search_text.isalnum():
+            return []
+        # 用范围条件代替 LIKE 'x%'，两种数据库都能走 B-tree 索引
+        upper = search_text + '\uffff'
+        return (
+            Customer.query
+            .filter(or_(
+                (Customer.phone >= search_text) & (Customer.phone < upper),
+                (Customer.id_card >= search_text) & (Customer.id_card < upper),
+            ))
+            .filter(Customer.is_deleted == False)
+            .limit(limit)
+            .all()
+        )
+
+    def _text_search(self, search_text, limit):
+        backend = self.backend()
+        if backend == 'fts5' and len(search_text) >= MIN_TRIGRAM_LENGTH:
+            match = '"' + search_text.replace('"', '""') + '"'
+            return (
+                Customer.query
+                .join(customers_fts, customers_fts.c.rowid == Customer.customer_id)
+                .filter(text('customers_fts MATCH :match').bindparams(match=match))
+                .filter(Customer.is_deleted == False)
+                .order_by(customers_fts.c.rank)
+                .limit(limit)
+                .all()
+            )
+
+        pattern = f'%{search_text}%'
+        query = (
+            Customer.query
+            .filter(Customer.name.ilike(pattern) | Customer.id_card.ilike(pattern))
+            .filter(Customer.is_deleted == False)
+        )
+        if backend == 'pg_trgm':
+            query = query.order_by(func.greatest(
+                func.similarity(Customer.name, search_text),
+                func.similarity(Customer.id_card, search_text)).desc())
+        return query.limit(limit).all()
+
+
+customer_search = CustomerSearch()
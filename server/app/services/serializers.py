@@ -0,0 +1,137 @@
+from datetime import datetime
+from sqlalchemy import select
+from app import db
+from app.models import Customer, Rental, Vehicle
+
+def parse_local_datetime(value):
+    """解析 ISO 格式的时间；带时区的时间转换为服务器本地时间并去掉时区，与数据库中的时间一致。"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+# 直接选取需要的列，由行元组构造响应，不经过 ORM 对象和 identity map
+RENTAL_COLUMNS = (
+    Rental.rental_id,
+    Rental.vehicle_id,
+    Rental.customer_id,
+    Rental.start_time,
+    Rental.duration_days,
+    Rental.expected_return_time,
+    Rental.actual_return_time,
+    Rental.total_fee,
+    Rental.status,
+)
+
+CUSTOMER_RENTAL_COLUMNS = RENTAL_COLUMNS + (
+    Vehicle.plate_number,
+    Vehicle.type,
+    Vehicle.brand,
+    Vehicle.model,
+    Vehicle.color,
+    Vehicle.price_per_day,
+)
+
+# 租赁状态列表共用的列
+RENTAL_LIST_COLUMNS = (
+    Rental.rental_id,
+    Rental.status,
+    Rental.start_time,
+    Rental.total_fee,
+    Rental.expected_return_time,
+    Rental.actual_return_time,
+    Customer.name,
+    Customer.phone,
+    Vehicle.plate_number,
+)
+
+
+def _rental_list(query, statuses):
+    return (
+        query
+        .join(Customer, Rental.customer_id == Customer.customer_id, isouter=True)
+        .join(Vehicle, Rental.vehicle_id == Vehicle.vehicle_id, isouter=True)
+        .filter(Rental.status.in_(statuses))
+    )
+
+
+def rental_list_query(statuses):
+    # 一次查询取出任意状态组合的租赁记录
+    return _rental_list(db.session.query(*RENTAL_LIST_COLUMNS), statuses)
+
+
+def rental_list_select(statuses):
+    # 与 rental_list_query 相同的查询，供异步会话执行
+    return _rental_list(select(*RENTAL_LIST_COLUMNS), statuses)
+
+
+def format_rental_list_row(row):
+    # 预约/进行中/逾期的租赁返回预计归还时间，已结束的返回实际归还时间
+    result = {
+        'rental_id': row.rental_id,
+        'status': row.status,
+        'plate_number': row.plate_number,
+        'name': row.name,
+        'phone': row.phone,
+        'total_fee': row.total_fee,
+    }
+    if row.status in ('reserved', 'ongoing', 'overdue'):
+        result['expected_return_time'] = row.expected_return_time.strftime('%Y-%m-%d %H:%M:%S') if row.expected_return_time else None
+    else:
+        result['actual_return_time'] = row.actual_return_time.strftime('%Y-%m-%d %H:%M:%S') if row.actual_return_time else None
+    return result
+
+
+def customer_rentals_query(user_id):
+    # 按 user_id 联表查询客户的租赁记录及车辆信息，一次往返
+    return (
+        db.session.query(*CUSTOMER_RENTAL_COLUMNS)
+        .join(Vehicle, Rental.vehicle_id == Vehicle.vehicle_id)
+        .join(Customer, Rental.customer_id == Customer.customer_id)
+        .filter(Customer.user_id == user_id)
+        .order_by(Rental.start_time.desc())
+    )
+
+
+def rental_history_query(customer_id):
+    return (
+        db.session.query(*RENTAL_COLUMNS)
+        .join(Customer, Rental.customer_id == Customer.customer_id)
+        .filter(Customer.customer_id == customer_id, Customer.is_deleted == False)
+    )
+
+
+def format_rental(row):
+    # 与 Rental.to_dict() 的输出一致
+    return {
+        'rental_id': row.rental_id,
+        'vehicle_id': row.vehicle_id,
+        'customer_id': row.customer_id,
+        'start_time': row.start_time.isoformat(),
+        'duration_days': row.duration_days,
+        'expected_return_time': row.expected_return_time.isoformat(),
+        'actual_return_time': row.actual_return_time.isoformat() if row.actual_return_time else None,
+        'total_fee': float(row.total_fee),
+        'status': row.status
+    }
+
+
+def format_customer_rental(row):
+    return {
+        'rental_id': row.rental_id,
+        'vehicle_id': row.vehicle_id,
+        'customer_id': row.customer_id,
+        'start_time': row.start_time.strftime('%Y-%m-%d %H:%M'),
+        'duration_days': row.duration_days,
+        'expected_return_time': row.expected_return_time.strftime('%Y-%m-%d %H:%M'),
+        'actual_return_time': row.actual_return_time.strftime('%Y-%m-%d %H:%M') if row.actual_return_time else None,
+        'total_fee': float(row.total_fee),
+        'status': row.status,
+        'plate_number': row.plate_number,
+        'type': row.type,
+        'brand': row.brand,
+        'model': row.model,
+        'color': row.color,
+        'price_per_day': float(row.price_per_day)
+    }
@@ -0,0 +1,33 @@
+from flask import Response, current_app, stream_with_context
+
+# format=ndjson 逐行输出 JSON 对象，format=stream 分块输出 JSON 数组
+STREAM_FORMATS = ('ndjson', 'stream')
+YIELD_PER = 1000
+
+
+def wants_stream(args):
+    return args.get('format') in STREAM_FORMATS
+
+
+def stream_response(query, serialize, fmt):
+    """用服务端游标分批读取查询结果，逐行序列化后以流的形式返回。"""
+    dumps = current_app.json.dumps
+    rows = query.yield_per(YIELD_PER)
+
+    def generate_ndjson():
+        for row in rows:
+            yield dumps(serialize(row)) + '\n'
+
+    def generate_array():
+        yield '['
+        separator = ''
+        for row in rows:
+            yield separator + dumps(serialize(row))
+            separator = ','
+        yield ']'
+
+    if fmt == 'ndjson':
+        return Response(stream_with_context(generate_ndjson()),
+                        mimetype='application/x-ndjson')
+    return Response(stream_with_context(generate_array()),
+                    mimetype='application/json')
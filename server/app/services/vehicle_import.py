@@ -0,0 +1,181 @@
+import csv
+import io
+import json
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Vehicle
+
+PLATE_NUMBER_PATTERN = re.compile(r'^[\u4e00-\u9fa5][A-Z][A-Z0-9]{5}$')
+VEHICLE_FIELDS = ['type', 'brand', 'model', 'color', 'price_per_day', 'plate_number']
+IMPORT_FORMATS = ('json', 'ndjson', 'csv')
+DEFAULT_BATCH_SIZE = 1000
+# 返回的逐行错误最多条数，超出部分只计数
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def iter_records(stream, fmt):
+    """从文本流中逐条读取车辆记录，NDJSON 和 CSV 不需要把整个文件读入内存。"""
+    if fmt == 'json':
+        try:
+            data = json.load(stream)
+        except ValueError:
+            raise ImportFormatError('Invalid JSON')
+        if not isinstance(data, list):
+            raise ImportFormatError('JSON body must be an array of vehicles')
+        yield from data
+    elif fmt == 'ndjson':
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # 无法解析的行作为该行的错误返回
+                yield line
+    elif fmt == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        raise ImportFormatError(f'Unsupported format: {fmt}')
+
+
+def _validate(record):
+    # 返回 (清洗后的行, 错误信息)
+    if isinstance(record, str):
+        return None, 'Invalid JSON'
+    if not isinstance(record, dict):
+        return None, 'Invalid record'
+    missing = [field for field in VEHICLE_FIELDS if record.get(field) in (None, '')]
+    if missing:
+        return None, f'Missing required fields: {", ".join(missing)}'
+    try:
+        price = Decimal(str(record['price_per_day']))
+    except InvalidOperation:
+        return None, 'Invalid price format'
+    if not price.is_finite() or price <= 0:
+        return None, 'Price must be positive'
+    plate_number = str(record['plate_number']).strip()
+    if not PLATE_NUMBER_PATTERN.match(plate_number):
+        return None, 'Invalid plate number format'
+    return {
+        'type': str(record['type']),
+        'brand': str(record['brand']),
+        'model': str(record['model']),
+        'color': str(record['color']),
+        'price_per_day': price,
+        'plate_number': plate_number,
+    }, None
+
+
+def _existing_plates(plate_numbers):
+    # 车牌号唯一约束包含已删除的车辆，因此不按 is_deleted 过滤
+    return set(db.session.execute(
+        db.select(Vehicle.plate_number).where(Vehicle.plate_number.in_(plate_numbers))
+    ).scalars())
+
+
+def _copy_rows(rows):
+    # PostgreSQL 使用 COPY 批量写入，需要显式给出所有列的值
+    now = datetime.now()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row['type'], row['brand'], row['model'], row['color'],
+                         row['price_per_day'], row['plate_number'], 'f', 1, now, now])
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            'COPY vehicles (type, brand, model, color, price_per_day, plate_number, '
+            'is_deleted, version, created_at, updated_at) FROM STDIN WITH (FORMAT csv)',
+            buffer)
+    finally:
+        cursor.close()
+
+
+def _insert_rows(rows):
+    bind = db.session.connection()
+    if bind.dialect.name == 'postgresql' and bind.dialect.driver == 'psycopg2':
+        _copy_rows(rows)
+    else:
+        # Core insert + 参数列表，由驱动以 executemany 执行
+        db.session.execute(insert(Vehicle), rows)
+
+
+def _insert_batch(batch, result):
+    try:
+        _insert_rows([row for _, row in batch])
+        db.session.commit()
+        result['inserted'] += len(batch)
+    except IntegrityError:
+        # 预检查之后有并发写入了相同车牌，逐行插入找出冲突的行
+        db.session.rollback()
+        for line, row in batch:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(insert(Vehicle), [row])
+                result['inserted'] += 1
+            except IntegrityError:
+                _record_error(result, line, row['plate_number'], 'Plate number already exists')
+        db.session.commit()
+
+
+def _record_error(result, line, plate_number, message):
+    result['error_count'] += 1
+    if len(result['errors']) < MAX_REPORTED_ERRORS:
+        result['errors'].append({'row': line, 'plate_number': plate_number, 'error': message})
+
+
+def import_vehicles(records, batch_size=DEFAULT_BATCH_SIZE):
+    """分批校验并写入车辆，单行错误只记录不中断整批。
+
+    每批只发一条查询检查车牌是否已存在，通过校验的行一次性批量插入。
+    返回 {'total', 'inserted', 'error_count', 'errors'}，行号从 1 开始。
+    """
+    result = {'total': 0, 'inserted': 0, 'error_count': 0, 'errors': []}
+    seen = set()
+    pending = []
+
+    def flush():
+        existing = _existing_plates([row['plate_number'] for _, row in pending])
+        batch = []
+        for line, row in pending:
+            if row['plate_number'] in existing:
+                _record_error(result, line, row['plate_number'], 'Plate number already exists')
+            else:
+                batch.append((line, row))
+        if batch:
+            _insert_batch(batch, result)
+        pending.clear()
+
+    for line, record in enumerate(records, start=1):
+        result['total'] += 1
+        row, error = _validate(record)
+        if error is None and row['plate_number'] in seen:
+            error = 'Duplicate plate number in import'
+        if error is not None:
+            plate_number = record.get('plate_number') if isinstance(record, dict) else None
+            _record_error(result, line, plate_number, error)
+            continue
+        seen.add(row['plate_number'])
+        pending.append((line, row))
+        if len(pending) >= batch_size:
+            flush()
+    if pending:
+        flush()
+
+    if result['inserted']:
+        from app.services.availability import availability_index
+        from app.services.response_cache import invalidate_vehicle_list
+
+        invalidate_vehicle_list()
+        availability_index.mark_stale()
+    return result
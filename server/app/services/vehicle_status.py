@@ -0,0 +1,156 @@
+import logging
+from datetime import timedelta
+from sqlalchemy import and_, case, exists, func, or_, update
+from sqlalchemy.orm import aliased
+from app import db
+from app.models import MoneyLedger, Rental, Vehicle
+from app.services.response_cache import invalidate_vehicle_list
+
+logger = logging.getLogger(__name__)
+
+# 车辆正被占用的租赁状态，这期间到期的预约不能开始
+VEHICLE_BUSY_STATUSES = ('ongoing', 'overdue')
+# 预约晚于开始时间超过该值才开始（车辆被占用而暂缓）时，租期整体顺延，客户仍能租满预订的天数
+LATE_START_GRACE = timedelta(minutes=5)
+
+
+def mark_rental_finished(rental, status):
+    # 只有车辆当前指向的正是这笔租赁时才更新
+    db.session.execute(
+        update(Vehicle)
+        .where(Vehicle.vehicle_id == rental.vehicle_id,
+               Vehicle.current_rental_id == rental.rental_id)
+        .values(current_status=status, version=Vehicle.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def start_reservations(now):
+    """把已到开始时间的预约转为进行中，并让车辆指向该租赁。
+
+    车辆上仍有进行中或逾期的租赁时预约保持 reserved，等该租赁结束后的下一次扫描再开始；
+    同一辆车有多笔到期预约时每次只开始最早的一笔；晚开始超过 LATE_START_GRACE 的预约
+    开始时间改为 now，预计归还时间顺延同样的时长。
+    返回 (started, held)：started 为 (rental_id, vehicle_id, start_time, expected_return_time)
+    列表，held 为被阻塞的 (rental_id, vehicle_id) 列表。
+    """
+    other = aliased(Rental)
+    vehicle_busy = exists().where(other.vehicle_id == Rental.vehicle_id,
+                                  other.status.in_(VEHICLE_BUSY_STATUSES))
+    earlier_due = exists().where(
+        other.vehicle_id == Rental.vehicle_id, other.status == 'reserved',
+        other.start_time <= now,
+        or_(other.start_time < Rental.start_time,
+            and_(other.start_time == Rental.start_time, other.rental_id < Rental.rental_id)))
+    candidates = db.session.execute(
+        update(Rental)
+        .where(Rental.status == 'reserved', Rental.start_time <= now,
+               ~vehicle_busy, ~earlier_due)
+        .values(status='ongoing', updated_at=now)
+        .returning(Rental.rental_id, Rental.vehicle_id, Rental.start_time,
+                   Rental.expected_return_time)
+        .execution_options(synchronize_session=False)
+    ).all()
+    started = []
+    for rental_id, vehicle_id, start_time, expected_return_time in candidates:
+        # 车辆仍指向未结束的租赁时不覆盖，预约退回 reserved
+        updated = db.session.execute(
+            update(Vehicle)
+            .where(Vehicle.vehicle_id == vehicle_id,
+                   or_(Vehicle.current_status.is_(None),
+                       Vehicle.current_status.notin_(VEHICLE_BUSY_STATUSES)))
+            .values(current_rental_id=rental_id, current_status='ongoing',
+                    version=Vehicle.version + 1)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if updated:
+            delay = now - start_time
+            if delay > LATE_START_GRACE:
+                start_time, expected_return_time = now, expected_return_time + delay
+                db.session.execute(
+                    update(Rental)
+                    .where(Rental.rental_id == rental_id)
+                    .values(start_time=start_time, expected_return_time=expected_return_time)
+                    .execution_options(synchronize_session=False)
+                )
+            started.append((rental_id, vehicle_id, start_time, expected_return_time))
+        else:
+            db.session.execute(
+                update(Rental)
+                .where(Rental.rental_id == rental_id)
+                .values(status='reserved')
+                .execution_options(synchronize_session=False)
+            )
+    held = db.session.execute(
+        db.select(Rental.rental_id, Rental.vehicle_id)
+        .where(Rental.status == 'reserved', Rental.start_time <= now)
+    ).all()
+    if held:
+        logger.warning('车辆仍被占用，%d 笔到期预约暂缓开始: %s', len(held),
+                       ', '.join(f'rental {rental_id} (vehicle {vehicle_id})'
+                                 for rental_id, vehicle_id in held))
+    return started, held
+
+
+def mark_overdue_vehicles(now):
+    # 逾期扫描时与 rentals 的 UPDATE 在同一事务内执行，返回更新的车辆数
+    expired = (
+        db.select(Rental.rental_id, Rental.vehicle_id)
+        .where(Rental.status == 'ongoing', Rental.expected_return_time < now)
+        .subquery()
+    )
+    # 先按车辆主键定位，避免扫描整张 vehicles 表
+    return db.session.execute(
+        update(Vehicle)
+        .where(Vehicle.vehicle_id.in_(db.select(expired.c.vehicle_id)),
+               Vehicle.current_status == 'ongoing',
+               Vehicle.current_rental_id.in_(db.select(expired.c.rental_id)))
+        .values(current_status='overdue', version=Vehicle.version + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def rebuild_vehicle_status(dry_run=False):
+    """根据租赁历史重建每辆车的当前租赁状态，返回不一致的车辆列表。
+
+    车辆有进行中或逾期的租赁时以最近开始的一笔为准；否则取最近开始的已结束租赁。
+    尚未开始的预约和已取消（退款）的预约都不算车辆的当前租赁。
+    """
+    # 退款只发生在取消预约时，与 reports.backfill_daily_stats 的规则一致
+    cancelled_reservation = and_(
+        Rental.status == 'cancelled',
+        exists().where(MoneyLedger.rental_id == Rental.rental_id,
+                       MoneyLedger.reason == 'refund'))
+    ranked = (
+        db.select(Rental.vehicle_id, Rental.rental_id, Rental.status,
+                  func.row_number().over(
+                      partition_by=Rental.vehicle_id,
+                      order_by=(case((Rental.status.in_(VEHICLE_BUSY_STATUSES), 0), else_=1),
+                                Rental.start_time.desc(), Rental.rental_id.desc()),
+                  ).label('rank'))
+        .where(Rental.status != 'reserved', ~cancelled_reservation)
+        .subquery()
+    )
+    current = db.select(ranked).where(ranked.c.rank == 1).subquery()
+    rows = db.session.execute(
+        db.select(Vehicle.vehicle_id, Vehicle.version, Vehicle.current_rental_id,
+                  Vehicle.current_status, current.c.rental_id, current.c.status)
+        .join(current, Vehicle.vehicle_id == current.c.vehicle_id, isouter=True)
+    ).all()
+
+    # version 用于乐观锁校验，批量更新时一并传入
+    mismatches = [
+        {
+            'vehicle_id': vehicle_id,
+            'version': version,
+            'current_rental_id': rental_id,
+            'current_status': status,
+        }
+        for vehicle_id, version, current_rental_id, current_status, rental_id, status in rows
+        if (current_rental_id, current_status) != (rental_id, status)
+    ]
+    if mismatches and not dry_run:
+        db.session.execute(update(Vehicle), mismatches)
+        db.session.commit()
+        invalidate_vehicle_list()
+    return mismatches
@@ -0,0 +1,14 @@
+"""ASGI 入口：uvicorn asgi:app --workers 4
+
+车辆、租赁列表、客户详情、余额查询走异步数据库路径，其余接口与 wsgi.py 相同。
+数据库和连接池参数通过环境变量配置，见 config.py。
+"""
+from flask_cors import CORS
+from app import create_app
+from app.asgi import AsyncReadApp
+from app.services.proxy import install_proxy_fix
+from config import ProductionConfig
+
+flask_app = install_proxy_fix(create_app(ProductionConfig))
+CORS(flask_app)
+app = AsyncReadApp(flask_app, cors_origin='*')
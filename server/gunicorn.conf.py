@@ -0,0 +1,25 @@
+# gunicorn 配置：gunicorn -c gunicorn.conf.py wsgi:app
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND') or f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# 每个 CPU 核一个工作进程；请求大部分时间在等待数据库，每个进程再用多个线程处理
+workers = int(os.environ.get('WEB_CONCURRENCY') or multiprocessing.cpu_count())
+threads = int(os.environ.get('GUNICORN_THREADS') or 4)
+worker_class = 'gthread'
+
+# 每个工作进程各自持有连接池，workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) 不应超过数据库的最大连接数
+timeout = int(os.environ.get('GUNICORN_TIMEOUT') or 30)
+graceful_timeout = 30
+keepalive = 5
+
+# 定期重启工作进程，避免长期运行的内存增长
+max_requests = 10000
+max_requests_jitter = 1000
+
+# 不预加载应用：调度线程、连接池和密码哈希进程池都要在工作进程中创建
+preload_app = False
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
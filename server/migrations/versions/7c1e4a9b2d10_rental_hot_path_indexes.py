@@ -0,0 +1,52 @@
+"""rental hot path indexes
+
+Revision ID: 7c1e4a9b2d10
+Revises: 3d6512604fe8
+Create Date: 2026-10-17 17:40:02.118374
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1e4a9b2d10'
+down_revision = '3d6512604fe8'
+branch_labels = None
+depends_on = None
+
+ACTIVE_RENTAL_PREDICATE = sa.text("status IN ('ongoing', 'overdue')")
+
+
+def upgrade():
+    op.create_index('ix_rentals_status_rental_id', 'rentals',
+                    ['status', 'rental_id'])
+    op.create_index('ix_rentals_customer_id_status', 'rentals',
+                    ['customer_id', 'status'])
+    op.create_index('ix_rentals_vehicle_id_status', 'rentals',
+                    ['vehicle_id', 'status'])
+    op.create_index('ix_rentals_status_expected_return_time', 'rentals',
+                    ['status', 'expected_return_time'])
+    op.create_index('ix_rentals_vehicle_id_created_at', 'rentals',
+                    ['vehicle_id', 'created_at'])
+    op.create_index('ix_rentals_active_vehicle_id', 'rentals', ['vehicle_id'],
+                    postgresql_where=ACTIVE_RENTAL_PREDICATE,
+                    sqlite_where=ACTIVE_RENTAL_PREDICATE)
+    op.create_index('ix_customers_is_deleted_customer_id', 'customers',
+                    ['is_deleted', 'customer_id'])
+    op.create_index('ix_customers_phone_is_deleted', 'customers',
+                    ['phone', 'is_deleted'])
+    op.create_index('ix_vehicles_is_deleted_vehicle_id', 'vehicles',
+                    ['is_deleted', 'vehicle_id'])
+
+
+def downgrade():
+    op.drop_index('ix_vehicles_is_deleted_vehicle_id', table_name='vehicles')
+    op.drop_index('ix_customers_phone_is_deleted', table_name='customers')
+    op.drop_index('ix_customers_is_deleted_customer_id', table_name='customers')
+    op.drop_index('ix_rentals_active_vehicle_id', table_name='rentals')
+    op.drop_index('ix_rentals_vehicle_id_created_at', table_name='rentals')
+    op.drop_index('ix_rentals_status_expected_return_time', table_name='rentals')
+    op.drop_index('ix_rentals_vehicle_id_status', table_name='rentals')
+    op.drop_index('ix_rentals_customer_id_status', table_name='rentals')
+    op.drop_index('ix_rentals_status_rental_id', table_name='rentals')
@@ -0,0 +1,42 @@
+"""vehicle current status
+
+Revision ID: a4f3c2e81b57
+Revises: 7c1e4a9b2d10
+Create Date: 2026-10-17 17:52:36.604210
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4f3c2e81b57'
+down_revision = '7c1e4a9b2d10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('vehicles', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('current_rental_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('current_status', sa.String(length=20), nullable=True))
+
+    # 根据租赁历史回填每辆车最新一笔租赁及其状态
+    op.execute("""
+        UPDATE vehicles SET current_rental_id = (
+            SELECT max(rentals.rental_id) FROM rentals
+            WHERE rentals.vehicle_id = vehicles.vehicle_id
+        )
+    """)
+    op.execute("""
+        UPDATE vehicles SET current_status = (
+            SELECT rentals.status FROM rentals
+            WHERE rentals.rental_id = vehicles.current_rental_id
+        )
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('vehicles', schema=None) as batch_op:
+        batch_op.drop_column('current_status')
+        batch_op.drop_column('current_rental_id')
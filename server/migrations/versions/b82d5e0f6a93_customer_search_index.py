@@ -0,0 +1,41 @@
+"""customer search index
+
+Revision ID: b82d5e0f6a93
+Revises: a4f3c2e81b57
+Create Date: 2026-10-17 18:05:41.337920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# 与 db.create_all() 使用同一份建表语句
+from app.services.search import POSTGRESQL_SEARCH_DDL, SQLITE_SEARCH_DDL
+
+
+# revision identifiers, used by Alembic.
+revision = 'b82d5e0f6a93'
+down_revision = 'a4f3c2e81b57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    statements = {'postgresql': POSTGRESQL_SEARCH_DDL, 'sqlite': SQLITE_SEARCH_DDL}.get(dialect, [])
+    for statement in statements:
+        op.execute(statement)
+    if dialect == 'sqlite':
+        # 为已有客户建立索引
+        op.execute("INSERT INTO customers_fts(customers_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_customers_id_card_trgm')
+        op.execute('DROP INDEX IF EXISTS ix_customers_name_trgm')
+    elif dialect == 'sqlite':
+        op.execute('DROP TRIGGER IF EXISTS customers_fts_au')
+        op.execute('DROP TRIGGER IF EXISTS customers_fts_ad')
+        op.execute('DROP TRIGGER IF EXISTS customers_fts_ai')
+        op.execute('DROP TABLE IF EXISTS customers_fts')
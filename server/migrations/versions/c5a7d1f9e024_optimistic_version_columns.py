@@ -0,0 +1,32 @@
+"""optimistic version columns
+
+Revision ID: c5a7d1f9e024
+Revises: b82d5e0f6a93
+Create Date: 2026-10-17 18:21:09.845512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5a7d1f9e024'
+down_revision = 'b82d5e0f6a93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('vehicles', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+    with op.batch_alter_table('customers', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    with op.batch_alter_table('customers', schema=None) as batch_op:
+        batch_op.drop_column('version')
+
+    with op.batch_alter_table('vehicles', schema=None) as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,57 @@
+"""money ledger
+
+Revision ID: d91b3e7a5c28
+Revises: c5a7d1f9e024
+Create Date: 2026-10-17 19:02:41.317204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd91b3e7a5c28'
+down_revision = 'c5a7d1f9e024'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('money_ledger',
+    sa.Column('ledger_id', sa.Integer(), nullable=False),
+    sa.Column('customer_id', sa.Integer(), nullable=False),
+    sa.Column('delta', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('balance_after', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('reason', sa.String(length=20), nullable=False),
+    sa.Column('rental_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['customer_id'], ['customers.customer_id'], ondelete='RESTRICT'),
+    sa.ForeignKeyConstraint(['rental_id'], ['rentals.rental_id'], ondelete='RESTRICT'),
+    sa.PrimaryKeyConstraint('ledger_id')
+    )
+    with op.batch_alter_table('money_ledger', schema=None) as batch_op:
+        batch_op.create_index('ix_money_ledger_customer_id_ledger_id', ['customer_id', 'ledger_id'], unique=False)
+
+    op.create_table('balance_snapshots',
+    sa.Column('customer_id', sa.Integer(), nullable=False),
+    sa.Column('ledger_id', sa.Integer(), nullable=False),
+    sa.Column('balance', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['customer_id'], ['customers.customer_id'], ondelete='RESTRICT'),
+    sa.PrimaryKeyConstraint('customer_id')
+    )
+
+    # 已有余额记为开户流水，使流水重放结果与当前余额一致
+    op.execute(
+        "INSERT INTO money_ledger (customer_id, delta, balance_after, reason, created_at) "
+        "SELECT customer_id, money, money, 'opening', CURRENT_TIMESTAMP "
+        "FROM customers WHERE money IS NOT NULL AND money <> 0"
+    )
+
+
+def downgrade():
+    op.drop_table('balance_snapshots')
+    with op.batch_alter_table('money_ledger', schema=None) as batch_op:
+        batch_op.drop_index('ix_money_ledger_customer_id_ledger_id')
+
+    op.drop_table('money_ledger')
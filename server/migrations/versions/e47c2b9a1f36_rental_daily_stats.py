@@ -0,0 +1,38 @@
+"""rental daily stats
+
+Revision ID: e47c2b9a1f36
+Revises: d91b3e7a5c28
+Create Date: 2026-10-17 21:14:08.552930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e47c2b9a1f36'
+down_revision = 'd91b3e7a5c28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 历史数据由 flask reports backfill 写入
+    op.create_table('rental_daily_stats',
+    sa.Column('stat_date', sa.Date(), nullable=False),
+    sa.Column('vehicle_type', sa.String(length=50), nullable=False),
+    sa.Column('brand', sa.String(length=50), nullable=False),
+    sa.Column('rentals', sa.Integer(), nullable=False),
+    sa.Column('cancelled', sa.Integer(), nullable=False),
+    sa.Column('refunded', sa.Integer(), nullable=False),
+    sa.Column('completed', sa.Integer(), nullable=False),
+    sa.Column('returned_late', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('booked_days', sa.Integer(), nullable=False),
+    sa.Column('occupied_hours', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.PrimaryKeyConstraint('stat_date', 'vehicle_type', 'brand')
+    )
+
+
+def downgrade():
+    op.drop_table('rental_daily_stats')
@@ -0,0 +1,29 @@
+"""replica heartbeat
+
+Revision ID: f2b8c6d4e913
+Revises: e47c2b9a1f36
+Create Date: 2026-10-17 23:02:41.170385
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b8c6d4e913'
+down_revision = 'e47c2b9a1f36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 心跳行由副本健康检查写入
+    op.create_table('replica_heartbeat',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('beat_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('replica_heartbeat')
@@ -0,0 +1,413 @@
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(SERVER_DIR)
+
+from sqlalchemy import event, insert, select
+from sqlalchemy.engine import make_url
+from werkzeug.security import generate_password_hash
+from werkzeug.serving import WSGIRequestHandler, make_server
+from config import Config
+from app import create_app, db
+from app.models import Customer, Rental, Users, Vehicle
+from gen_vehicle_data import generate_vehicles
+
+BENCH_PASSWORD = 'bench-password'
+# 租赁状态分布：进行中 / 逾期 / 已完成 / 已取消
+STATUS_MIX = {'ongoing': 0.10, 'overdue': 0.05,
+              'completed': 0.75, 'cancelled': 0.10}
+
+
+def make_config(database_url):
+    class BenchmarkConfig(Config):
+        TESTING = True
+        RENTAL_SCHEDULER_ENABLED = False
+        # 所有请求来自同一个 IP，测量吞吐量时关闭限流
+        RATE_LIMIT_ENABLED = False
+        SQLALCHEMY_DATABASE_URI = database_url
+    return BenchmarkConfig
+
+
+class QueryCounter:
+    # 统计执行的 SQL 语句数量
+    def __init__(self, engine):
+        self.count = 0
+        self._lock = threading.Lock()
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        with self._lock:
+            self.count += 1
+
+
+def seed_dataset(num_vehicles, num_customers, num_rentals, seed):
+    """写入基准测试数据集，返回可用于下单的车辆和客户。"""
+    rng = random.Random(seed)
+    db.drop_all()
+    db.create_all()
+
+    vehicles = generate_vehicles(num_vehicles, seed=seed)
+    for vehicle_id, vehicle in enumerate(vehicles, start=1):
+        vehicle['vehicle_id'] = vehicle_id
+    db.session.execute(insert(Vehicle), vehicles)
+
+    password_hash = generate_password_hash(BENCH_PASSWORD)
+    db.session.execute(insert(Users), [
+        {'user_id': i, 'username': f'bench{i}',
+         'password_hash': password_hash, 'role': 'customer'}
+        for i in range(1, num_customers + 1)
+    ])
+    db.session.execute(insert(Customer), [
+        {'customer_id': i, 'user_id': i, 'name': f'客户{i}',
+         'phone': f'{13000000000 + i}', 'id_card': f'{110101199000000000 + i}',
+         'money': Decimal('1000000.00')}
+        for i in range(1, num_customers + 1)
+    ])
+
+    # 每辆车最多一笔未结束的租赁；有逾期租赁的客户无法再下单
+    now = datetime.now()
+    statuses = rng.choices(list(STATUS_MIX), weights=list(STATUS_MIX.values()),
+                           k=num_rentals)
+    free_vehicles = list(range(1, num_vehicles + 1))
+    rng.shuffle(free_vehicles)
+    blocked_customers = set()
+    rentals = []
+    for rental_id, status in enumerate(statuses, start=1):
+        if status in ('ongoing', 'overdue'):
+            if not free_vehicles:
+                status = 'completed'
+            else:
+                vehicle_id = free_vehicles.pop()
+        if status in ('completed', 'cancelled'):
+            vehicle_id = rng.randint(1, num_vehicles)
+        customer_id = rng.randint(1, num_customers)
+        if status == 'overdue':
+            blocked_customers.add(customer_id)
+
+        duration_days = rng.randint(1, 14)
+        if status == 'ongoing':
+            start_time = now - timedelta(days=rng.uniform(0, duration_days))
+        else:
+            start_time = now - timedelta(days=rng.uniform(duration_days, 365))
+        expected_return_time = start_time + timedelta(days=duration_days)
+        actual_return_time = None
+        if status == 'completed':
+            actual_return_time = expected_return_time + timedelta(hours=rng.gauss(0, 12))
+
+        price = Decimal(str(vehicles[vehicle_id - 1]['price_per_day']))
+        rentals.append({
+            'rental_id': rental_id, 'vehicle_id': vehicle_id,
+            'customer_id': customer_id, 'start_time': start_time,
+            'duration_days': duration_days,
+            'expected_return_time': expected_return_time,
+            'actual_return_time': actual_return_time,
+            'total_fee': price * duration_days, 'status': status,
+            'created_at': start_time,
+        })
+    if rentals:
+        db.session.execute(insert(Rental), rentals)
+    db.session.commit()
+
+    from app.services.vehicle_status import rebuild_vehicle_status
+    rebuild_vehicle_status()
+
+    bookable_customers = [i for i in range(1, num_customers + 1)
+                          if i not in blocked_customers]
+    return free_vehicles, bookable_customers
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = max(0, int(round(p / 100 * len(sorted_values))) - 1)
+    return sorted_values[index]
+
+
+class TestClientTransport:
+    name = 'test_client'
+    in_process = True
+
+    def __init__(self, app, database_url):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, body=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body)
+        response.close()
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class HTTPTransport:
+    base_url = None
+    in_process = True
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(req) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+class WSGIServerTransport(HTTPTransport):
+    # Flask 开发服务器（werkzeug 多线程）
+    name = 'wsgi_server'
+
+    def __init__(self, app, database_url):
+        self.server = make_server('127.0.0.1', 0, app, threaded=True,
+                                  request_handler=QuietRequestHandler)
+        self.base_url = f'http://127.0.0.1:{self.server.server_port}'
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+class ServerProcessTransport(HTTPTransport):
+    # 在子进程中启动生产入口，子进程中执行的 SQL 不计入 queries_per_request
+    in_process = False
+
+    def command(self, port):
+        raise NotImplementedError
+
+    def __init__(self, app, database_url, startup_timeout=30):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        self.base_url = f'http://127.0.0.1:{port}'
+        env = dict(os.environ, DATABASE_URL=database_url, RENTAL_SCHEDULER_ENABLED='0',
+                   RATE_LIMIT_ENABLED='0', BIND=f'127.0.0.1:{port}')
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', *self.command(port)],
+            cwd=SERVER_DIR, env=env, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            try:
+                with urllib.request.urlopen(self.base_url + '/api/vehicles?limit=1'):
+                    break
+            except (urllib.error.URLError, ConnectionError):
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    self.close()
+                    raise RuntimeError(f'{self.name} failed to start')
+                time.sleep(0.2)
+
+    def close(self):
+        self.process.terminate()
+        self.process.wait()
+
+
+class GunicornTransport(ServerProcessTransport):
+    # gunicorn + wsgi.py，全部请求走同步 Flask
+    name = 'gunicorn'
+
+    def command(self, port):
+        return ['gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app']
+
+
+class UvicornTransport(ServerProcessTransport):
+    # uvicorn + asgi.py，只读接口走异步数据库路径；工作进程数取 WEB_CONCURRENCY
+    name = 'uvicorn'
+
+    def command(self, port):
+        return ['uvicorn', 'asgi:app', '--host', '127.0.0.1', '--port', str(port),
+                '--no-access-log']
+
+
+def build_endpoints(rng, free_vehicles, bookable_customers, num_customers):
+    # 每个被测接口返回一个生成 (method, path, body) 的函数；
+    # 每次 (mode, concurrency) 运行重新构建，下单的车辆在一次运行内不重复
+    vehicle_pool = iter(list(free_vehicles))
+    pool_lock = threading.Lock()
+
+    def next_booking():
+        with pool_lock:
+            vehicle_id = next(vehicle_pool, None)
+            customer_id = rng.choice(bookable_customers)
+        if vehicle_id is None:
+            raise RuntimeError('No free vehicle left for POST /api/rentals, '
+                               'increase --vehicles or decrease --requests')
+        return ('POST', '/api/rentals',
+                {'vehicle_id': vehicle_id, 'customer_id': customer_id, 'duration_days': 3})
+
+    return {
+        'GET /api/vehicles': lambda: ('GET', '/api/vehicles', None),
+        'GET /api/vehicles?limit=50': lambda: ('GET', '/api/vehicles?limit=50', None),
+        'GET /api/rentals/ongoing': lambda: ('GET', '/api/rentals/ongoing', None),
+        'GET /api/rentals/overdue': lambda: ('GET', '/api/rentals/overdue', None),
+        'GET /api/rentals/finished': lambda: ('GET', '/api/rentals/finished', None),
+        'GET /api/rentals/cancelled': lambda: ('GET', '/api/rentals/cancelled', None),
+        'GET /api/rentals?status=all': lambda: (
+            'GET', '/api/rentals?status=ongoing,overdue,completed,cancelled', None),
+        'GET /api/rentals/customer/<id>': lambda: (
+            'GET', f'/api/rentals/customer/{rng.randint(1, num_customers)}', None),
+        'GET /api/customers?search=': lambda: (
+            'GET', f'/api/customers?search=1300000{rng.randint(0, 9)}', None),
+        'POST /api/login': lambda: (
+            'POST', '/api/login',
+            {'username': f'bench{rng.randint(1, num_customers)}', 'password': BENCH_PASSWORD}),
+        'POST /api/rentals': next_booking,
+    }
+
+
+def return_bookings(app, transport, vehicle_ids):
+    # 通过被测服务归还本轮下单的车辆，下一轮运行可以重新使用这些车辆
+    with app.app_context():
+        rental_ids = db.session.execute(
+            select(Rental.rental_id)
+            .where(Rental.vehicle_id.in_(vehicle_ids), Rental.status == 'ongoing')
+        ).scalars().all()
+    for rental_id in rental_ids:
+        status = transport.request('PATCH', f'/api/rentals/{rental_id}')
+        if status != 204:
+            raise RuntimeError(f'Failed to return rental {rental_id}: HTTP {status}')
+
+
+def run_endpoint(transport, make_request, num_requests, concurrency, counter):
+    latencies = []
+    status_codes = {}
+    lock = threading.Lock()
+
+    def worker():
+        method, path, body = make_request()
+        started = time.perf_counter()
+        status = transport.request(method, path, body)
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            latencies.append(elapsed)
+            status_codes[status] = status_codes.get(status, 0) + 1
+
+    queries_before = counter.count
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(worker) for _ in range(num_requests)]
+    wall_time = time.perf_counter() - started
+    # 生成请求或发送请求时的异常（如可下单的车辆用完）直接中止基准测试
+    for future in futures:
+        future.result()
+
+    latencies.sort()
+    return {
+        'requests': num_requests,
+        'errors': sum(n for code, n in status_codes.items() if code >= 500),
+        'status_codes': {str(code): n for code, n in sorted(status_codes.items())},
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'throughput_rps': round(num_requests / wall_time, 1),
+        'queries_per_request': (round((counter.count - queries_before) / num_requests, 2)
+                                if transport.in_process else None),
+    }
+
+
+def run_benchmark(args):
+    database_url = args.database_url or 'sqlite:///' + os.path.join(
+        tempfile.mkdtemp(), 'benchmark.db')
+    app = create_app(make_config(database_url))
+    rng = random.Random(args.seed)
+
+    with app.app_context():
+        seed_started = time.perf_counter()
+        free_vehicles, bookable_customers = seed_dataset(
+            args.vehicles, args.customers, args.rentals, args.seed)
+        seed_seconds = time.perf_counter() - seed_started
+        counter = QueryCounter(db.engine)
+
+    report = {
+        'config': {
+            'database': make_url(database_url).get_backend_name(),
+            'vehicles': args.vehicles, 'customers': args.customers,
+            'rentals': args.rentals, 'requests': args.requests,
+            'concurrency': args.concurrency, 'seed': args.seed,
+            'seed_seconds': round(seed_seconds, 2),
+        },
+        'results': {},
+    }
+    transports = {'test_client': TestClientTransport, 'wsgi_server': WSGIServerTransport,
+                  'gunicorn': GunicornTransport, 'uvicorn': UvicornTransport}
+
+    def select_endpoints():
+        endpoints = build_endpoints(rng, free_vehicles, bookable_customers, args.customers)
+        if args.endpoints:
+            endpoints = {name: make for name, make in endpoints.items()
+                         if any(pattern in name for pattern in args.endpoints)}
+        return endpoints
+
+    booking = 'POST /api/rentals' in select_endpoints()
+    if booking and len(free_vehicles) < args.requests:
+        raise SystemExit(f'POST /api/rentals needs {args.requests} free vehicles but the dataset '
+                         f'has {len(free_vehicles)}; increase --vehicles or decrease --rentals/--requests')
+
+    for mode in args.modes:
+        transport = transports[mode](app, database_url)
+        try:
+            for concurrency in args.concurrency:
+                results = report['results'].setdefault(mode, {}).setdefault(str(concurrency), {})
+                for name, make_request in select_endpoints().items():
+                    results[name] = run_endpoint(
+                        transport, make_request, args.requests, concurrency, counter)
+                    print(f'[{mode} c={concurrency}] {name}: {results[name]}', file=sys.stderr)
+                if booking:
+                    return_bookings(app, transport, free_vehicles)
+        finally:
+            transport.close()
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='车辆租赁系统 API 基准测试')
+    parser.add_argument('--vehicles', type=int, default=1000)
+    parser.add_argument('--customers', type=int, default=500)
+    parser.add_argument('--rentals', type=int, default=5000)
+    parser.add_argument('--requests', type=int, default=200, help='每个接口的请求数')
+    parser.add_argument('--concurrency', type=lambda s: [int(c) for c in s.split(',')],
+                        default=[1, 4, 16], help='并发数，逗号分隔')
+    parser.add_argument('--modes', type=lambda s: s.split(','),
+                        default=['test_client', 'wsgi_server'],
+                        help='test_client / wsgi_server（开发服务器）/ gunicorn（生产入口）'
+                             ' / uvicorn（异步入口）')
+    parser.add_argument('--endpoints', nargs='*', help='只测试名称包含这些字符串的接口')
+    parser.add_argument('--database-url', help='默认使用临时 SQLite 数据库')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='结果 JSON 文件路径，默认输出到标准输出')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    report = run_benchmark(args)
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
@@ -0,0 +1,335 @@
+"""生成大规模的模拟数据集（用户、客户、车辆、租赁）并批量写入数据库。
+
+相同的 --seed 和 --now 总是生成相同的数据（密码哈希的盐除外），与 --workers 无关：每个分块使用由种子和
+分块序号确定的随机数生成器，分块大小固定。车牌号、手机号和身份证号由序号
+经过可逆的仿射置换得到，保证不重复。数据在子进程中分块生成，主进程按顺序
+逐块写入，同时最多只保留 workers * 2 个分块在内存中。
+
+    python utils/gen_dataset.py --customers 1000000 --vehicles 200000 \\
+        --rentals 5000000 --workers 8 --database-url postgresql://... --reset
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gen_vehicle_data import PLATE_SPACE, generate_vehicle, plate_number_at
+
+DATASET_PASSWORD = 'password'
+# 分块大小固定，保证生成结果与进程数无关
+CUSTOMER_CHUNK_SIZE = 10000
+VEHICLE_CHUNK_SIZE = 2000
+
+# 每辆车当前租赁的状态分布（其余车辆空闲）
+ACTIVE_STATUS_MIX = {'ongoing': 0.12, 'overdue': 0.03, 'reserved': 0.05}
+# 历史租赁中取消的比例
+CANCELLED_RATE = 0.08
+# 租期（天）及其权重：短租居多
+DURATION_DAYS = [1, 2, 3, 4, 5, 7, 10, 14, 21, 30]
+DURATION_WEIGHTS = [22, 20, 16, 10, 8, 10, 5, 5, 2, 2]
+
+SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗'
+GIVEN_NAMES = '伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华'
+CITIES = ['北京市', '上海市', '广州市', '深圳市', '杭州市', '南京市', '成都市', '武汉市', '长沙市']
+# 身份证号：6 位地区码 + 8 位出生日期 + 3 位顺序码 + 校验码
+ID_CARD_REGIONS = ['110101', '310101', '440103', '440304', '330102', '320102', '510104', '420102']
+ID_CARD_BIRTH_START = datetime(1960, 1, 1)
+ID_CARD_BIRTH_DAYS = 40 * 365
+ID_CARD_SPACE = len(ID_CARD_REGIONS) * ID_CARD_BIRTH_DAYS * 1000
+ID_CARD_WEIGHTS = [7, 9, 10, 5, 8, 4, 2, 1, 6, 3, 7, 9, 10, 5, 8, 4, 2]
+ID_CARD_CHECK_CODES = '10X98765432'
+PHONE_PREFIXES = ['130', '131', '135', '136', '138', '139', '150', '158', '186', '188']
+PHONE_SPACE = len(PHONE_PREFIXES) * 10 ** 8
+
+
+class AffinePermutation:
+    """[0, n) 上的置换 i -> (a * i + b) mod n，a 与 n 互素，不同序号映射到不同的值。"""
+
+    def __init__(self, n, rng):
+        self.n = n
+        self.b = rng.randrange(n)
+        a = rng.randrange(n // 3, n) | 1
+        while math.gcd(a, n) != 1:
+            a += 2
+        self.a = a
+
+    def __call__(self, i):
+        return (self.a * i + self.b) % self.n
+
+
+def make_permutations(seed):
+    rng = random.Random(f'{seed}:permutations')
+    return {
+        'plate': AffinePermutation(PLATE_SPACE, rng),
+        'phone': AffinePermutation(PHONE_SPACE, rng),
+        'id_card': AffinePermutation(ID_CARD_SPACE, rng),
+    }
+
+
+def phone_at(index):
+    prefix, number = divmod(index, 10 ** 8)
+    return f'{PHONE_PREFIXES[prefix]}{number:08d}'
+
+
+def id_card_at(index):
+    index, sequence = divmod(index, 1000)
+    region, day = divmod(index, ID_CARD_BIRTH_DAYS)
+    birth = ID_CARD_BIRTH_START + timedelta(days=day)
+    body = f'{ID_CARD_REGIONS[region]}{birth:%Y%m%d}{sequence:03d}'
+    check = sum(int(digit) * weight for digit, weight in zip(body, ID_CARD_WEIGHTS)) % 11
+    return body + ID_CARD_CHECK_CODES[check]
+
+
+def generate_customer_chunk(seed, start_id, end_id, password_hash, now):
+    """生成 [start_id, end_id) 的用户、客户和开户流水，user_id 与 customer_id 相同。"""
+    rng = random.Random(f'{seed}:customers:{start_id}')
+    permutations = make_permutations(seed)
+    users, customers, ledger = [], [], []
+    for i in range(start_id, end_id):
+        # 余额：约两成为 0，其余呈对数正态分布
+        money = Decimal('0.00') if rng.random() < 0.2 else \
+            Decimal(str(round(min(rng.lognormvariate(7, 1.2), 99999999), 2)))
+        created_at = now - timedelta(days=rng.uniform(0, 3 * 365))
+        users.append({
+            'user_id': i, 'username': f'user{i}',
+            'password_hash': password_hash, 'role': 'customer', 'is_deleted': False,
+        })
+        customers.append({
+            'customer_id': i, 'user_id': i,
+            'name': rng.choice(SURNAMES) + ''.join(rng.choices(GIVEN_NAMES, k=rng.randint(1, 2))),
+            'phone': phone_at(permutations['phone'](i)),
+            'id_card': id_card_at(permutations['id_card'](i)),
+            'address': f'{rng.choice(CITIES)}{rng.randint(1, 999)}号' if rng.random() < 0.7 else None,
+            'money': money, 'is_deleted': False, 'version': 1,
+            'created_at': created_at, 'updated_at': created_at,
+        })
+        if money:
+            ledger.append({'customer_id': i, 'delta': money, 'balance_after': money,
+                           'reason': 'opening', 'created_at': created_at})
+    return users, customers, ledger
+
+
+def _rental(rng, vehicle_id, price, num_customers, status, start_time, duration_days, booked_at,
+            next_start=None):
+    expected_return_time = start_time + timedelta(days=duration_days)
+    actual_return_time = None
+    if status == 'completed':
+        # 大多数按时归还，少数提前或推迟几个小时，但不晚于同一辆车下一笔租赁的开始
+        actual_return_time = expected_return_time + timedelta(hours=rng.gauss(0, 6))
+        if next_start is not None:
+            actual_return_time = min(actual_return_time, next_start - timedelta(hours=1))
+        actual_return_time = max(actual_return_time, start_time + timedelta(hours=1))
+    return {
+        'vehicle_id': vehicle_id,
+        'customer_id': rng.randint(1, num_customers),
+        'start_time': start_time,
+        'duration_days': duration_days,
+        'expected_return_time': expected_return_time,
+        'actual_return_time': actual_return_time,
+        'total_fee': price * duration_days,
+        'status': status,
+        'created_at': booked_at,
+        'updated_at': actual_return_time or booked_at,
+    }
+
+
+def generate_vehicle_chunk(seed, start_id, end_id, num_customers, rentals_per_vehicle, now):
+    """生成 [start_id, end_id) 的车辆及其租赁。
+
+    每辆车的租赁按时间顺序排列且互不重叠：至多一笔当前租赁（进行中、逾期或预约），
+    之前是已完成或已取消的历史租赁。rental_id 由主进程按顺序分配，
+    返回的 current_index 是车辆当前租赁在该车租赁列表中的下标。
+    """
+    rng = random.Random(f'{seed}:vehicles:{start_id}')
+    permutations = make_permutations(seed)
+    statuses = list(ACTIVE_STATUS_MIX) + [None]
+    weights = list(ACTIVE_STATUS_MIX.values()) + [1 - sum(ACTIVE_STATUS_MIX.values())]
+    vehicles = []
+    for vehicle_id in range(start_id, end_id):
+        vehicle = generate_vehicle(plate_number_at(permutations['plate'](vehicle_id)), rng)
+        vehicle.update({'vehicle_id': vehicle_id, 'is_deleted': False, 'version': 1,
+                        'created_at': now, 'updated_at': now})
+        price = Decimal(str(vehicle['price_per_day']))
+
+        # 当前租赁
+        active = None
+        cursor = now
+        active_status = rng.choices(statuses, weights)[0]
+        if active_status is not None:
+            duration_days = rng.choices(DURATION_DAYS, DURATION_WEIGHTS)[0]
+            if active_status == 'ongoing':
+                start_time = now - timedelta(days=rng.uniform(0, duration_days))
+                booked_at = start_time
+            elif active_status == 'overdue':
+                start_time = now - timedelta(days=duration_days + rng.uniform(0.5, 10))
+                booked_at = start_time
+            else:
+                start_time = now + timedelta(days=rng.uniform(0.05, 30))
+                booked_at = now - timedelta(days=rng.uniform(0, 7))
+            active = _rental(rng, vehicle_id, price, num_customers, active_status,
+                             start_time, duration_days, booked_at)
+            if active_status != 'reserved':
+                cursor = start_time
+
+        # 从当前时间往前依次生成历史租赁，次数服从均值为 rentals_per_vehicle 的伽马分布
+        history = []
+        count = int(round(rng.gammavariate(2, rentals_per_vehicle / 2))) if rentals_per_vehicle else 0
+        for _ in range(count):
+            duration_days = rng.choices(DURATION_DAYS, DURATION_WEIGHTS)[0]
+            # 两笔租赁之间留出至少半天的间隔
+            end = cursor - timedelta(days=0.5 + rng.expovariate(1 / 3))
+            start_time = end - timedelta(days=duration_days)
+            status = 'cancelled' if rng.random() < CANCELLED_RATE else 'completed'
+            history.append(_rental(rng, vehicle_id, price, num_customers, status,
+                                   start_time, duration_days, start_time, next_start=cursor))
+            cursor = start_time
+        history.reverse()
+
+        rentals = history + ([active] if active else [])
+        # 车辆的当前租赁：最近一笔已开始的租赁
+        started = [i for i, rental in enumerate(rentals) if rental['status'] != 'reserved']
+        vehicles.append((vehicle, rentals, started[-1] if started else None))
+    return vehicles
+
+
+def _chunks(total, size):
+    for start in range(1, total + 1, size):
+        yield start, min(start + size, total + 1)
+
+
+def _ordered_results(executor, func, tasks, window):
+    # 按提交顺序返回结果，同时最多有 window 个分块在生成或等待写入
+    pending = deque()
+    for task in tasks:
+        pending.append(executor.submit(func, *task))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def load_dataset(executor, window, num_customers, num_vehicles, num_rentals, seed, now,
+                 log=print):
+    """生成并写入数据集，返回各表写入的行数。"""
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+    from app import db
+    from app.models import Customer, MoneyLedger, Rental, Users, Vehicle
+
+    counts = {'users': 0, 'customers': 0, 'vehicles': 0, 'rentals': 0, 'money_ledger': 0}
+    # 所有用户共用同一个密码哈希，逐个计算上百万次哈希不现实
+    password_hash = generate_password_hash(DATASET_PASSWORD)
+    tasks = ((seed, start, end, password_hash, now)
+             for start, end in _chunks(num_customers, CUSTOMER_CHUNK_SIZE))
+    for users, customers, ledger in _ordered_results(
+            executor, generate_customer_chunk, tasks, window):
+        db.session.execute(insert(Users), users)
+        db.session.execute(insert(Customer), customers)
+        if ledger:
+            db.session.execute(insert(MoneyLedger), ledger)
+        db.session.commit()
+        counts['users'] += len(users)
+        counts['customers'] += len(customers)
+        counts['money_ledger'] += len(ledger)
+        log(f'customers: {counts["customers"]}/{num_customers}')
+
+    rentals_per_vehicle = num_rentals / num_vehicles if num_vehicles else 0
+    next_rental_id = 1
+    tasks = ((seed, start, end, num_customers, rentals_per_vehicle, now)
+             for start, end in _chunks(num_vehicles, VEHICLE_CHUNK_SIZE))
+    for chunk in _ordered_results(executor, generate_vehicle_chunk, tasks, window):
+        vehicles, rentals = [], []
+        for vehicle, vehicle_rentals, current_index in chunk:
+            for rental in vehicle_rentals:
+                rental['rental_id'] = next_rental_id
+                next_rental_id += 1
+            current = vehicle_rentals[current_index] if current_index is not None else None
+            vehicle['current_rental_id'] = current['rental_id'] if current else None
+            vehicle['current_status'] = current['status'] if current else None
+            vehicles.append(vehicle)
+            rentals.extend(vehicle_rentals)
+        db.session.execute(insert(Vehicle), vehicles)
+        if rentals:
+            db.session.execute(insert(Rental), rentals)
+        db.session.commit()
+        counts['vehicles'] += len(vehicles)
+        counts['rentals'] += len(rentals)
+        log(f'vehicles: {counts["vehicles"]}/{num_vehicles}, rentals: {counts["rentals"]}')
+
+    if db.engine.dialect.name == 'postgresql':
+        # 显式写入了主键，需要把序列推进到当前最大值
+        for table, column in [('users', 'user_id'), ('customers', 'customer_id'),
+                              ('vehicles', 'vehicle_id'), ('rentals', 'rental_id')]:
+            db.session.execute(db.text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', '{column}'), "
+                f"COALESCE((SELECT MAX({column}) FROM {table}), 1))"))
+        db.session.commit()
+    return counts
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='生成大规模模拟数据集并写入数据库')
+    parser.add_argument('--customers', type=int, default=10000, help='客户数（每个客户对应一个用户）')
+    parser.add_argument('--vehicles', type=int, default=2000)
+    parser.add_argument('--rentals', type=int, default=50000, help='租赁总数的期望值')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--database-url', help='默认使用应用配置中的数据库')
+    parser.add_argument('--reset', action='store_true', help='写入前删除并重建所有表')
+    parser.add_argument('--now', type=datetime.fromisoformat,
+                        help='作为“当前时间”的时间点，默认取运行时的时间；固定后结果完全可复现')
+    args = parser.parse_args(argv)
+    if args.customers <= 0 and args.rentals > 0:
+        parser.error('生成租赁需要至少一个客户')
+    if args.vehicles > PLATE_SPACE:
+        parser.error(f'最多生成 {PLATE_SPACE} 辆车')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # 先启动子进程，子进程只负责生成数据，不持有数据库连接
+    executor = ProcessPoolExecutor(max_workers=args.workers)
+
+    from config import Config
+    from app import create_app, db
+    from app.models import Customer, Rental, Users, Vehicle
+
+    class DatasetConfig(Config):
+        RENTAL_SCHEDULER_ENABLED = False
+        SQLALCHEMY_DATABASE_URI = args.database_url or Config.SQLALCHEMY_DATABASE_URI
+
+    app = create_app(DatasetConfig)
+    with app.app_context():
+        if args.reset:
+            db.drop_all()
+            db.create_all()
+        elif any(model.query.first() for model in (Users, Customer, Vehicle, Rental)):
+            sys.exit('数据库中已有数据，请使用 --reset 清空后再生成')
+
+        started = time.perf_counter()
+        try:
+            counts = load_dataset(executor, args.workers * 2, args.customers, args.vehicles,
+                                  args.rentals, args.seed,
+                                  args.now or datetime.now().replace(microsecond=0),
+                                  log=lambda message: print(message, file=sys.stderr))
+        finally:
+            executor.shutdown()
+        # 租赁记录直接批量写入，每日汇总表统一重算
+        from app.services.reports import backfill_daily_stats
+        counts['rental_daily_stats'] = backfill_daily_stats()
+        elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    print(f'写入 {total} 行，用时 {elapsed:.1f} 秒（{total / elapsed:.0f} 行/秒）：{counts}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,31 +1,49 @@
 import json
 import random
 import os
+import sys
 
 # 定义车辆品牌、型号、颜色和状态
 brands = ["Toyota", "Honda", "Ford", "BMW",
           "Audi", "Tesla", "Nissan", "Volkswagen"]
 models = ["RAV4", "Accord", "Mustang", "X5", "A4", "Model S", "Altima", "Golf"]
 colors = ["白色", "黑色", "红色", "蓝色", "银色", "灰色"]
+types = ["SUV", "轿车", "跑车", "卡车"]
+
+# 车牌号 = 省份简称 + 字母 + 5 位数字
+provinces = ["京", "沪", "粤", "苏", "浙", "川", "鄂", "湘"]
+plate_letters = "ABCDEFGHJKLMNPQRSTUVWXYZ"
+PLATE_SPACE = len(provinces) * len(plate_letters) * 90000
+
+
+def plate_number_at(index):
+    # 把序号映射为唯一的车牌号
+    index, number = divmod(index, 90000)
+    province, letter = divmod(index, len(plate_letters))
+    return f"{provinces[province]}{plate_letters[letter]}{10000 + number}"
 
 # 生成一辆车的随机数据
 
 
-def generate_vehicle():
+def generate_vehicle(plate_number=None, rng=random):
     return {
-        "type": random.choice(["SUV", "轿车", "跑车", "卡车"]),
-        "brand": random.choice(brands),
-        "model": random.choice(models),
-        "color": random.choice(colors),
-        "price_per_day": round(random.uniform(100, 500), 2),
-        "plate_number": f"京{random.choice(['A', 'B', 'C'])}{random.randint(10000, 99999)}"
+        "type": rng.choice(types),
+        "brand": rng.choice(brands),
+        "model": rng.choice(models),
+        "color": rng.choice(colors),
+        "price_per_day": round(rng.uniform(100, 500), 2),
+        "plate_number": plate_number or plate_number_at(rng.randrange(PLATE_SPACE))
     }
 
-# 生成大量车辆数据
+# 生成大量车辆数据，车牌号保证不重复
 
 
-def generate_vehicles(num_vehicles):
-    return [generate_vehicle() for _ in range(num_vehicles)]
+def generate_vehicles(num_vehicles, seed=None):
+    if num_vehicles > PLATE_SPACE:
+        raise ValueError(f"最多生成 {PLATE_SPACE} 辆车")
+    rng = random.Random(seed)
+    plate_indexes = rng.sample(range(PLATE_SPACE), num_vehicles)
+    return [generate_vehicle(plate_number_at(i), rng) for i in plate_indexes]
 
 # 保存数据到 JSON 文件
 
@@ -37,8 +55,9 @@ def save_to_json(data, filename):
         json.dump(data, f, ensure_ascii=False, indent=2)
 
 
-# 生成 100 辆车的测试数据并保存到 vehicles.json
+# 生成测试数据并保存到 vehicles.json，默认 100 辆车
 if __name__ == "__main__":
-    vehicles = generate_vehicles(100)
+    num_vehicles = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    vehicles = generate_vehicles(num_vehicles)
     save_to_json(vehicles, "vehicles.json")
-    print("成功生成测试数据并保存到 vehicles.json！")
+    print(f"成功生成 {num_vehicles} 辆车的测试数据并保存到 vehicles.json！")
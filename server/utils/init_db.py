@@ -8,6 +8,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app.models import Users
 from app.models import Vehicle
 from app import create_app, db
+from app.services.vehicle_import import import_vehicles
 
 
 def init_db():
@@ -29,21 +30,10 @@ def init_db():
             with open(file_path, "r", encoding="utf-8") as f:
                 vehicles_data = json.load(f)
 
-            # 将数据转换为 Vehicle 对象
-            vehicles = [
-                Vehicle(
-                    type=vehicle["type"],
-                    brand=vehicle["brand"],
-                    model=vehicle["model"],
-                    color=vehicle["color"],
-                    price_per_day=vehicle["price_per_day"],
-                    plate_number=vehicle["plate_number"],
-                )
-                for vehicle in vehicles_data
-            ]
-
-            db.session.add_all(vehicles)
-            db.session.commit()
+            # 分批校验并批量写入
+            result = import_vehicles(vehicles_data)
+            if result['error_count']:
+                print(f"{result['error_count']} 辆车导入失败: {result['errors'][:10]}")
             print("成功从初始化数据库！")
 
         # 添加一个管理员账号和一个普通用户账号
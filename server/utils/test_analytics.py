@@ -0,0 +1,123 @@
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from config import Config
+from app import create_app, db
+from app.models import Customer, Rental, Users, Vehicle
+from app.services.analytics import analytics_snapshot, summarize
+
+TEMP_DIR = tempfile.mkdtemp()
+
+
+class AnalyticsConfig(Config):
+    TESTING = True
+    RENTAL_SCHEDULER_ENABLED = False
+    SQL_INSTRUMENTATION_ENABLED = False
+    ANALYTICS_SNAPSHOT_DIR = os.path.join(TEMP_DIR, 'analytics')
+    ANALYTICS_REFRESH_BATCH_SIZE = 2
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(TEMP_DIR, 'analytics.db')
+
+
+def setup_data():
+    db.drop_all()
+    db.create_all()
+    for vehicle_id, brand in ((1, 'Toyota'), (2, 'Honda')):
+        db.session.add(Vehicle(vehicle_id=vehicle_id, type='SUV', brand=brand, model='-', color='白色',
+                               price_per_day=100 * vehicle_id, plate_number=f'京A{10000 + vehicle_id}'))
+    db.session.add(Users(user_id=1, username='analyst', password_hash='-', role='customer'))
+    db.session.add(Customer(customer_id=1, user_id=1, name='客户', phone='13000000001',
+                            id_card='110101199000000001', money=Decimal('0.00')))
+    db.session.commit()
+
+
+def add_rentals(*rental_ids, status='completed'):
+    start = datetime(2026, 1, 1, 9)
+    for rental_id in rental_ids:
+        vehicle_id = 1 + rental_id % 2
+        db.session.add(Rental(
+            rental_id=rental_id, vehicle_id=vehicle_id, customer_id=1,
+            start_time=start + timedelta(days=rental_id), duration_days=2,
+            expected_return_time=start + timedelta(days=rental_id + 2),
+            actual_return_time=start + timedelta(days=rental_id + 2, hours=rental_id) if status == 'completed' else None,
+            total_fee=Decimal(200 * vehicle_id), status=status))
+    db.session.commit()
+
+
+def snapshot_ids():
+    return sorted(analytics_snapshot.view()['rental_id'].tolist())
+
+
+def test_high_water_mark_and_gaps():
+    app = create_app(AnalyticsConfig)
+    with app.app_context():
+        setup_data()
+        # 4 号租赁尚未提交，流水号出现空洞
+        add_rentals(1, 2, 3, 5)
+        assert analytics_snapshot.refresh(full=True) == {'appended': 4, 'updated': 0, 'rows': 4}
+        meta = analytics_snapshot.view().meta
+        assert meta['high_water_mark'] == 5, meta
+        assert [rental_id for rental_id, _ in meta['gaps']] == [4], meta
+
+        # 空洞提交后在重试期限内补上，高水位之后的新租赁照常追加
+        add_rentals(4, 6)
+        assert analytics_snapshot.refresh()['appended'] == 2
+        view = analytics_snapshot.view()
+        assert snapshot_ids() == [1, 2, 3, 4, 5, 6]
+        assert view.meta['high_water_mark'] == 6 and view.meta['gaps'] == [], view.meta
+
+        # 没有新数据时刷新不追加
+        assert analytics_snapshot.refresh() == {'appended': 0, 'updated': 0, 'rows': 6}
+
+        # 超过重试期限的空洞不再查询，全量重建时才会补上
+        add_rentals(8)
+        analytics_snapshot.gap_retry_seconds = 0
+        analytics_snapshot.refresh()
+        add_rentals(7)
+        assert analytics_snapshot.refresh()['appended'] == 0
+        assert 7 not in snapshot_ids()
+        assert analytics_snapshot.refresh(full=True)['rows'] == 8
+        assert snapshot_ids() == list(range(1, 9))
+        analytics_snapshot.gap_retry_seconds = AnalyticsConfig.ANALYTICS_GAP_RETRY_SECONDS
+
+
+def test_open_rentals_and_recovery():
+    app = create_app(AnalyticsConfig)
+    with app.app_context():
+        setup_data()
+        add_rentals(1, 2)
+        add_rentals(3, 4, status='ongoing')
+        analytics_snapshot.refresh(full=True)
+        view = analytics_snapshot.view()
+        assert summarize(view, 'total_fee', statuses=['completed'])[0]['count'] == 2
+
+        # 未结束的租赁在刷新时重新读取状态和归还时间
+        rental = db.session.get(Rental, 3)
+        rental.status = 'completed'
+        rental.actual_return_time = rental.expected_return_time + timedelta(hours=5)
+        db.session.commit()
+        assert analytics_snapshot.refresh() == {'appended': 0, 'updated': 2, 'rows': 4}
+        view = analytics_snapshot.view()
+        position = view['rental_id'].tolist().index(3)
+        assert view.categories['status'][view['status'][position]] == 'completed'
+        assert view.derived('lateness_hours')[position] == 5
+        assert summarize(view, 'total_fee', statuses=['completed'])[0]['count'] == 3
+
+        # 上次刷新中途失败时，列文件比 meta.json 记录的行数长，多出的部分被截掉
+        with open(os.path.join(AnalyticsConfig.ANALYTICS_SNAPSHOT_DIR, 'rental_id.bin'), 'ab') as f:
+            np.array([99, 100], dtype='int32').tofile(f)
+        add_rentals(5)
+        assert analytics_snapshot.refresh()['rows'] == 5
+        assert snapshot_ids() == [1, 2, 3, 4, 5]
+        size = os.path.getsize(os.path.join(AnalyticsConfig.ANALYTICS_SNAPSHOT_DIR, 'rental_id.bin'))
+        assert size == 5 * 4, size
+
+
+if __name__ == '__main__':
+    test_high_water_mark_and_gaps()
+    test_open_rentals_and_recovery()
+    print('分析快照检查通过：高水位和空洞处理正确，未结束的租赁会被更新！')
@@ -0,0 +1,107 @@
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func
+from config import Config
+from app import create_app, db
+from app.models import Customer, Rental, Users, Vehicle
+
+# 默认使用临时 SQLite 数据库；设置 STRESS_DATABASE_URL 可在 PostgreSQL 上压测
+DATABASE_URL = os.environ.get('STRESS_DATABASE_URL')
+THREADS = int(os.environ.get('STRESS_THREADS', 16))
+ATTEMPTS_PER_VEHICLE = int(os.environ.get('STRESS_ATTEMPTS', 20))
+
+
+class StressConfig(Config):
+    TESTING = True
+    RENTAL_SCHEDULER_ENABLED = False
+    SQL_INSTRUMENTATION_ENABLED = False
+    BOOKING_MAX_RETRIES = 10
+    SQLALCHEMY_DATABASE_URI = DATABASE_URL or 'sqlite:///' + os.path.join(
+        tempfile.mkdtemp(), 'booking_stress.db')
+
+
+def setup_data(num_vehicles, num_customers, money):
+    db.drop_all()
+    db.create_all()
+    for i in range(1, num_vehicles + 1):
+        db.session.add(Vehicle(vehicle_id=i, type='SUV', brand='Toyota', model='RAV4',
+                               color='白色', price_per_day=100, plate_number=f'京A{10000 + i}'))
+    for i in range(1, num_customers + 1):
+        db.session.add(Users(user_id=i, username=f'stress{i}', password_hash='-', role='customer'))
+        db.session.add(Customer(customer_id=i, user_id=i, name=f'客户{i}', phone=f'{13000000000 + i}',
+                                id_card=f'{110101199000000000 + i}', money=money))
+    db.session.commit()
+
+
+def hammer(app, bookings):
+    # 多个线程并发提交下单请求，返回各状态码的次数
+    status_codes = {}
+    lock = threading.Lock()
+    local = threading.local()
+
+    def book(payload):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+        status = client.post('/api/rentals', json=payload).status_code
+        with lock:
+            status_codes[status] = status_codes.get(status, 0) + 1
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        list(executor.map(book, bookings))
+    return status_codes
+
+
+def test_no_double_booking():
+    app = create_app(StressConfig)
+    num_vehicles, num_customers = 5, 20
+    with app.app_context():
+        setup_data(num_vehicles, num_customers, Decimal('100000.00'))
+
+    bookings = [
+        {'vehicle_id': 1 + i % num_vehicles, 'customer_id': 1 + i % num_customers, 'duration_days': 1}
+        for i in range(num_vehicles * ATTEMPTS_PER_VEHICLE)
+    ]
+    status_codes = hammer(app, bookings)
+
+    with app.app_context():
+        active = dict(
+            db.session.query(Rental.vehicle_id, func.count())
+            .filter(Rental.status.in_(['ongoing', 'overdue']))
+            .group_by(Rental.vehicle_id)
+            .all()
+        )
+        assert all(count == 1 for count in active.values()), f'车辆被重复出租: {active}'
+        assert status_codes.get(201, 0) == len(active) == num_vehicles, status_codes
+        assert not any(code >= 500 for code in status_codes), status_codes
+
+
+def test_no_overdraft():
+    app = create_app(StressConfig)
+    num_vehicles = 40
+    # 余额只够租 5 天
+    with app.app_context():
+        setup_data(num_vehicles, 1, Decimal('500.00'))
+
+    bookings = [{'vehicle_id': i, 'customer_id': 1, 'duration_days': 1}
+                for i in range(1, num_vehicles + 1)]
+    status_codes = hammer(app, bookings)
+
+    with app.app_context():
+        customer = db.session.get(Customer, 1)
+        rentals = Rental.query.filter_by(customer_id=1).count()
+        assert customer.money == Decimal('500.00') - rentals * 100, customer.money
+        assert customer.money >= 0
+        assert rentals == status_codes.get(201, 0) == 5, status_codes
+
+
+if __name__ == '__main__':
+    test_no_double_booking()
+    test_no_overdraft()
+    print('并发下单压测通过：没有重复出租，也没有透支！')
@@ -0,0 +1,135 @@
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from app import create_app, db
+from app.models import Customer, IdempotencyKey, Users
+from app.services.auth import token_auth
+from app.services.idempotency import request_fingerprint, scoped_key
+
+# 默认使用临时 SQLite 数据库；设置 IDEMPOTENCY_DATABASE_URL 可在 PostgreSQL 上检查
+DATABASE_URL = os.environ.get('IDEMPOTENCY_DATABASE_URL')
+
+
+class IdempotencyConfig(Config):
+    TESTING = True
+    RENTAL_SCHEDULER_ENABLED = False
+    SQL_INSTRUMENTATION_ENABLED = False
+    RATE_LIMIT_ENABLED = False
+    IDEMPOTENCY_WAIT_SECONDS = 0.2
+    SQLALCHEMY_DATABASE_URI = DATABASE_URL or 'sqlite:///' + os.path.join(
+        tempfile.mkdtemp(), 'idempotency.db')
+
+
+def create_test_app():
+    app = create_app(IdempotencyConfig)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        for i in (1, 2):
+            db.session.add(Users(user_id=i, username=f'idem{i}', password_hash='-', role='customer'))
+            db.session.add(Customer(customer_id=i, user_id=i, name=f'客户{i}', phone=f'{13000000000 + i}',
+                                    id_card=f'{110101199000000000 + i}', money=Decimal('0.00')))
+        db.session.commit()
+    return app
+
+
+def balance(app, customer_id):
+    with app.app_context():
+        return db.session.get(Customer, customer_id).money
+
+
+def recharge(client, key, amount, customer_id=1, **kwargs):
+    return client.post(f'/api/money/{customer_id}', json={'amount': amount},
+                       headers={'Idempotency-Key': key, **kwargs.pop('headers', {})}, **kwargs)
+
+
+def test_replay():
+    app = create_test_app()
+    client = app.test_client()
+    first = recharge(client, 'replay', '100')
+    assert first.status_code == 200 and 'Idempotent-Replayed' not in first.headers, first.json
+    # 重试返回保存的响应，不再充值
+    for _ in range(2):
+        retry = recharge(client, 'replay', '100')
+        assert retry.status_code == 200 and retry.json == first.json, retry.json
+        assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert balance(app, 1) == Decimal('100.00'), balance(app, 1)
+
+    # 热缓存丢失时从数据库回放
+    app.extensions['idempotency'].cache.clear()
+    assert recharge(client, 'replay', '100').headers['Idempotent-Replayed'] == 'true'
+    assert balance(app, 1) == Decimal('100.00'), balance(app, 1)
+
+    # 4xx 响应同样回放；5xx 不保存，可以用同一个键重试
+    assert recharge(client, 'missing', '50', customer_id=99).status_code == 404
+    assert recharge(client, 'missing', '50', customer_id=99).headers.get('Idempotent-Replayed') == 'true'
+    assert recharge(client, 'invalid', 'abc').status_code == 500
+    assert 'Idempotent-Replayed' not in recharge(client, 'invalid', 'abc').headers
+
+
+def test_fingerprint_mismatch():
+    app = create_test_app()
+    client = app.test_client()
+    assert recharge(client, 'mismatch', '100').status_code == 200
+    # 同一个键用于不同的请求体或路径
+    assert recharge(client, 'mismatch', '200').status_code == 422
+    assert recharge(client, 'mismatch', '100', customer_id=2).status_code == 422
+    app.extensions['idempotency'].cache.clear()
+    assert recharge(client, 'mismatch', '200').status_code == 422
+    assert balance(app, 1) == Decimal('100.00') and balance(app, 2) == Decimal('0.00')
+
+
+def test_pending_key():
+    app = create_test_app()
+    client = app.test_client()
+    # 另一个进程已占用该键但还没有保存响应
+    with app.test_request_context('/api/money/1', method='POST', json={'amount': '100'}):
+        fingerprint = request_fingerprint()
+    now = datetime.now()
+    with app.app_context():
+        db.session.add(IdempotencyKey(key=scoped_key('ip:127.0.0.1', 'pending'), request_hash=fingerprint,
+                                      status='pending', created_at=now,
+                                      expires_at=now + timedelta(hours=1)))
+        db.session.commit()
+    response = recharge(client, 'pending', '100')
+    assert response.status_code == 409 and response.headers['Retry-After'] == '1', response.json
+    assert balance(app, 1) == Decimal('0.00')
+    # 其他客户端的同名键不受影响
+    other = recharge(client, 'pending', '100', environ_base={'REMOTE_ADDR': '10.0.0.2'})
+    assert other.status_code == 200, other.json
+    assert balance(app, 1) == Decimal('100.00')
+
+
+def test_scoped_by_client():
+    app = create_test_app()
+    client = app.test_client()
+    with app.app_context():
+        tokens = [token_auth.issue_token(db.session.get(Users, i)) for i in (1, 2)]
+    # 两个用户恰好用了相同的键，各自执行一次
+    for token, customer_id in zip(tokens, (1, 2)):
+        response = recharge(client, 'shared', '30', customer_id=customer_id,
+                            headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 200 and 'Idempotent-Replayed' not in response.headers, response.json
+    assert balance(app, 1) == balance(app, 2) == Decimal('30.00')
+    # 同一用户换了地址重试仍然回放
+    retry = recharge(client, 'shared', '30', headers={'Authorization': f'Bearer {tokens[0]}'},
+                     environ_base={'REMOTE_ADDR': '10.0.0.3'})
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    # 匿名客户端按地址区分
+    assert recharge(client, 'anonymous', '5', environ_base={'REMOTE_ADDR': '10.0.0.4'}).status_code == 200
+    response = recharge(client, 'anonymous', '5', environ_base={'REMOTE_ADDR': '10.0.0.5'})
+    assert 'Idempotent-Replayed' not in response.headers
+    assert balance(app, 1) == Decimal('40.00'), balance(app, 1)
+
+
+if __name__ == '__main__':
+    test_replay()
+    test_fingerprint_mismatch()
+    test_pending_key()
+    test_scoped_by_client()
+    print('幂等检查通过：重试只执行一次，键按客户端隔离！')
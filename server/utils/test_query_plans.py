@@ -0,0 +1,136 @@
+import os
+import re
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from config import Config
+from app import create_app, db
+from app.services.scheduler import rental_scheduler
+
+# 默认使用临时 SQLite 数据库；设置 QUERY_PLAN_DATABASE_URL 可检查 PostgreSQL
+DATABASE_URL = os.environ.get('QUERY_PLAN_DATABASE_URL')
+# 只检查能 EXPLAIN 的语句
+EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+
+
+class QueryPlanConfig(Config):
+    TESTING = True
+    RENTAL_SCHEDULER_ENABLED = False
+    RATE_LIMIT_ENABLED = False
+    # 关闭响应缓存，列表接口每次都会查库
+    RESPONSE_CACHE_BACKEND = 'none'
+    SQLALCHEMY_DATABASE_URI = DATABASE_URL or 'sqlite:///' + os.path.join(
+        tempfile.mkdtemp(), 'query_plans.db')
+
+
+def setup_data(client):
+    response = client.post('/api/register', json={
+        'username': 'planner', 'password': 'secret', 'name': '张三',
+        'phone': '13800000000', 'id_card': '11010119900101001X'})
+    assert response.status_code == 201, response.json
+    client.post('/api/money/1', json={'amount': '1000'})
+    for i in range(3):
+        response = client.post('/api/vehicles', json={
+            'type': 'SUV', 'brand': 'Toyota', 'model': 'RAV4', 'color': '白色',
+            'price_per_day': 100, 'plate_number': f'京A{10000 + i}'})
+        assert response.status_code == 201, response.json
+
+
+def hot_paths(client):
+    # (名称, 调用)：通过真实的路由和服务执行，检查其中实际发出的语句
+    later = (datetime.now() + timedelta(days=2)).isoformat()
+    return [
+        ('login', lambda: client.post('/api/login', json={'username': 'planner', 'password': 'secret'})),
+        ('create_rental', lambda: client.post('/api/rentals', json={
+            'vehicle_id': 1, 'customer_id': 1, 'duration_days': 1})),
+        ('create_reservation', lambda: client.post('/api/rentals', json={
+            'vehicle_id': 2, 'customer_id': 1, 'duration_days': 1, 'start_time': later})),
+        ('scheduler_sweep', rental_scheduler.sweep),
+        ('rental_list', lambda: client.get('/api/rentals')),
+        ('rental_list_multi', lambda: client.get('/api/rentals?status=ongoing,overdue')),
+        ('rental_list_page', lambda: client.get('/api/rentals/ongoing?limit=1')),
+        ('customer_rentals', lambda: client.get('/api/rentals/customer/1')),
+        ('customer_rentals_legacy', lambda: client.get('/api/customers/1/rentals')),
+        ('vehicle_list', lambda: client.get('/api/vehicles?limit=2')),
+        ('vehicle_available', lambda: client.get('/api/vehicles/available?duration_days=1')),
+        ('customer_list', lambda: client.get('/api/customers/all')),
+        ('customer_prefix_search', lambda: client.get('/api/customers?search=138')),
+        ('customer_text_search', lambda: client.get('/api/customers?search=张三')),
+        ('money', lambda: client.get('/api/money/1')),
+        ('ledger', lambda: client.get('/api/money/1/ledger')),
+        ('return_rental', lambda: client.patch('/api/rentals/1')),
+        ('cancel_reservation', lambda: client.delete('/api/rentals/2')),
+    ]
+
+
+@contextmanager
+def capture_statements(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(EXPLAINABLE):
+            statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def explain(statement, parameters):
+    connection = db.session.connection()
+    if db.engine.dialect.name == 'postgresql':
+        # 空表上 PostgreSQL 总是倾向顺序扫描，关闭后仍走 Seq Scan 说明没有可用索引
+        connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+        rows = connection.exec_driver_sql(f'EXPLAIN {statement}', parameters).all()
+        return [row[0] for row in rows]
+    rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+    return [row[-1] for row in rows]
+
+
+def full_scans(plan):
+    if db.engine.dialect.name == 'postgresql':
+        return [line for line in plan if 'Seq Scan' in line]
+    # SQLite: "SCAN <table>" 不带 USING INDEX 即全表扫描；查询 sqlite_master 的元数据除外
+    return [line for line in plan
+            if re.match(r'^SCAN \w+$', line.strip()) and line.strip() != 'SCAN sqlite_master']
+
+
+def test_hot_queries_use_indexes():
+    app = create_app(QueryPlanConfig)
+    client = app.test_client()
+    with app.app_context():
+        if DATABASE_URL is None:
+            db.create_all()
+        engine = db.engine
+    setup_data(client)
+
+    captured = {}
+    for name, call in hot_paths(client):
+        with capture_statements(engine) as statements:
+            response = call()
+        status = getattr(response, 'status_code', 200)
+        assert status < 400, (name, status, response.json)
+        assert statements, f'{name} 没有执行任何语句'
+        # 同一语句只检查一次
+        captured[name] = list(dict(statements).items())
+
+    with app.app_context():
+        failures = {}
+        for name, statements in captured.items():
+            for statement, parameters in statements:
+                plan = explain(statement, parameters)
+                if full_scans(plan):
+                    failures.setdefault(name, []).append({'statement': statement, 'plan': plan})
+                db.session.rollback()
+        assert not failures, f'全表扫描的查询: {failures}'
+
+
+if __name__ == '__main__':
+    test_hot_queries_use_indexes()
+    print('所有热点查询均使用了索引！')
@@ -0,0 +1,135 @@
+import os
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from app import create_app, db
+from app.models import Users
+from app.services.auth import token_auth
+from app.services.proxy import forwarded_addr, install_proxy_fix
+from app.services.rate_limit import MemoryBackend, SQLiteBackend, rate_limiter
+
+TEMP_DIR = tempfile.mkdtemp()
+
+
+class RateLimitConfig(Config):
+    TESTING = True
+    RENTAL_SCHEDULER_ENABLED = False
+    SQL_INSTRUMENTATION_ENABLED = False
+    RESPONSE_CACHE_BACKEND = 'none'
+    RATE_LIMIT_BACKEND = 'memory'
+    # 几乎不补充令牌，便于数清放行的请求数
+    RATE_LIMITS = {
+        'catalog': {'rate': 0.001, 'burst': 3},
+        'auth': {'rate': 0.001, 'burst': 2},
+    }
+    RATE_LIMIT_CONCURRENCY = {'catalog': 1}
+    RATE_LIMIT_QUEUE_TIMEOUT_SECONDS = 0.05
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(TEMP_DIR, 'rate_limit.db')
+
+
+def create_test_app(config_class=RateLimitConfig):
+    app = create_app(config_class)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add(Users(user_id=1, username='limited', password_hash='-', role='admin'))
+        db.session.commit()
+    return app
+
+
+def login_attempts(client, count, **kwargs):
+    return [client.post('/api/login', json={}, **kwargs).status_code for _ in range(count)]
+
+
+def test_bucket_refill():
+    for backend in (MemoryBackend(), SQLiteBackend(os.path.join(TEMP_DIR, 'buckets.db'))):
+        # 容量 2、每秒补充 20 个：连取两次后耗尽，约 50ms 后补回一个
+        assert [backend.take('refill', 20, 2)[0] for _ in range(3)] == [True, True, False], backend
+        time.sleep(0.06)
+        assert backend.take('refill', 20, 2)[0], backend
+        assert not backend.take('refill', 20, 2)[0], backend
+        # 不同的键互不影响
+        assert backend.take('other', 20, 2)[0], backend
+
+
+def test_client_key():
+    app = create_test_app()
+    client = app.test_client()
+    # 匿名请求按 IP 计数
+    assert login_attempts(client, 3, environ_base={'REMOTE_ADDR': '10.0.0.1'}) == [400, 400, 429]
+    assert login_attempts(client, 1, environ_base={'REMOTE_ADDR': '10.0.0.2'}) == [400]
+
+    # 携带有效令牌时按用户计数，换 IP 也共用一个令牌桶
+    with app.app_context():
+        token = token_auth.issue_token(db.session.get(Users, 1))
+        assert rate_limiter.client_key(f'Bearer {token}', '10.0.0.1') == 'user:1'
+        assert rate_limiter.client_key('Bearer invalid', '10.0.0.1') == 'ip:10.0.0.1'
+    headers = {'Authorization': f'Bearer {token}'}
+    assert login_attempts(client, 1, headers=headers, environ_base={'REMOTE_ADDR': '10.0.0.1'}) == [400]
+    assert login_attempts(client, 2, headers=headers, environ_base={'REMOTE_ADDR': '10.0.0.3'}) == [400, 429]
+    # 用户的令牌桶不占用 IP 的令牌桶
+    assert login_attempts(client, 1, environ_base={'REMOTE_ADDR': '10.0.0.3'}) == [400]
+
+
+def test_proxy_fix():
+    assert forwarded_addr('127.0.0.1', '203.0.113.9', 0) == '127.0.0.1'
+    assert forwarded_addr('127.0.0.1', '198.51.100.1, 203.0.113.9', 1) == '203.0.113.9'
+    assert forwarded_addr('127.0.0.1', '203.0.113.9', 2) == '127.0.0.1'
+
+    # 未信任代理时，伪造的 X-Forwarded-For 不改变计数的地址
+    client = create_test_app().test_client()
+    proxy = {'REMOTE_ADDR': '127.0.0.1'}
+    assert login_attempts(client, 1, environ_base=proxy,
+                          headers={'X-Forwarded-For': '203.0.113.1'}) == [400]
+    assert login_attempts(client, 2, environ_base=proxy,
+                          headers={'X-Forwarded-For': '203.0.113.2'}) == [400, 429]
+
+    # 信任一层代理时，代理之后的每个客户端各自一个令牌桶
+    class ProxyConfig(RateLimitConfig):
+        PROXY_FIX_HOPS = 1
+
+    client = install_proxy_fix(create_test_app(ProxyConfig)).test_client()
+    for addr in ('203.0.113.1', '203.0.113.2'):
+        assert login_attempts(client, 3, environ_base=proxy,
+                              headers={'X-Forwarded-For': addr}) == [400, 400, 429], addr
+
+
+def test_limited_responses():
+    app = create_test_app()
+    client = app.test_client()
+    responses = [client.get('/api/vehicles') for _ in range(4)]
+    assert [r.status_code for r in responses] == [200, 200, 200, 429], responses
+    assert responses[0].headers['RateLimit-Limit'] == '3'
+    assert responses[0].headers['RateLimit-Remaining'] == '2'
+    assert 'Retry-After' not in responses[0].headers
+    assert responses[3].headers['RateLimit-Remaining'] == '0'
+    assert int(responses[3].headers['Retry-After']) > 0
+    assert responses[3].json == {'error': 'Too many requests, please retry later'}
+
+    # 并发名额被占满时排队超时返回 503，令牌桶之外单独计数
+    semaphore = rate_limiter.semaphores['catalog']
+    semaphore.acquire()
+    try:
+        response = client.get('/api/vehicles', environ_base={'REMOTE_ADDR': '10.0.0.9'})
+    finally:
+        semaphore.release()
+    assert response.status_code == 503, response.status_code
+    assert response.headers['Retry-After'] == '1'
+    assert response.json == {'error': 'Server is busy, please retry later'}
+    # 请求结束后名额归还
+    assert client.get('/api/vehicles', environ_base={'REMOTE_ADDR': '10.0.0.9'}).status_code == 200
+    assert semaphore._value == 1
+
+    metrics = client.get('/api/_debug/rate-limit').json
+    assert metrics['limited'] == {'catalog': 1} and metrics['busy'] == {'catalog': 1}, metrics
+
+
+if __name__ == '__main__':
+    test_bucket_refill()
+    test_client_key()
+    test_proxy_fix()
+    test_limited_responses()
+    print('限流检查通过：令牌桶按用户或客户端地址计数，超限返回 429，排队超时返回 503！')
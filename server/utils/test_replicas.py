@@ -0,0 +1,127 @@
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, select, update
+from config import Config
+from app import create_app, db
+from app.models import ReplicaHeartbeat, Vehicle
+from app.services.replicas import STICKY_COOKIE, replica_router
+
+TEMP_DIR = tempfile.mkdtemp()
+
+
+class ReplicaConfig(Config):
+    TESTING = True
+    RENTAL_SCHEDULER_ENABLED = False
+    SQL_INSTRUMENTATION_ENABLED = False
+    RATE_LIMIT_ENABLED = False
+    # 缓存填充总是读主库，关闭后才能观察读请求的路由
+    RESPONSE_CACHE_BACKEND = 'none'
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(TEMP_DIR, 'primary.db')
+    # 用一个独立的库模拟副本，其中的数据落后于主库
+    DATABASE_REPLICA_URLS = ['sqlite:///' + os.path.join(TEMP_DIR, 'replica.db')]
+    DB_REPLICA_CHECK_SECONDS = 3600
+    DB_REPLICA_MAX_LAG_SECONDS = 10
+    DB_REPLICA_STICKY_SECONDS = 30
+
+
+def create_test_app():
+    app = create_app(ReplicaConfig)
+    with app.app_context():
+        for engine, color in ((db.engines[None], '白色'), (db.engines['replica_0'], '旧色')):
+            db.metadata.drop_all(engine)
+            db.metadata.create_all(engine)
+            with engine.begin() as conn:
+                conn.execute(insert(Vehicle).values(
+                    vehicle_id=1, type='SUV', brand='Toyota', model='RAV4', color=color,
+                    price_per_day=100, plate_number='京A10001', is_deleted=False, version=1,
+                    created_at=datetime.now(), updated_at=datetime.now()))
+    return app
+
+
+def color(client, **kwargs):
+    response = client.get('/api/vehicles/1', **kwargs)
+    assert response.status_code == 200, response.json
+    return response.json['color'], response.headers['X-DB-Route']
+
+
+def test_get_bind():
+    app = create_test_app()
+    with app.app_context():
+        primary, replica = db.engines[None], db.engines['replica_0']
+    with app.test_request_context('/api/vehicles'):
+        app.preprocess_request()
+        session = db.session
+        assert session.get_bind(clause=select(Vehicle)) is replica
+        # SELECT ... FOR UPDATE 用主库，之后本次请求的读也固定到主库
+        assert session.get_bind(clause=select(Vehicle).with_for_update()) is primary
+        assert session.get_bind(clause=select(Vehicle)) is primary
+    with app.test_request_context('/api/vehicles'):
+        app.preprocess_request()
+        assert db.session.get_bind(clause=update(Vehicle).values(color='红色')) is primary
+        assert db.session.get_bind(clause=select(Vehicle)) is primary
+    # 读前缀之外的路径和写请求使用主库；请求之外也使用主库
+    for path, method in (('/api/money/1', 'GET'), ('/api/vehicles', 'POST')):
+        with app.test_request_context(path, method=method):
+            app.preprocess_request()
+            assert db.session.get_bind(clause=select(Vehicle)) is primary, path
+    with app.app_context():
+        assert db.session.get_bind(clause=select(Vehicle)) is primary
+
+
+def test_sticky_primary_cookie():
+    app = create_test_app()
+    client = app.test_client()
+    assert color(client) == ('旧色', 'replica_0')
+    assert color(client, headers={'X-DB-Route': 'primary'}) == ('白色', 'primary')
+
+    # 失败的写请求不设置 Cookie
+    response = client.put('/api/vehicles/99', json={'color': '红色'})
+    assert response.status_code == 404 and STICKY_COOKIE not in response.headers.get('Set-Cookie', '')
+    assert color(client) == ('旧色', 'replica_0')
+
+    # 写成功后该客户端在有效期内读主库，读到自己的写入
+    response = client.put('/api/vehicles/1', json={'color': '红色'})
+    assert response.status_code == 200, response.json
+    cookie = response.headers['Set-Cookie']
+    assert cookie.startswith(f'{STICKY_COOKIE}=1') and 'Max-Age=30' in cookie, cookie
+    assert color(client) == ('红色', 'primary')
+    # 其他客户端仍然读副本；Cookie 过期后恢复读副本
+    assert color(app.test_client()) == ('旧色', 'replica_0')
+    client.delete_cookie(STICKY_COOKIE)
+    assert color(client) == ('旧色', 'replica_0')
+    # 请求头可以强制单个请求读副本
+    assert color(app.test_client(), headers={'X-DB-Route': 'replica'}) == ('旧色', 'replica_0')
+
+
+def test_lagging_replica_falls_back():
+    app = create_test_app()
+    client = app.test_client()
+    with app.app_context():
+        # 主库心跳为当前时间，副本上的心跳停在一分钟前
+        for engine, beat_at in ((db.engines[None], datetime.now()),
+                                (db.engines['replica_0'], datetime.now() - timedelta(minutes=1))):
+            with engine.begin() as conn:
+                conn.execute(insert(ReplicaHeartbeat).values(id=1, beat_at=beat_at))
+        replica_router.check()
+    state = replica_router.metrics()['replicas']['replica_0']
+    assert state['healthy'] and state['lag_seconds'] >= 59, state
+    assert color(client) == ('白色', 'primary')
+    assert replica_router.metrics()['fallbacks'] == 1
+
+    # 复制追上后恢复读副本
+    with app.app_context():
+        with db.engines['replica_0'].begin() as conn:
+            conn.execute(update(ReplicaHeartbeat).values(beat_at=datetime.now()))
+        replica_router.check()
+    assert color(client) == ('旧色', 'replica_0')
+
+
+if __name__ == '__main__':
+    test_get_bind()
+    test_sticky_primary_cookie()
+    test_lagging_replica_falls_back()
+    print('读写分离检查通过：只读请求走副本，写入后和副本落后时读主库！')
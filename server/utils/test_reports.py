@@ -0,0 +1,133 @@
+import os
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select
+from config import Config
+from app import create_app, db
+from app.models import Customer, Rental, RentalDailyStats, Users, Vehicle
+from app.services.reports import STAT_FIELDS, backfill_daily_stats, record_rental_event
+
+# 默认使用临时 SQLite 数据库；设置 REPORTS_DATABASE_URL 可在 PostgreSQL 上检查
+DATABASE_URL = os.environ.get('REPORTS_DATABASE_URL')
+
+
+class ReportsConfig(Config):
+    TESTING = True
+    RENTAL_SCHEDULER_ENABLED = False
+    SQL_INSTRUMENTATION_ENABLED = False
+    RATE_LIMIT_ENABLED = False
+    SQLALCHEMY_DATABASE_URI = DATABASE_URL or 'sqlite:///' + os.path.join(
+        tempfile.mkdtemp(), 'reports.db')
+
+
+def setup_data():
+    db.drop_all()
+    db.create_all()
+    for vehicle_id, vehicle_type, brand in ((1, 'SUV', 'Toyota'), (2, 'SUV', 'Toyota'), (3, '轿车', 'Honda')):
+        db.session.add(Vehicle(vehicle_id=vehicle_id, type=vehicle_type, brand=brand, model='-',
+                               color='白色', price_per_day=100, plate_number=f'京A{10000 + vehicle_id}'))
+    db.session.add(Users(user_id=1, username='reporter', password_hash='-', role='customer'))
+    db.session.add(Customer(customer_id=1, user_id=1, name='客户', phone='13000000001',
+                            id_card='110101199000000001', money=Decimal('10000.00')))
+    db.session.commit()
+
+
+def stat_rows():
+    return [tuple(getattr(row, field) for field in ('stat_date', 'vehicle_type', 'brand') + STAT_FIELDS)
+            for row in db.session.execute(
+                select(RentalDailyStats).order_by(RentalDailyStats.stat_date, RentalDailyStats.vehicle_type,
+                                                  RentalDailyStats.brand)).scalars()]
+
+
+def book(client, vehicle_id, start_time=None):
+    payload = {'vehicle_id': vehicle_id, 'customer_id': 1, 'duration_days': 1}
+    if start_time is not None:
+        payload['start_time'] = start_time.isoformat()
+    response = client.post('/api/rentals', json=payload)
+    assert response.status_code == 201, response.json
+    return response.json['rental_id']
+
+
+def run_rentals(app, client):
+    now = datetime.now()
+    with app.app_context():
+        # 三天前开始、逾期两天的租赁，下单时的汇总在同一事务内写入
+        late = Rental(vehicle_id=1, customer_id=1, start_time=now - timedelta(days=3), duration_days=1,
+                      expected_return_time=now - timedelta(days=2), total_fee=Decimal('100.00'),
+                      status='ongoing')
+        db.session.add(late)
+        db.session.flush()
+        record_rental_event(late, 'created')
+        db.session.commit()
+        late_id = late.rental_id
+    assert client.patch(f'/api/rentals/{late_id}').status_code == 204
+
+    # 同一天同一车型品牌的多次事件累加到同一行
+    assert client.delete(f'/api/rentals/{book(client, 2)}').status_code == 200
+    assert client.patch(f'/api/rentals/{book(client, 2)}').status_code == 204
+    # 退款的预约和仍在进行的租赁
+    assert client.delete(f'/api/rentals/{book(client, 3, now + timedelta(days=3))}').status_code == 200
+    book(client, 3)
+
+
+def test_incremental_stats():
+    app = create_app(ReportsConfig)
+    client = app.test_client()
+    with app.app_context():
+        setup_data()
+    run_rentals(app, client)
+
+    today = date.today()
+    with app.app_context():
+        rows = {(row[0], row[1], row[2]): dict(zip(STAT_FIELDS, row[3:])) for row in stat_rows()}
+    suv = rows[(today, 'SUV', 'Toyota')]
+    assert (suv['rentals'], suv['cancelled'], suv['refunded'], suv['completed']) == (2, 1, 0, 1), suv
+    assert suv['revenue'] == Decimal('200.00') and suv['booked_days'] == 2, suv
+    late = rows[(today - timedelta(days=3), 'SUV', 'Toyota')]
+    assert (late['rentals'], late['completed'], late['returned_late']) == (1, 1, 1), late
+    # 占用时长按自然日拆分，合计约 72 小时
+    occupied = sum(values['occupied_hours'] for values in rows.values())
+    assert abs(occupied - 72) < 1, occupied
+    reserved = rows[(today + timedelta(days=3), '轿车', 'Honda')]
+    assert (reserved['rentals'], reserved['refunded'], reserved['revenue']) == (1, 1, 0), reserved
+    assert rows[(today, '轿车', 'Honda')]['rentals'] == 1
+
+    response = client.get('/api/reports/summary', query_string={
+        'start': (today - timedelta(days=7)).isoformat(), 'end': (today + timedelta(days=7)).isoformat()})
+    totals = response.json['totals']
+    assert (totals['rentals'], totals['cancelled'], totals['completed'], totals['returned_late']) == (5, 2, 2, 1), totals
+    assert totals['revenue'] == 400.0, totals
+
+
+def test_backfill_idempotent():
+    app = create_app(ReportsConfig)
+    client = app.test_client()
+    with app.app_context():
+        setup_data()
+    run_rentals(app, client)
+
+    today = date.today()
+    with app.app_context():
+        incremental = stat_rows()
+        # 全量重算与增量维护的结果一致，重复执行不会累加
+        for _ in range(2):
+            assert backfill_daily_stats() == len(incremental)
+            assert stat_rows() == incremental, (stat_rows(), incremental)
+        # 只重算部分日期：范围外的行保持不变，跨越范围起点的占用时长仍然计入
+        assert backfill_daily_stats(today - timedelta(days=2), today + timedelta(days=1)) == 4
+        assert stat_rows() == incremental, (stat_rows(), incremental)
+        # 汇总表被破坏后可以重算修复
+        db.session.execute(db.delete(RentalDailyStats).where(RentalDailyStats.stat_date == today))
+        db.session.commit()
+        backfill_daily_stats(today, today + timedelta(days=1))
+        assert stat_rows() == incremental, (stat_rows(), incremental)
+
+
+if __name__ == '__main__':
+    test_incremental_stats()
+    test_backfill_idempotent()
+    print('报表汇总检查通过：增量维护与全量重算一致，重复重算结果不变！')
@@ -0,0 +1,141 @@
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from app import create_app, db
+from app.models import Customer, Rental, Users, Vehicle
+from app.services.scheduler import rental_scheduler
+from app.services.vehicle_status import rebuild_vehicle_status
+
+# 默认使用临时 SQLite 数据库；设置 RESERVATION_DATABASE_URL 可在 PostgreSQL 上检查
+DATABASE_URL = os.environ.get('RESERVATION_DATABASE_URL')
+
+
+class ReservationConfig(Config):
+    TESTING = True
+    RENTAL_SCHEDULER_ENABLED = False
+    SQL_INSTRUMENTATION_ENABLED = False
+    SQLALCHEMY_DATABASE_URI = DATABASE_URL or 'sqlite:///' + os.path.join(
+        tempfile.mkdtemp(), 'reservation_conflict.db')
+
+
+def setup_data():
+    db.drop_all()
+    db.create_all()
+    db.session.add(Vehicle(vehicle_id=1, type='SUV', brand='Toyota', model='RAV4',
+                           color='白色', price_per_day=100, plate_number='京A10001'))
+    for i in (1, 2, 3):
+        db.session.add(Users(user_id=i, username=f'reserve{i}', password_hash='-', role='customer'))
+        db.session.add(Customer(customer_id=i, user_id=i, name=f'客户{i}', phone=f'{13000000000 + i}',
+                                id_card=f'{110101199000000000 + i}', money=Decimal('1000.00')))
+    db.session.commit()
+
+
+def add_rental(rental_id, customer_id, start_time, status):
+    db.session.add(Rental(rental_id=rental_id, vehicle_id=1, customer_id=customer_id,
+                          start_time=start_time, duration_days=1,
+                          expected_return_time=start_time + timedelta(days=1),
+                          total_fee=Decimal('100.00'), status=status))
+
+
+def vehicle_state():
+    vehicle = db.session.get(Vehicle, 1)
+    db.session.refresh(vehicle)
+    return vehicle.current_rental_id, vehicle.current_status
+
+
+def rental_status(rental_id):
+    return db.session.execute(
+        db.select(Rental.status).where(Rental.rental_id == rental_id)).scalar()
+
+
+def test_overdue_blocks_reservation():
+    app = create_app(ReservationConfig)
+    now = datetime.now()
+    with app.app_context():
+        setup_data()
+        # 租赁 1 在预约 2 开始前就该归还，但客户一直没有还车
+        add_rental(1, 1, now - timedelta(days=1, hours=1), 'ongoing')
+        add_rental(2, 2, now - timedelta(minutes=30), 'reserved')
+        add_rental(3, 3, now - timedelta(minutes=10), 'reserved')
+        db.session.commit()
+        db.session.get(Vehicle, 1).current_rental_id = 1
+        db.session.get(Vehicle, 1).current_status = 'ongoing'
+        db.session.commit()
+
+    rental_scheduler.sweep()
+    with app.app_context():
+        assert rental_status(1) == 'overdue', rental_status(1)
+        assert rental_status(2) == rental_status(3) == 'reserved', (rental_status(2), rental_status(3))
+        assert vehicle_state() == (1, 'overdue'), vehicle_state()
+    held = {item['rental_id'] for item in rental_scheduler.metrics()['held_reservations']}
+    assert held == {2, 3}, held
+
+    # 还车后下一次扫描只开始最早的预约，另一笔继续等待
+    assert app.test_client().patch('/api/rentals/1').status_code == 204
+    rental_scheduler.sweep()
+    with app.app_context():
+        assert rental_status(2) == 'ongoing', rental_status(2)
+        assert rental_status(3) == 'reserved', rental_status(3)
+        assert vehicle_state() == (2, 'ongoing'), vehicle_state()
+    held = {item['rental_id'] for item in rental_scheduler.metrics()['held_reservations']}
+    assert held == {3}, held
+    with app.app_context():
+        assert rebuild_vehicle_status(dry_run=True) == []
+
+
+def test_late_start_extends_return_time():
+    app = create_app(ReservationConfig)
+    now = datetime.now()
+    with app.app_context():
+        setup_data()
+        # 租赁 1 逾期两天，预约 2 原定的租期已经整个过去
+        add_rental(1, 1, now - timedelta(days=3), 'ongoing')
+        add_rental(2, 2, now - timedelta(hours=30), 'reserved')
+        db.session.commit()
+        db.session.get(Vehicle, 1).current_rental_id = 1
+        db.session.get(Vehicle, 1).current_status = 'ongoing'
+        db.session.commit()
+
+    rental_scheduler.sweep()
+    assert app.test_client().patch('/api/rentals/1').status_code == 204
+    rental_scheduler.sweep()
+    # 晚开始的预约从实际开始时间起租满一天，再次扫描也不会被标记为逾期
+    rental_scheduler.sweep()
+    with app.app_context():
+        rental = db.session.get(Rental, 2)
+        assert rental.status == 'ongoing', rental.status
+        assert rental.start_time >= now, rental.start_time
+        assert rental.expected_return_time - rental.start_time == timedelta(days=1), rental.to_dict()
+        assert vehicle_state() == (2, 'ongoing'), vehicle_state()
+
+
+def test_cancelled_reservation_keeps_current_rental():
+    app = create_app(ReservationConfig)
+    client = app.test_client()
+    with app.app_context():
+        setup_data()
+    assert client.post('/api/rentals', json={
+        'vehicle_id': 1, 'customer_id': 1, 'duration_days': 1}).status_code == 201
+    response = client.post('/api/rentals', json={
+        'vehicle_id': 1, 'customer_id': 2, 'duration_days': 1,
+        'start_time': (datetime.now() + timedelta(days=3)).isoformat()})
+    assert response.status_code == 201 and response.json['status'] == 'reserved', response.json
+    assert client.delete(f"/api/rentals/{response.json['rental_id']}").status_code == 200
+
+    # 取消的预约编号更大，但车辆仍由进行中的租赁占用
+    with app.app_context():
+        assert rebuild_vehicle_status(dry_run=True) == []
+        assert rebuild_vehicle_status() == []
+        assert vehicle_state() == (1, 'ongoing'), vehicle_state()
+
+
+if __name__ == '__main__':
+    test_overdue_blocks_reservation()
+    test_late_start_extends_return_time()
+    test_cancelled_reservation_keeps_current_rental()
+    print('预约冲突检查通过：车辆未归还时到期预约不会开始！')
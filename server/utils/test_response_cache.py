@@ -0,0 +1,100 @@
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from app import create_app, db
+from app.models import Vehicle
+from app.services.response_cache import response_cache
+
+THREADS = 8
+REQUESTS_PER_THREAD = 50
+
+
+class ResponseCacheConfig(Config):
+    TESTING = True
+    RENTAL_SCHEDULER_ENABLED = False
+    SQL_INSTRUMENTATION_ENABLED = False
+    RATE_LIMIT_ENABLED = False
+    RESPONSE_CACHE_BACKEND = 'lru'
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(
+        tempfile.mkdtemp(), 'response_cache.db')
+
+
+def create_test_app():
+    app = create_app(ResponseCacheConfig)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        for i in (1, 2):
+            db.session.add(Vehicle(vehicle_id=i, type='SUV', brand='Toyota', model='RAV4',
+                                   color='白色', price_per_day=100, plate_number=f'京A{10000 + i}'))
+        db.session.commit()
+    return app
+
+
+def test_invalidate_and_etag():
+    app = create_test_app()
+    client = app.test_client()
+    first = client.get('/api/vehicles')
+    assert first.status_code == 200 and first.headers['X-Cache'] == 'MISS'
+    etag = first.headers['ETag']
+    second = client.get('/api/vehicles')
+    assert second.headers['X-Cache'] == 'HIT' and second.data == first.data
+    assert second.headers['ETag'] == etag
+
+    # 客户端带上 ETag 时命中返回 304，不带响应体
+    not_modified = client.get('/api/vehicles', headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304 and not_modified.data == b''
+    assert not_modified.headers['ETag'] == etag
+
+    # 修改车辆后版本号递增：先未命中并重新填充，然后再次命中
+    assert client.get('/api/vehicles/2').headers['X-Cache'] == 'MISS'
+    assert client.put('/api/vehicles/1', json={'color': '黑色'}).status_code == 200
+    refreshed = client.get('/api/vehicles', headers={'If-None-Match': etag})
+    assert refreshed.status_code == 200 and refreshed.headers['X-Cache'] == 'MISS'
+    assert refreshed.headers['ETag'] != etag
+    assert [v['color'] for v in refreshed.json['data']] == ['黑色', '白色'], refreshed.json
+    assert client.get('/api/vehicles').headers['X-Cache'] == 'HIT'
+    assert client.get('/api/vehicles/1').json['color'] == '黑色'
+    # 其他车辆的详情不受影响
+    assert client.get('/api/vehicles/2').headers['X-Cache'] == 'HIT'
+
+    # 绕过接口直接改库时缓存不会失效，调用 invalidate 后才读到新状态
+    with app.app_context():
+        db.session.execute(db.update(Vehicle).values(current_status='ongoing'))
+        db.session.commit()
+    assert client.get('/api/vehicles').headers['X-Cache'] == 'HIT'
+    response_cache.invalidate('vehicles')
+    assert client.get('/api/vehicles').json['data'][0]['status'] == 'ongoing'
+
+    # 非 200 响应不缓存
+    assert client.get('/api/vehicles/99').status_code == 404
+    assert 'X-Cache' not in client.get('/api/vehicles/99').headers
+
+    metrics = client.get('/api/_debug/response-cache').json
+    assert (metrics['hits'], metrics['misses']) == (5, 7), metrics
+
+
+def test_concurrent_counters():
+    app = create_test_app()
+
+    def fetch(_):
+        client = app.test_client()
+        for _ in range(REQUESTS_PER_THREAD):
+            assert client.get('/api/vehicles').status_code == 200
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        list(executor.map(fetch, range(THREADS)))
+    metrics = response_cache.metrics()
+    # 每个请求都计入命中或未命中
+    assert metrics['hits'] + metrics['misses'] == THREADS * REQUESTS_PER_THREAD, metrics
+    assert metrics['misses'] >= 1, metrics
+
+
+if __name__ == '__main__':
+    test_invalidate_and_etag()
+    test_concurrent_counters()
+    print('响应缓存检查通过：写操作后重新填充，ETag 命中返回 304，计数准确！')
@@ -0,0 +1,121 @@
+import json
+import os
+import sys
+import tempfile
+from decimal import Decimal
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from app import create_app, db
+from app.models import Vehicle
+
+# 默认使用临时 SQLite 数据库；设置 IMPORT_DATABASE_URL 可在 PostgreSQL 上检查（走 COPY）
+DATABASE_URL = os.environ.get('IMPORT_DATABASE_URL')
+
+
+class ImportConfig(Config):
+    TESTING = True
+    RENTAL_SCHEDULER_ENABLED = False
+    SQL_INSTRUMENTATION_ENABLED = False
+    RATE_LIMIT_ENABLED = False
+    SQLALCHEMY_DATABASE_URI = DATABASE_URL or 'sqlite:///' + os.path.join(
+        tempfile.mkdtemp(), 'vehicle_import.db')
+
+
+def vehicle(plate_number, price='100', **overrides):
+    return {'type': 'SUV', 'brand': 'Toyota', 'model': 'RAV4', 'color': '白色',
+            'price_per_day': price, 'plate_number': plate_number, **overrides}
+
+
+def create_test_app():
+    app = create_app(ImportConfig)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        # 已删除车辆的车牌仍然占用唯一约束
+        db.session.add(Vehicle(type='SUV', brand='Toyota', model='RAV4', color='白色',
+                               price_per_day=100, plate_number='京A00000', is_deleted=True))
+        db.session.commit()
+    return app
+
+
+def plates(app):
+    with app.app_context():
+        return dict(db.session.execute(
+            db.select(Vehicle.plate_number, Vehicle.price_per_day).where(Vehicle.is_deleted == False)
+        ).all())
+
+
+def test_mixed_json_import():
+    app = create_test_app()
+    client = app.test_client()
+    records = [
+        vehicle('京A10001'),
+        {'brand': 'Toyota', 'plate_number': '京A10002'},
+        vehicle('京A10003', '88.50'),
+        vehicle('京A10001', '120'),
+        vehicle('京A10004', 'abc'),
+        vehicle('京A10005', '-1'),
+        vehicle('A10006'),
+        vehicle('京A00000'),
+        vehicle('京A10009'),
+        42,
+    ]
+    # 批大小为 3：重复的车牌与第一次出现在同一批中
+    response = client.post('/api/vehicles/bulk?batch_size=3', json=records)
+    assert response.status_code == 201, response.json
+    result = response.json
+    assert (result['total'], result['inserted'], result['error_count']) == (10, 3, 7), result
+    assert [(error['row'], error['error']) for error in result['errors']] == [
+        (2, 'Missing required fields: type, model, color, price_per_day'),
+        (4, 'Duplicate plate number in import'),
+        (5, 'Invalid price format'),
+        (6, 'Price must be positive'),
+        (7, 'Invalid plate number format'),
+        (8, 'Plate number already exists'),
+        (10, 'Invalid record'),
+    ], result['errors']
+    assert result['errors'][1]['plate_number'] == '京A10001'
+    # 重复行没有覆盖第一次出现的价格
+    assert plates(app) == {'京A10001': Decimal('100.00'), '京A10003': Decimal('88.50'),
+                           '京A10009': Decimal('100.00')}, plates(app)
+
+    # 再导入一次，全部因车牌已存在被拒绝
+    response = client.post('/api/vehicles/bulk', json=[vehicle('京A10001'), vehicle('京A10003')])
+    assert response.status_code == 400 and response.json['inserted'] == 0, response.json
+    assert {error['error'] for error in response.json['errors']} == {'Plate number already exists'}
+
+
+def test_streaming_formats():
+    app = create_test_app()
+    client = app.test_client()
+    ndjson = '\n'.join([json.dumps(vehicle('京B10001')), '{broken', '',
+                        json.dumps(vehicle('京B10001')), json.dumps(vehicle('京B10002'))])
+    response = client.post('/api/vehicles/bulk?batch_size=2', data=ndjson.encode(),
+                           content_type='application/x-ndjson')
+    assert response.status_code == 201, response.json
+    assert (response.json['inserted'], response.json['error_count']) == (2, 2), response.json
+    assert [error['error'] for error in response.json['errors']] == [
+        'Invalid JSON', 'Duplicate plate number in import']
+
+    # CSV 可以带 BOM，空单元格按缺少字段处理
+    rows = ['type,brand,model,color,price_per_day,plate_number',
+            'SUV,Honda,CR-V,黑色,150,京C10001',
+            'SUV,Honda,CR-V,黑色,,京C10002',
+            'SUV,Honda,CR-V,黑色,150,京C10001']
+    response = client.post('/api/vehicles/bulk', data='﻿'.encode() + '\n'.join(rows).encode(),
+                           content_type='text/csv')
+    assert response.status_code == 201, response.json
+    assert (response.json['total'], response.json['inserted'], response.json['error_count']) == (3, 1, 2)
+    assert set(plates(app)) == {'京B10001', '京B10002', '京C10001'}, plates(app)
+
+    # 导入后车辆列表缓存失效
+    assert len(client.get('/api/vehicles').json['data']) == 3
+    assert client.post('/api/vehicles/bulk', json=[vehicle('京D10001')]).status_code == 201
+    assert len(client.get('/api/vehicles').json['data']) == 4
+
+
+if __name__ == '__main__':
+    test_mixed_json_import()
+    test_streaming_formats()
+    print('车辆导入检查通过：有效行全部写入，无效行和重复车牌逐行报错！')
@@ -0,0 +1,11 @@
+"""生产环境入口：gunicorn -c gunicorn.conf.py wsgi:app
+
+数据库和连接池参数通过环境变量配置，见 config.py。
+"""
+from flask_cors import CORS
+from app import create_app
+from app.services.proxy import install_proxy_fix
+from config import ProductionConfig
+
+app = install_proxy_fix(create_app(ProductionConfig))
+CORS(app)